@@ -0,0 +1,11 @@
+"""Benchmarks for crafting-process.
+
+Run from the repository root:
+
+    python -m benchmarks run --preset small --out bench.json
+    python -m benchmarks compare old.json new.json
+
+generator.py builds seeded synthetic recipe libraries; scenarios.py holds the
+standardized scenarios (parse, library build, graph enumeration, MILP
+solving, full plan()).
+"""
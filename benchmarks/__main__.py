@@ -0,0 +1,140 @@
+"""Command-line entry point: python -m benchmarks {run,compare}."""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from .scenarios import PRESETS, SCENARIOS
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def _measure_in_subprocess(scenario, params, repeat):
+    # One process per scenario keeps peak RSS and import state independent.
+    proc = subprocess.run(
+        [
+            sys.executable, "-m", "benchmarks", "_measure",
+            scenario, json.dumps(params), str(repeat),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        return {"scenario": scenario, "params": params, "error": proc.stderr.strip()}
+    return json.loads(proc.stdout)
+
+
+def cmd_run(args):
+    presets = args.preset or ["small"]
+    scenarios = args.scenario or list(SCENARIOS)
+    results = []
+    for preset in presets:
+        params = {**PRESETS[preset], "seed": args.seed}
+        for scenario in scenarios:
+            r = _measure_in_subprocess(scenario, params, args.repeat)
+            r["preset"] = preset
+            results.append(r)
+            if "error" in r:
+                print(f"{preset:>12} {scenario:>8}  ERROR", file=sys.stderr)
+            else:
+                print(
+                    f"{preset:>12} {scenario:>8}  {r['median_s'] * 1000:10.2f} ms"
+                    f"  rss {r['peak_rss_kb']} kB",
+                    file=sys.stderr,
+                )
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def cmd_compare(args):
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    def _key(r):
+        return (r.get("preset"), r["scenario"])
+
+    old_by_key = {_key(r): r for r in old["results"] if "error" not in r}
+    print(f"old: {old.get('commit')}  new: {new.get('commit')}")
+    for r in new["results"]:
+        before = old_by_key.get(_key(r))
+        if before is None or "error" in r:
+            continue
+        ratio = r["median_s"] / before["median_s"] if before["median_s"] else float("inf")
+        flag = "  <-- slower" if ratio > 1 + args.threshold else ""
+        print(
+            f"{r.get('preset'):>12} {r['scenario']:>8}  "
+            f"{before['median_s'] * 1000:10.2f} ms -> {r['median_s'] * 1000:10.2f} ms"
+            f"  x{ratio:.2f}{flag}"
+        )
+
+
+def cmd_measure(args):
+    from .scenarios import measure
+
+    print(json.dumps(measure(args.scenario, json.loads(args.params), args.repeat)))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run scenarios and record JSON results")
+    run.add_argument(
+        "-p", "--preset", action="append", choices=list(PRESETS),
+        help="Generator preset (repeatable; default: small)"
+    )
+    run.add_argument(
+        "-s", "--scenario", action="append", choices=list(SCENARIOS),
+        help="Scenario to run (repeatable; default: all)"
+    )
+    run.add_argument("--seed", type=int, default=0, help="Generator seed (default: 0)")
+    run.add_argument("--repeat", type=int, default=3, help="Timed runs per scenario")
+    run.add_argument("-o", "--out", metavar="FILE", help="Write JSON here instead of stdout")
+    run.set_defaults(func=cmd_run)
+
+    compare = sub.add_parser("compare", help="Compare two JSON result files")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument(
+        "--threshold", type=float, default=0.1,
+        help="Flag scenarios slower by more than this fraction (default: 0.1)"
+    )
+    compare.set_defaults(func=cmd_compare)
+
+    measure = sub.add_parser("_measure", help=argparse.SUPPRESS)
+    measure.add_argument("scenario")
+    measure.add_argument("params")
+    measure.add_argument("repeat", type=int)
+    measure.set_defaults(func=cmd_measure)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
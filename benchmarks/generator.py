@@ -0,0 +1,115 @@
+"""Seeded generator of synthetic recipe DSL text.
+
+Kinds are arranged in tiers: tier 0 kinds are raw materials with no
+producers, and every recipe for a tier-t kind draws most of its inputs from
+tier t-1.  The knobs map onto the shapes that make planning expensive:
+
+    depth               number of crafted tiers above the raw tier
+    branching           inputs per recipe
+    alternatives        competing recipes per crafted kind
+    multi_output_ratio  chance a recipe also emits a byproduct
+    augment_tiers       @mkN variants generated for every recipe
+    cycle_density       chance a recipe also consumes a same- or higher-tier
+                        kind, closing a loop in the recipe graph
+"""
+
+import random
+from dataclasses import dataclass, field
+
+from crafting_process.augment import Augments
+
+_DURATIONS = [0.5, 1, 2, 3.2, 5]
+
+
+@dataclass(frozen=True)
+class GeneratedLibrary:
+    text: str
+    mode: str
+    targets: list  # top-tier kinds, the natural things to plan for
+    augments: dict = field(default_factory=dict)
+    params: dict = field(default_factory=dict)
+
+
+def tier_kinds(tier, width):
+    return [f"t{tier}_k{i}" for i in range(width)]
+
+
+def augment_fns(augment_tiers):
+    """Augment registry matching the @mkN names the generator emits."""
+    return {
+        f"mk{n}": Augments.mul_speed(1 + 0.5 * n) for n in range(1, augment_tiers + 1)
+    }
+
+
+def generate(
+    seed=0,
+    depth=3,
+    width=3,
+    branching=2,
+    alternatives=2,
+    multi_output_ratio=0.2,
+    augment_tiers=0,
+    cycle_density=0.0,
+    mode="continuous",
+):
+    params = {
+        "seed": seed,
+        "depth": depth,
+        "width": width,
+        "branching": branching,
+        "alternatives": alternatives,
+        "multi_output_ratio": multi_output_ratio,
+        "augment_tiers": augment_tiers,
+        "cycle_density": cycle_density,
+        "mode": mode,
+    }
+    rng = random.Random(seed)
+    tiers = [tier_kinds(t, width) for t in range(depth + 1)]
+
+    lines = [f"# generated: {params}", ""]
+    if augment_tiers:
+        lines.extend(f"@mk{n}" for n in range(1, augment_tiers + 1))
+        lines.append("")
+
+    for tier in range(1, depth + 1):
+        for kind in tiers[tier]:
+            for alt in range(alternatives):
+                lines.extend(_recipe(rng, tiers, tier, kind, alt, params))
+                lines.append("")
+
+    return GeneratedLibrary(
+        text="\n".join(lines),
+        mode=mode,
+        targets=list(tiers[depth]),
+        augments=augment_fns(augment_tiers),
+        params=params,
+    )
+
+
+def _recipe(rng, tiers, tier, kind, alt, params):
+    outputs = [(rng.randint(1, 4), kind)]
+    if rng.random() < params["multi_output_ratio"]:
+        # Byproducts are sibling kinds (like oil refining's gas + heavy oil),
+        # so multi-output alone never closes a loop; cycle_density does that.
+        siblings = [k for k in tiers[tier] if k != kind] or tiers[tier - 1]
+        byproduct = rng.choice(siblings)
+        outputs.append((rng.randint(1, 3), byproduct))
+
+    below = tiers[tier - 1]
+    pool = below + [k for t in tiers[: tier - 1] for k in t]
+    n_inputs = min(params["branching"], len(pool))
+    # Always take at least one input from the tier directly below so the
+    # recipe graph really is depth tiers deep.
+    chosen = [rng.choice(below)]
+    chosen += rng.sample([k for k in pool if k != chosen[0]], n_inputs - 1)
+    if rng.random() < params["cycle_density"]:
+        loop_tier = rng.randrange(tier, len(tiers))
+        loop_kind = rng.choice([k for k in tiers[loop_tier] if k != kind] or [kind])
+        if loop_kind not in chosen and loop_kind != kind:
+            chosen.append(loop_kind)
+
+    inputs = [(rng.randint(1, 5), k) for k in chosen]
+    duration = rng.choice(_DURATIONS)
+    out_s = " + ".join(f"{n} {k}" for (n, k) in outputs)
+    in_s = " + ".join(f"{n} {k}" for (n, k) in inputs)
+    return [f"{out_s} | make_{kind}_{alt} duration={duration}", in_s]
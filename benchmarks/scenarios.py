@@ -0,0 +1,178 @@
+"""Standardized benchmark scenarios and the measurement harness.
+
+Each scenario is a (setup, run) pair: setup(generated) builds whatever the
+timed part needs and is not measured; run(state) is the measured body and
+returns a small summary used as a sanity check between runs.
+"""
+
+import gc
+import itertools
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from crafting_process.library import ProcessLibrary, parse_processes
+from crafting_process.orchestration import analyze_graphs, plan, production_graphs
+from crafting_process.process import BatchProcess, ContinuousProcess, Ingredients
+
+from .generator import generate
+
+# Upper bound on graphs consumed by the enumeration/MILP scenarios so a
+# pathological preset cannot run away.
+MAX_GRAPHS = 500
+
+PRESETS = {
+    "small": {"depth": 2, "width": 2, "branching": 2, "alternatives": 2},
+    "augmented": {"depth": 2, "width": 2, "alternatives": 1, "augment_tiers": 2},
+    "multi-output": {
+        "depth": 3,
+        "width": 2,
+        "alternatives": 1,
+        "multi_output_ratio": 0.6,
+    },
+    "cyclic": {"depth": 3, "width": 2, "alternatives": 1, "cycle_density": 0.3},
+    "deep": {"depth": 12, "width": 2, "alternatives": 1},
+}
+
+
+def _library(gen):
+    return ProcessLibrary(gen.mode, text=gen.text, augments=gen.augments)
+
+
+def _target(gen):
+    return Ingredients.parse(f"1 {gen.targets[0]}")
+
+
+def _graphs(gen):
+    lib = _library(gen)
+    return list(itertools.islice(production_graphs(lib, _target(gen)), MAX_GRAPHS))
+
+
+def _setup_parse(gen):
+    process_class = BatchProcess if gen.mode == "batch" else ContinuousProcess
+    return (gen.text.splitlines(), process_class)
+
+
+def _run_parse(state):
+    lines, process_class = state
+    return len(parse_processes(lines, process_class=process_class))
+
+
+def _run_library(gen):
+    return len(_library(gen).recipes)
+
+
+def _setup_graphs(gen):
+    return (_library(gen), _target(gen))
+
+
+def _run_graphs(state):
+    lib, target = state
+    return sum(1 for _ in itertools.islice(production_graphs(lib, target), MAX_GRAPHS))
+
+
+def _run_milp(graphs):
+    return sum(1 for _ in analyze_graphs(graphs))
+
+
+def _run_plan(state):
+    lib, target = state
+    return len(plan(lib, target))
+
+
+# Imports crafting_process in a fresh interpreter and reports how many modules
+# that loaded, so a heavy dependency creeping back into the import path shows
+# up in both the timing and the summary.  The timing includes interpreter
+# startup; compare it against an earlier run, not against zero.
+_IMPORT_PROBE = (
+    "import sys; before = len(sys.modules); "
+    "import crafting_process; "
+    "from crafting_process import ProcessLibrary, P, Ingredients; "
+    "print(len(sys.modules) - before)"
+)
+
+
+def _run_import(_state):
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return int(out.stdout)
+
+
+SCENARIOS = {
+    "import": (lambda gen: None, _run_import),
+    "parse": (_setup_parse, _run_parse),
+    "library": (lambda gen: gen, _run_library),
+    "graphs": (_setup_graphs, _run_graphs),
+    "milp": (_graphs, _run_milp),
+    "plan": (_setup_graphs, _run_plan),
+}
+
+
+def _peak_rss_kb():
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux but bytes on macOS
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def measure(scenario, params, repeat=3):
+    """Run one scenario against a generated library and return its metrics.
+
+    Timings come from repeat clean runs.  Allocation figures come from one
+    extra run under tracemalloc, kept separate so tracing overhead does not
+    leak into the timings:
+
+        alloc_peak_bytes      peak traced Python heap during the run
+        retained_blocks       memory blocks still allocated after the run and a
+                              collection (sys.getallocatedblocks delta), not
+                              the number of allocations made
+        gc_gen0_collections   young-generation collections, a proxy for the
+                              number of container objects allocated
+
+    peak_rss_kb is the process high-water mark, so each scenario should run
+    in a fresh process (the CLI does this).
+    """
+    setup, run = SCENARIOS[scenario]
+    gen = generate(**params)
+    state = setup(gen)
+
+    times = []
+    summary = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        summary = run(state)
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    gen0_before = gc.get_stats()[0]["collections"]
+    tracemalloc.start()
+    run(state)
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gen0_after = gc.get_stats()[0]["collections"]
+    gc.collect()
+    blocks_after = sys.getallocatedblocks()
+
+    return {
+        "scenario": scenario,
+        "params": gen.params,
+        "summary": summary,
+        "repeat": repeat,
+        "times": times,
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "alloc_peak_bytes": alloc_peak,
+        "retained_blocks": blocks_after - blocks_before,
+        "gc_gen0_collections": gen0_after - gen0_before,
+        "peak_rss_kb": _peak_rss_kb(),
+    }
@@ -1,21 +1,51 @@
 from .process import Ingredients, Process, BatchProcess, ContinuousProcess, describe_process
-from .library import ProcessLibrary, P, Pred
-from .augment import Augments
-from .orchestration import (
-    plan,
-    production_graphs,
-    analyze_graph,
-    analyze_graphs,
-    printable_analysis,
-    printable_graph,
-    printable_dot,
-    PlanResult,
-    PlanResultPredicates,
-    ProcessCount,
-    R,
-    exchange_milps,
-    batch_milps,
+from .library import ProcessLibrary, LibraryView, FederatedLibrary, P, Pred
+from .augment import Affine, Augments
+from .profiling import PlanProfile
+# orchestration pulls in the solver (numpy, scipy.optimize) and graph
+# (coolname); load it on first use so parsing and library filtering stay
+# cheap to import.
+_LAZY = {
+    name: ".orchestration"
+    for name in (
+        "plan",
+        "plan_quantities",
+        "production_graphs",
+        "GraphSearch",
+        "analyze_graph",
+        "analyze_graphs",
+        "printable_analysis",
+        "printable_graph",
+        "printable_dot",
+        "PlanResult",
+        "PlanResultPredicates",
+        "ProcessCount",
+        "R",
+        "exchange_milps",
+        "batch_milps",
+    )
+}
+_LAZY.update(
+    (name, ".asynchronous") for name in ("AsyncPlanner", "plan_async", "analyze_async")
 )
+_LAZY["RecipeTable"] = ".table"  # numpy
+_LAZY["plan_sharded"] = ".parallel"
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
 
 __all__ = [
     "Ingredients",
@@ -24,11 +54,17 @@ __all__ = [
     "ContinuousProcess",
     "describe_process",
     "ProcessLibrary",
+    "LibraryView",
+    "FederatedLibrary",
     "P",
     "Pred",
+    "Affine",
     "Augments",
+    "PlanProfile",
     "plan",
+    "plan_quantities",
     "production_graphs",
+    "GraphSearch",
     "analyze_graph",
     "analyze_graphs",
     "printable_analysis",
@@ -40,4 +76,9 @@ __all__ = [
     "R",
     "exchange_milps",
     "batch_milps",
+    "AsyncPlanner",
+    "plan_async",
+    "analyze_async",
+    "RecipeTable",
+    "plan_sharded",
 ]
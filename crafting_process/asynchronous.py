@@ -0,0 +1,150 @@
+"""asyncio counterparts of plan() and the analyzed-results stream.
+
+    planner = AsyncPlanner(max_workers=4, max_concurrency=4)
+    results = await planner.plan(library, "10 computer")
+    async for result in planner.results(library, "10 computer"):
+        ...
+
+The search runs on a thread executor one step at a time, where a step is one
+graph expansion plus MILP solve (one item of analyze_graphs).  The event loop
+only awaits those steps, so it is never blocked.  Steps from every query
+running on a planner compete for max_concurrency slots.  A heavy query
+therefore takes turns with the others instead of holding the pool.
+
+Cancelling the awaiting task stops the search after the step in flight.
+The generators are then closed on the executor, or inline once it has been
+shut down.  A single MILP solve cannot be interrupted; bound it with
+milp_options={"time_limit": ...}.
+
+Concurrent queries may share a library: its lazily built indexes and views
+are built under a lock in library.py, so a cold library is indexed once.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from .orchestration import _TopK
+from .orchestration import _default_sort_key
+from .orchestration import analyze_graphs
+from .orchestration import production_graphs
+from .process import Ingredients
+
+_DONE = object()
+
+
+class _Search:
+    """A blocking iterator stepped from executor threads, one step at a time."""
+
+    def __init__(self, iterator):
+        self._iterator = iterator
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def step(self):
+        with self._lock:
+            if self._stopped:
+                return _DONE
+            return next(self._iterator, _DONE)
+
+    def close(self):
+        # Runs on the executor: waits for any step still in flight, then
+        # closes the generator chain so it releases its graphs.
+        with self._lock:
+            self._stopped = True
+            self._iterator.close()
+
+
+class AsyncPlanner:
+    """Runs plan searches for asyncio code on a shared, bounded executor.
+
+    executor must be thread-based (the search is a chain of generators);
+    by default the planner owns a ThreadPoolExecutor of max_workers.
+    max_concurrency bounds how many search steps run at once across all
+    queries on this planner (default: the number of CPUs).
+    """
+
+    def __init__(self, executor=None, *, max_workers=None, max_concurrency=None):
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="crafting-process"
+        )
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        # asyncio primitives belong to one loop; keep a semaphore per loop so
+        # a planner can outlive asyncio.run() calls.
+        self._slots = weakref.WeakKeyDictionary()
+
+    async def _step(self, search):
+        loop = asyncio.get_running_loop()
+        slots = self._slots.get(loop)
+        if slots is None:
+            slots = self._slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        async with slots:
+            return await loop.run_in_executor(self._executor, search.step)
+
+    async def results(self, library, transfer, *, milp_options=None, **production_graphs_kwargs):
+        """Async iterator over analyzed PlanResults, in analyze_graphs order."""
+        if isinstance(transfer, str):
+            transfer = Ingredients.parse(transfer)
+        graphs = production_graphs(library, transfer, **production_graphs_kwargs)
+        search = _Search(analyze_graphs(graphs, milp_options=milp_options))
+        try:
+            while True:
+                result = await self._step(search)
+                if result is _DONE:
+                    return
+                yield result
+        finally:
+            try:
+                self._executor.submit(search.close)
+            except RuntimeError:  # the executor is shut down: no step in flight
+                search.close()
+
+    async def plan(
+        self,
+        library,
+        transfer,
+        *,
+        num_keep=5,
+        sort_key=None,
+        reverse=False,
+        milp_options=None,
+        **production_graphs_kwargs,
+    ):
+        """Awaitable plan(): same arguments, same ranking, same results."""
+        top = _TopK(num_keep, sort_key or _default_sort_key, reverse=reverse)
+        results = self.results(
+            library, transfer, milp_options=milp_options, **production_graphs_kwargs
+        )
+        try:
+            async for result in results:
+                top.push(result)
+        finally:
+            await results.aclose()
+        return top.items()
+
+    def shutdown(self, wait=True):
+        if self._owns_executor:
+            self._executor.shutdown(wait=wait)
+
+
+_default_planner = None
+
+
+def _planner():
+    global _default_planner
+    if _default_planner is None:
+        _default_planner = AsyncPlanner()
+    return _default_planner
+
+
+async def plan_async(library, transfer, *, planner=None, **kwargs):
+    """await plan(...) on planner, or on a shared default AsyncPlanner."""
+    return await (planner or _planner()).plan(library, transfer, **kwargs)
+
+
+def analyze_async(library, transfer, *, planner=None, **kwargs):
+    """Async iterator over analyzed PlanResults; see AsyncPlanner.results."""
+    return (planner or _planner()).results(library, transfer, **kwargs)
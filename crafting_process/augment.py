@@ -1,65 +1,257 @@
 from cytoolz import curry
 
+from .process import Ingredients
+
+
+class Affine:
+    """A declarative augment: one affine map on a process's numbers.
+
+        duration' = duration * duration_mul / duration_div   (None stays None)
+        inputs'   = S_in(inputs) + input_offset + duration * input_rate_offset
+        outputs'  = S_out(outputs) + output_offset + duration * output_rate_offset
+
+    where S scales every component by the uniform scale and, for kinds listed
+    in kind_scale, additionally by that kind's factor.  Rate offsets use the
+    duration going into the augment.  Chains of Affines fuse (see then) so a
+    whole augment pipeline is applied with one copy per process.
+    """
+
+    __slots__ = (
+        "duration_mul",
+        "duration_div",
+        "input_scale",
+        "input_kind_scale",
+        "input_offset",
+        "input_rate_offset",
+        "output_scale",
+        "output_kind_scale",
+        "output_offset",
+        "output_rate_offset",
+    )
+
+    def __init__(
+        self,
+        duration_mul=1,
+        duration_div=1,
+        input_scale=1,
+        input_kind_scale=None,
+        input_offset=None,
+        input_rate_offset=None,
+        output_scale=1,
+        output_kind_scale=None,
+        output_offset=None,
+        output_rate_offset=None,
+    ):
+        self.duration_mul = duration_mul
+        self.duration_div = duration_div
+        self.input_scale = input_scale
+        self.input_kind_scale = dict(input_kind_scale or {})
+        self.input_offset = input_offset
+        self.input_rate_offset = input_rate_offset
+        self.output_scale = output_scale
+        self.output_kind_scale = dict(output_kind_scale or {})
+        self.output_offset = output_offset
+        self.output_rate_offset = output_rate_offset
+
+    def __call__(self, p):
+        return self.apply(p)
+
+    def __repr__(self):
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}"
+            for name in self.__slots__
+            if getattr(self, name) not in (None, 1, {})
+        )
+        return f"Affine({fields})"
+
+    def then(self, other):
+        """The Affine equivalent to applying self, then other."""
+        duration_scale = self.duration_mul / self.duration_div
+        return Affine(
+            duration_mul=self.duration_mul * other.duration_mul,
+            duration_div=self.duration_div * other.duration_div,
+            input_scale=self.input_scale * other.input_scale,
+            input_kind_scale=_compose_kind_scale(
+                self.input_kind_scale, other.input_kind_scale
+            ),
+            input_offset=_add(
+                _scaled(self.input_offset, other.input_scale, other.input_kind_scale),
+                other.input_offset,
+            ),
+            input_rate_offset=_add(
+                _scaled(
+                    self.input_rate_offset, other.input_scale, other.input_kind_scale
+                ),
+                _scaled(other.input_rate_offset, duration_scale),
+            ),
+            output_scale=self.output_scale * other.output_scale,
+            output_kind_scale=_compose_kind_scale(
+                self.output_kind_scale, other.output_kind_scale
+            ),
+            output_offset=_add(
+                _scaled(self.output_offset, other.output_scale, other.output_kind_scale),
+                other.output_offset,
+            ),
+            output_rate_offset=_add(
+                _scaled(
+                    self.output_rate_offset, other.output_scale, other.output_kind_scale
+                ),
+                _scaled(other.output_rate_offset, duration_scale),
+            ),
+        )
+
+    def apply(self, p, **overrides):
+        """Return the augmented copy of p; overrides are passed to p.copy."""
+        duration = p.duration
+        if duration is not None and (self.duration_mul != 1 or self.duration_div != 1):
+            duration = duration * self.duration_mul / self.duration_div
+        return p.copy(
+            inputs=_affine(
+                p.inputs,
+                self.input_scale,
+                self.input_kind_scale,
+                self.input_offset,
+                self.input_rate_offset,
+                p.duration,
+            ),
+            outputs=_affine(
+                p.outputs,
+                self.output_scale,
+                self.output_kind_scale,
+                self.output_offset,
+                self.output_rate_offset,
+                p.duration,
+            ),
+            duration=duration,
+            **overrides,
+        )
+
+
+def _compose_kind_scale(first, second):
+    kinds = set(first) | set(second)
+    return {k: first.get(k, 1) * second.get(k, 1) for k in kinds}
+
+
+def _scaled(vec, scale, kind_scale=None):
+    if vec is None:
+        return None
+    if scale == 1 and not kind_scale:
+        return vec
+    kind_scale = kind_scale or {}
+    return Ingredients.from_triples(
+        [
+            (name, coef * scale * kind_scale.get(name, 1), basis)
+            for (name, coef, basis) in vec.triples()
+        ]
+    )
+
+
+def _add(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a + b
+
+
+def _affine(vec, scale, kind_scale, offset, rate_offset, duration):
+    if scale == 1 and not kind_scale and offset is None and rate_offset is None:
+        return vec
+    if rate_offset is not None and duration is None:
+        raise ValueError("Process which has no duration cannot take a rate offset")
+    # Accumulate every term per kind and build the result vector once.
+    terms = {}
+    for (name, coef, basis) in vec.triples():
+        factor = scale * kind_scale[name] if name in kind_scale else scale
+        terms[name] = [coef * factor, basis]
+    for (extra, mul) in ((offset, 1), (rate_offset, duration)):
+        if extra is None:
+            continue
+        for (name, coef, basis) in extra.triples():
+            if name in terms:
+                terms[name][0] = terms[name][0] + mul * coef
+            else:
+                terms[name] = [mul * coef, basis]
+    return Ingredients.from_triples(
+        [(name, coef, basis) for (name, (coef, basis)) in terms.items()]
+    )
+
 
 class Augments:
 
     @classmethod
     def composed(cls, augs):
+        """Apply augs left to right.
+
+        Adjacent Affine augments fuse into one; if every augment is an Affine
+        the result is itself a single Affine.  Other callables run as-is.
+        """
+        stages = []
+        for aug in augs:
+            if isinstance(aug, Affine) and stages and isinstance(stages[-1], Affine):
+                stages[-1] = stages[-1].then(aug)
+            else:
+                stages.append(aug)
+
+        if len(stages) == 1 and isinstance(stages[0], Affine):
+            return stages[0]
+
         def _composed(p):
             p1 = p
-            for aug in augs:
+            for aug in stages:
                 p1 = aug(p1)
             return p1
 
         return _composed
 
     @classmethod
-    @curry
-    def mul_duration(cls, mul, p):
-        if p.duration is None:
-            return p
-        return p.copy(duration=mul * p.duration)
+    def apply(cls, aug, p, **overrides):
+        """Apply aug to p, folding overrides (e.g. applied_augments) into the same copy."""
+        if isinstance(aug, Affine):
+            return aug.apply(p, **overrides)
+        return aug(p).copy(**overrides)
 
     @classmethod
-    @curry
-    def mul_speed(cls, denom, p):
-        if p.duration is None:
-            return p
-        return p.copy(duration=p.duration / denom)
+    def mul_duration(cls, mul, p=None):
+        aug = Affine(duration_mul=mul)
+        return aug if p is None else aug.apply(p)
 
     @classmethod
-    @curry
-    def mul_inputs(cls, mul, p):
-        return p.copy(inputs=mul * p.inputs)
+    def mul_speed(cls, denom, p=None):
+        aug = Affine(duration_div=denom)
+        return aug if p is None else aug.apply(p)
 
     @classmethod
-    @curry
-    def mul_outputs(cls, mul, p):
-        return p.copy(outputs=mul * p.outputs)
+    def mul_inputs(cls, mul, p=None):
+        aug = Affine(input_scale=mul)
+        return aug if p is None else aug.apply(p)
 
     @classmethod
-    @curry
-    def add_input(cls, more_in, p):
-        return p.copy(inputs=p.inputs + more_in)
+    def mul_outputs(cls, mul, p=None):
+        aug = Affine(output_scale=mul)
+        return aug if p is None else aug.apply(p)
 
     @classmethod
-    @curry
-    def add_input_rate(cls, more_in, p):
-        return p.copy(inputs=p.inputs + p.duration * more_in)
+    def add_input(cls, more_in, p=None):
+        aug = Affine(input_offset=more_in)
+        return aug if p is None else aug.apply(p)
 
     @classmethod
-    @curry
-    def add_output(cls, more_out, p):
-        return p.copy(outputs=p.outputs + more_out)
+    def add_input_rate(cls, more_in, p=None):
+        aug = Affine(input_rate_offset=more_in)
+        return aug if p is None else aug.apply(p)
 
     @classmethod
-    @curry
-    def add_output_rate(cls, more_out, p):
-        return p.copy(outputs=p.outputs + p.duration * more_out)
+    def add_output(cls, more_out, p=None):
+        aug = Affine(output_offset=more_out)
+        return aug if p is None else aug.apply(p)
+
+    @classmethod
+    def add_output_rate(cls, more_out, p=None):
+        aug = Affine(output_rate_offset=more_out)
+        return aug if p is None else aug.apply(p)
 
     @classmethod
     @curry
-    def increase_energy_pct(cls, kind, pct, p):
-        if kind in p.inputs.nonzero_components:
-            return p.copy(inputs=p.inputs + (pct / 100) * p.inputs.project(kind))
-        return p
+    def increase_energy_pct(cls, kind, pct):
+        return Affine(input_kind_scale={kind: 1 + pct / 100})
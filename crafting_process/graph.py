@@ -2,6 +2,7 @@ import itertools
 
 from coolname import generate_slug
 
+from .kinds import KINDS
 from .utils import only
 
 
@@ -13,11 +14,19 @@ class GraphBuilder:
         self.pool_aliases = {}
         self.open_inputs = []
         self.open_outputs = []
+        self._depth_cache = None  # see _depths
+        self._matrix_cache = None  # see build_exchange_matrix
 
     def __repr__(self):
         node_s = "nodes" if len(self.processes) > 1 else "node"
         return f"<{self.__class__.__name__} " f"[{len(self.processes)} {node_s}]>"
 
+    def __getstate__(self):
+        # The matrix is dense and cheap to rebuild; keep it out of pickles.
+        state = dict(self.__dict__)
+        state["_matrix_cache"] = None
+        return state
+
     @classmethod
     def from_process(cls, process, name=None):
         g = cls()
@@ -34,6 +43,39 @@ class GraphBuilder:
         new.open_outputs = left.open_outputs + right.open_outputs
         return new
 
+    def with_process(self, process_name, process):
+        """Return a copy of this graph with one process swapped out.
+
+        The replacement must have the same input and output kinds as the
+        original so that the pools and open ports stay valid; only the
+        coefficients change.  Used to re-target the sink process without
+        re-enumerating the graph.  The copy keeps this graph's process depths
+        and exchange matrix, recomputing only the swapped process's column.
+        """
+        new = type(self)()
+        new.processes = {**self.processes, process_name: process}
+        new.pools = dict(self.pools)
+        new.pool_aliases = dict(self.pool_aliases)
+        new.open_inputs = list(self.open_inputs)
+        new.open_outputs = list(self.open_outputs)
+        if process_name not in self.processes:
+            return new
+        depths = getattr(self, "_depth_cache", None)
+        if depths is not None and depths[0] == self._structure_key():
+            # Depths by name carry over; by description may not.
+            new._depth_cache = (depths[0], depths[1], {})
+        matrix = getattr(self, "_matrix_cache", None)
+        if matrix is not None and matrix[0] == self._matrix_key():
+            (processes, pools, rows) = matrix[1]
+            rows = [list(row) for row in rows]
+            j = processes.index(process_name)
+            exchange = process.exchange_by_id
+            for (row, pool) in zip(rows, self.pools.values()):
+                if process_name in pool["inputs"] or process_name in pool["outputs"]:
+                    row[j] = exchange.get(KINDS.id(pool["kind"]), 0)
+            new._matrix_cache = (new._matrix_key(), (processes, pools, rows))
+        return new
+
     def unify(self, other):
         self.processes.update(other.processes)
         self.pools.update(other.pools)
@@ -388,70 +430,157 @@ class GraphBuilder:
 
         Works for both BatchProcess (exchange = transfer) and ContinuousProcess
         (exchange = transfer_rate), replacing the separate build_batch_matrix
-        and build_matrix methods.
+        and build_matrix methods.  Cached until the graph's structure or any
+        of its process objects change; callers get fresh lists.
         """
-        matrix = []
-
-        pool_items = list(self.pools.items())
-        pools = [p for (p, _) in pool_items]
-        process_items = list(self.processes.items())
-        processes = [p for (p, _) in process_items]
-
-        for pool_name, pool in pool_items:
-            kind = pool["kind"]
-            row = []
+        key = self._matrix_key()
+        cache = getattr(self, "_matrix_cache", None)  # absent on older pickles
+        if cache is None or cache[0] != key:
+            cache = self._matrix_cache = (key, self._exchange_rows())
+        (processes, pools, rows) = cache[1]
+        return {
+            "matrix": [list(row) for row in rows],
+            "processes": list(processes),
+            "pools": list(pools),
+        }
 
-            for process_name, process in process_items:
-                if process_name in pool["inputs"] or process_name in pool["outputs"]:
-                    row.append(process.exchange[kind])
-                else:
-                    row.append(0)
+    def _matrix_key(self):
+        # The graph holds its processes, so their ids are stable while cached.
+        return (self._structure_key(), tuple(map(id, self.processes.values())))
 
+    def _exchange_rows(self):
+        processes = list(self.processes)
+        column = {name: j for (j, name) in enumerate(processes)}
+        matrix = []
+        for pool in self.pools.values():
+            kind = KINDS.id(pool["kind"])  # registers kinds of graphs built by hand
+            row = [0] * len(processes)
+            for name in pool["inputs"] + pool["outputs"]:
+                j = column.get(name)
+                if j is not None:
+                    row[j] = self.processes[name].exchange_by_id.get(kind, 0)
             matrix.append(row)
-
-        return {
-            "matrix": matrix,
-            "processes": processes,
-            "pools": pools,
-        }
+        return (processes, list(self.pools), matrix)
 
     def process_depths(self):
-        terminal_edges = self.open_outputs
-        input_processes = [process_name for (process_name, _) in terminal_edges]
-        other = itertools.chain.from_iterable(
-            self._process_depths(inp, depth=0) for inp in input_processes
-        )
-        return dict(other)
+        """Longest distance, in process hops, from each process to an open output.
 
-    def _process_depths(self, process_name, depth=0):
-        input_pools = [
-            pool
-            for pool in self.pools.values()
-            if process_name in pool.get("outputs", [])
-        ]
-        input_processes = list(
-            itertools.chain.from_iterable(pool["inputs"] for pool in input_pools)
-        )
-        other = list(
-            itertools.chain.from_iterable(
-                self._process_depths(inp, depth=depth + 1) for inp in input_processes
-            )
+        A process is one deeper than the deepest process it feeds; processes
+        feeding nothing are at depth 0.  Processes on a cycle share the
+        depth of their strongly connected component.  O(V + E), and cached
+        until the graph's pools or processes change.
+        """
+        return dict(self._depths()[0])
+
+    def _structure_key(self):
+        # Pool dicts are shared between graphs built from one another, so a
+        # graph can change without one of its own methods running; compare
+        # the wiring itself instead of relying on invalidation.  Each pool's
+        # producers and consumers spell out its edges without the cross product.
+        return (
+            tuple(self.processes),
+            tuple(self.open_outputs),
+            tuple(
+                (p["kind"], tuple(p["inputs"]), tuple(p["outputs"]))
+                for p in self.pools.values()
+            ),
         )
-        max_depth = max([depth for (p, depth) in other if p == process_name] + [depth])
-        return [(process_name, max_depth)] + [
-            (p, d) for (p, d) in other if p != process_name
-        ]
+
+    def _depths(self):
+        key = self._structure_key()
+        cache = getattr(self, "_depth_cache", None)  # absent on older pickles
+        if cache is None or cache[0] != key:
+            cache = self._depth_cache = (key, _longest_upstream(self), {})
+        return cache[1:]
 
     def output_depths(self):
-        depths = self.process_depths()
+        """Deepest process_depths value per process description (cached)."""
+        (depths, by_description) = self._depths()
+        if by_description:
+            return dict(by_description)
 
         # FIXME: This finds the deepest output process per pool, but do we want
         # the deepest input process?  If an output is just going nowhere and
         # not being consumed, that output doesn't need to be "ready" for
         # anybody.
-        out = {}
         for process_name, process in self.processes.items():
             output_desc = process.describe()
-            out[output_desc] = max(out.get(output_desc, -1), depths[process_name])
+            by_description[output_desc] = max(
+                by_description.get(output_desc, -1), depths[process_name]
+            )
 
-        return out
+        return dict(by_description)
+
+
+def _upstream(graph):
+    """process name -> names of the processes feeding it through pools."""
+    upstream = {name: [] for name in graph.processes}
+    for pool in graph.pools.values():
+        for producer in pool["inputs"]:
+            upstream.setdefault(producer, [])
+        for consumer in pool["outputs"]:
+            upstream.setdefault(consumer, []).extend(pool["inputs"])
+    return upstream
+
+
+def _longest_upstream(graph):
+    upstream = _upstream(graph)
+    (components, component_of) = _strongly_connected(upstream)
+    # Tarjan emits a component after everything upstream of it, so reversed
+    # emission order visits every consumer before the processes feeding it.
+    depth = [0] * len(components)
+    for c in reversed(range(len(components))):
+        for p in components[c]:
+            for q in upstream[p]:
+                d = component_of[q]
+                if d != c and depth[d] < depth[c] + 1:
+                    depth[d] = depth[c] + 1
+    return {p: depth[component_of[p]] for p in upstream}
+
+
+def _strongly_connected(edges):
+    """Tarjan's algorithm without recursion.
+
+    Returns (components, component number of each node); components come
+    out in reverse topological order of edges.
+    """
+    index = {}
+    low = {}
+    on_stack = set()
+    stack = []
+    components = []
+    component_of = {}
+    for root in edges:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(edges[root]))]
+        while work:
+            (node, successors) = work[-1]
+            for succ in successors:
+                if succ not in index:
+                    index[succ] = low[succ] = len(index)
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(edges[succ])))
+                    break
+                if succ in on_stack:
+                    low[node] = min(low[node], index[succ])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component_of[member] = len(components)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return (components, component_of)
@@ -0,0 +1,68 @@
+"""Process-wide interning of ingredient kind names.
+
+Kinds are strings at every public surface (Ingredients components, pool
+kinds, open ports, PlanResult fields, the DSL).  KINDS gives each registered
+name one canonical string object and a small integer id:
+
+    KINDS.id("iron")       # registers "iron"; 0, 1, ... in first-seen order
+    KINDS.find("iron")     # its id, or None if never registered
+    KINDS.intern("iron")   # the canonical "iron" if registered, else the name
+    KINDS.name(3)          # back to the name, for display
+
+The table only grows, so only recipe kinds are registered: ProcessLibrary
+registers the kinds of every recipe it stores, and the graph's matrix
+builder those of its pools (which are always some process's output).
+Parsing a transfer never registers anything, so a long-lived server that
+parses arbitrary client queries keeps a table bounded by its libraries.
+
+Ingredients interns the names it is built from, so the kinds flowing
+through libraries and graphs are the same objects and compare by identity.
+Code that indexes arrays or dicts by kind (Process.exchange_by_id and the
+graph's matrix builders) uses the integer ids.
+"""
+
+import sys
+import threading
+
+
+class KindTable:
+
+    def __init__(self):
+        self._ids = {}  # name -> id; the keys are the canonical names
+        self._names = []  # id -> name
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def id(self, name):
+        """The id of name, registering it with the next id on first sight."""
+        i = self._ids.get(name)
+        if i is None:
+            with self._lock:
+                i = self._ids.get(name)
+                if i is None:
+                    i = len(self._names)
+                    if type(name) is str:
+                        name = sys.intern(name)
+                    self._names.append(name)
+                    self._ids[name] = i
+        return i
+
+    def find(self, name):
+        """The id of name, or None if it is not registered."""
+        return self._ids.get(name)
+
+    def name(self, i):
+        return self._names[i]
+
+    def intern(self, name):
+        """The canonical object for name if it is registered, else name itself."""
+        i = self._ids.get(name)
+        return name if i is None else self._names[i]
+
+
+KINDS = KindTable()
@@ -1,5 +1,8 @@
+import bisect
 import json
 import re
+import threading
+from collections.abc import Mapping
 
 from cytoolz import curry
 
@@ -8,7 +11,9 @@ from .process import Ingredients
 from .process import Process
 from .process import BatchProcess
 from .process import ContinuousProcess
+from .augment import Affine
 from .augment import Augments
+from .kinds import KINDS
 
 
 def parse_process(s):
@@ -247,24 +252,81 @@ class ProcessPredicates(Predicates):
         v = process.annotations.get(key)
         return v is not None and pred(v)
 
+    @classmethod
+    @curry
+    def annotation_equals(cls, key, value, process):
+        return key in process.annotations and process.annotations[key] == value
+
+    @classmethod
+    @curry
+    def annotation_in_range(cls, key, lo, hi, process):
+        v = process.annotations.get(key)
+        return (
+            _is_number(v)
+            and (lo is None or v >= lo)
+            and (hi is None or v <= hi)
+        )
+
+    @classmethod
+    @curry
+    def has_augment(cls, name, process):
+        return name in process.applied_augments
+
 
 class Pred:
-    """A composable process predicate. Supports &, |, ~ operators."""
+    """A composable process predicate. Supports &, |, ~ operators.
+
+    Besides the callable, a Pred may carry an expression-tree node that
+    ProcessLibrary answers from its indexes instead of calling it per
+    process:
+
+        ("key", index_key)    recipes listed under index_key
+        ("range", key, lo, hi)  numeric annotation key within [lo, hi]
+        ("and", a, b), ("or", a, b), ("not", a)
+
+    A Pred without a node (e.g. wrapping an arbitrary callable) is opaque and
+    is only evaluated on the candidates the rest of the expression leaves.
+    """
 
-    def __init__(self, fn):
+    def __init__(self, fn, node=None):
         self._fn = fn
+        self.node = node
 
     def __call__(self, process):
         return self._fn(process)
 
     def __and__(self, other):
-        return Pred(lambda p: self(p) and other(p))
+        other = _as_pred(other)
+        return Pred(lambda p: self(p) and other(p), ("and", self, other))
 
     def __or__(self, other):
-        return Pred(lambda p: self(p) or other(p))
+        other = _as_pred(other)
+        return Pred(lambda p: self(p) or other(p), ("or", self, other))
 
     def __invert__(self):
-        return Pred(lambda p: not self(p))
+        return Pred(lambda p: not self(p), ("not", self))
+
+
+def _as_pred(fn):
+    return fn if isinstance(fn, Pred) else Pred(fn)
+
+
+def _is_number(value):
+    # bool is an int subclass but tier=true is a flag, not a number; NaN has
+    # no place in a sorted index.
+    return (
+        isinstance(value, (int, float))
+        and not isinstance(value, bool)
+        and value == value
+    )
+
+
+def _hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
 
 
 class P:
@@ -272,24 +334,35 @@ class P:
 
     @staticmethod
     def produces(kind):
-        return Pred(ProcessPredicates.outputs_part(kind))
+        return Pred(ProcessPredicates.outputs_part(kind), ("key", ("out", kind)))
 
     @staticmethod
     def consumes(kind):
-        return Pred(ProcessPredicates.requires_part(kind))
+        return Pred(ProcessPredicates.requires_part(kind), ("key", ("in", kind)))
 
     @staticmethod
     def process_is(name):
-        return Pred(ProcessPredicates.uses_process(name))
+        return Pred(ProcessPredicates.uses_process(name), ("key", ("process", name)))
 
     @staticmethod
     def has_augment(name):
-        return Pred(lambda p: name in p.applied_augments)
+        return Pred(ProcessPredicates.has_augment(name), ("key", ("augment", name)))
 
     @staticmethod
     def annotation(key, pred):
         return Pred(ProcessPredicates.annotation_matches(key, pred))
 
+    @staticmethod
+    def annotation_eq(key, value):
+        fn = ProcessPredicates.annotation_equals(key, value)
+        return Pred(fn, ("key", ("ann", key, value)) if _hashable(value) else None)
+
+    @staticmethod
+    def annotation_between(key, lo=None, hi=None):
+        """Numeric annotation at key with lo <= value <= hi (None = unbounded)."""
+        fn = ProcessPredicates.annotation_in_range(key, lo, hi)
+        return Pred(fn, ("range", key, lo, hi))
+
 
 class GraphPredicates(Predicates):
 
@@ -438,6 +511,164 @@ def parse_augments(lines):
     return augments_from_records(records)
 
 
+class _RecipeIndex:
+    """Bitmask indexes over a library's recipes.
+
+    Each recipe gets a bit position in insertion order; every index key maps
+    to the int whose set bits are the recipes listed under it:
+
+        ("out", kind), ("in", kind)   nonzero outputs / inputs
+        ("process", name)             Process.process
+        ("augment", name)             each applied augment
+        ("ann", key, value)           hashable annotation values
+
+    Numeric annotation values are also kept per key as (value, position)
+    pairs, sorted on the first range query after a change, so
+    range_mask answers in O(log n + k).
+
+    Queries may run on several threads at once (see asynchronous.py); the
+    lazy steps that change an index take _INDEX_LOCK.
+    """
+
+    def __init__(self, recipes):
+        self.stamp = 0  # recipes.mutations this index reflects, see ProcessLibrary
+        self.names = []
+        self.positions = {}
+        self.buckets = {}
+        self.augments = set()
+        self.numeric = {}  # annotation key -> [(value, position)]
+        self._unsorted = set()  # numeric keys appended to since the last sort
+        self.views = {}  # membership mask -> LibraryView, see ProcessLibrary._subset
+        self.all = 0
+        for (name, proc) in recipes.items():
+            self.add(name, proc)
+
+    def add(self, name, proc):
+        pos = len(self.names)
+        self.names.append(name)
+        self.positions[name] = pos
+        bit = 1 << pos
+        self.all |= bit
+        for key in self._keys(proc):
+            self.buckets[key] = self.buckets.get(key, 0) | bit
+        for (key, value) in proc.annotations.items():
+            if _is_number(value):
+                self.numeric.setdefault(key, []).append((value, pos))
+                self._unsorted.add(key)
+
+    def _keys(self, proc):
+        for kind in proc.outputs.nonzero_components:
+            yield ("out", kind)
+        for kind in proc.inputs.nonzero_components:
+            yield ("in", kind)
+        yield ("process", proc.process)
+        for aug in set(proc.applied_augments):
+            self.augments.add(aug)
+            yield ("augment", aug)
+        for (key, value) in proc.annotations.items():
+            if _hashable(value):
+                yield ("ann", key, value)
+
+    def mask(self, key):
+        return self.buckets.get(key, 0)
+
+    def view(self, mask, make):
+        view = self.views.get(mask)
+        if view is None:
+            with _INDEX_LOCK:
+                view = self.views.get(mask)
+                if view is None:
+                    view = make()
+                    if len(self.views) >= _MAX_VIEWS:
+                        del self.views[next(iter(self.views))]  # oldest first
+                    self.views[mask] = view
+        return view
+
+    def range_mask(self, key, lo=None, hi=None):
+        if key in self._unsorted:
+            with _INDEX_LOCK:
+                if key in self._unsorted:
+                    # Publish a sorted copy: a reader may hold the old list.
+                    self.numeric[key] = sorted(self.numeric[key])
+                    self._unsorted.discard(key)
+        entries = self.numeric.get(key, [])
+        start = 0 if lo is None else bisect.bisect_left(entries, lo, key=_first)
+        stop = len(entries) if hi is None else bisect.bisect_right(entries, hi, key=_first)
+        return self.mask_of_positions(pos for (_, pos) in entries[start:stop])
+
+    def names_in(self, mask):
+        """Names of the recipes in mask, in insertion order."""
+        bits = bin(mask)[:1:-1]  # least significant bit first
+        names = self.names
+        i = bits.find("1")
+        while i != -1:
+            yield names[i]
+            i = bits.find("1", i + 1)
+
+    def mask_of(self, names):
+        positions = self.positions
+        return self.mask_of_positions(positions[name] for name in names)
+
+    def mask_of_positions(self, positions):
+        flags = bytearray((len(self.names) + 7) // 8)
+        for pos in positions:
+            flags[pos >> 3] |= 1 << (pos & 7)
+        return int.from_bytes(flags, "little")
+
+
+def _first(pair):
+    return pair[0]
+
+
+_MAX_VIEWS = 64
+
+# Guards the lazily built index state shared by a library, its views and
+# federations: index (re)builds, view creation, range sorts and federation
+# merges.  One re-entrant lock for all of them, because those builds call
+# into each other (a view's parent, a federation's members).
+_INDEX_LOCK = threading.RLock()
+
+
+class _RecipeDict(dict):
+    """A ProcessLibrary's name -> process dict; counts writes so the index sees them."""
+
+    mutations = 0
+
+    def __setitem__(self, name, process):
+        super().__setitem__(name, process)
+        self.mutations += 1
+
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        self.mutations += 1
+
+    def __ior__(self, other):
+        result = super().__ior__(other)
+        self.mutations += 1
+        return result
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.mutations += 1
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self.mutations += 1
+        return super().setdefault(name, default)
+
+    def pop(self, *args):
+        self.mutations += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self.mutations += 1
+        return super().popitem()
+
+    def clear(self):
+        super().clear()
+        self.mutations += 1
+
+
 class ProcessLibrary:
 
     def __init__(self, mode, recipes=None, text=None, path=None, augments=None):
@@ -450,6 +681,8 @@ class ProcessLibrary:
         self.mode = mode
         self.recipes = recipes or {}
         self.names = set(recipes.keys()) if recipes else set()
+        self._index = None
+        self._version = 0  # bumped on every _put / register_augment
         self._augments = {}
         if augments:
             for name, fn in augments.items():
@@ -460,6 +693,17 @@ class ProcessLibrary:
         elif text is not None:
             self.add_from_text(text)
 
+    @property
+    def recipes(self):
+        return self._recipes
+
+    @recipes.setter
+    def recipes(self, recipes):
+        # Wrapped so that writes made straight to the dict invalidate the index.
+        if not isinstance(recipes, _RecipeDict):
+            recipes = _RecipeDict(recipes)
+        self._recipes = recipes
+
     @property
     def process_class(self):
         return BatchProcess if self.mode == "batch" else ContinuousProcess
@@ -470,12 +714,16 @@ class ProcessLibrary:
 
     def register_augment(self, name, fn):
         self._augments[name] = fn
+        self._version += 1
 
     #
     # Add recipes
     #
 
     def add_from_text(self, text):
+        # One fused pipeline per distinct augment sequence, shared by every
+        # recipe that uses it.
+        pipelines = {}
         for spec in specs_from_lines(text.splitlines()):
             inline_augments = spec.get("inline_augments", [])
             # augment_seqs is a list of lists; each inner list is one variant's augment names
@@ -486,23 +734,87 @@ class ProcessLibrary:
 
             base = process_from_spec_dict(spec, process_class=self.process_class)
             base_name = self.mkname(base)
-            self.recipes[base_name] = base
+            self._put(base_name, base)
 
             for aug_names in augment_seqs:
-                fns = [self._augments[n] for n in aug_names]
-                augmented = Augments.composed(fns)(base)
-                # Always create a fresh copy with the updated applied_augments so we
-                # never mutate the base process (matters when the augment fn returns p
-                # unchanged, e.g. mul_speed on a batch-only process with no duration).
-                augmented = augmented.copy(
-                    applied_augments=base.applied_augments + aug_names
+                key = tuple(aug_names)
+                if key not in pipelines:
+                    pipelines[key] = Augments.composed(
+                        [self._augments[n] for n in aug_names]
+                    )
+                # Always produce a fresh copy with the updated applied_augments so
+                # we never mutate the base process (matters when a custom augment
+                # returns p unchanged); for fused built-ins this is the only copy.
+                augmented = Augments.apply(
+                    pipelines[key],
+                    base,
+                    applied_augments=base.applied_augments + aug_names,
                 )
                 suffix = " ".join(f"@{n}" for n in aug_names)
                 aug_name = self._unique_name(f"{base_name} {suffix}")
-                self.recipes[aug_name] = augmented
+                self._put(aug_name, augmented)
 
         return self
 
+    def add_augmented_variants(self, augment_seqs, pred=None):
+        """Add one variant of every original recipe per augment-name sequence.
+
+        augment_seqs is a list of lists of registered augment names, like the
+        lines of an @-block; pred optionally restricts which originals get
+        variants.  Sequences made only of built-in (Affine) augments are
+        evaluated for all recipes at once on a RecipeTable; others fall back
+        to one call per process.  Variants are named as in add_from_text.
+        """
+        bases = [
+            (name, proc)
+            for (name, proc) in list(self.recipes.items())
+            if not proc.applied_augments and (pred is None or pred(proc))
+        ]
+        if not bases:
+            return self
+
+        table = None
+        for aug_names in augment_seqs:
+            aug = Augments.composed([self._augments[n] for n in aug_names])
+            stamp = lambda proc: proc.applied_augments + list(aug_names)
+            if isinstance(aug, Affine):
+                if table is None:
+                    from .table import RecipeTable
+
+                    table = RecipeTable.from_processes(bases)
+                variants = table.augmented(aug).processes(applied_augments=stamp)
+            else:
+                variants = [
+                    Augments.apply(aug, proc, applied_augments=stamp(proc))
+                    for (_, proc) in bases
+                ]
+            suffix = " ".join(f"@{n}" for n in aug_names)
+            for ((base_name, _), variant) in zip(bases, variants):
+                self._put(self._unique_name(f"{base_name} {suffix}"), variant)
+
+        return self
+
+    def _put(self, name, process):
+        for vec in (process.outputs, process.inputs):
+            for (kind, _, _) in vec.triples():
+                KINDS.id(kind)  # recipe kinds get ids; query-only kinds never do
+        with _INDEX_LOCK:
+            recipes = self.recipes
+            index = self._index
+            current = index is not None and index.stamp == recipes.mutations
+            replaced = name in recipes
+            recipes[name] = process
+            if replaced:
+                self._index = None  # a replaced recipe may change every bucket
+            elif current:
+                index.add(name, process)
+                index.stamp = recipes.mutations
+            self._version += 1
+
+    def _state(self):
+        # mutations catches recipes written to the dict directly.
+        return (self._version, self.recipes.mutations)
+
     def _unique_name(self, candidate):
         if candidate not in self.names:
             self.names.add(candidate)
@@ -522,45 +834,96 @@ class ProcessLibrary:
     # Lookup
     #
 
-    def _filter_items(self, pred):
-        return [(n, r) for (n, r) in self.recipes.items() if pred(r)]
+    def recipe_index(self):
+        """The library's _RecipeIndex, built on first use.
+
+        Kept up to date by add_from_text/add_augmented_variants; rebuilt if
+        a recipe was replaced or the recipes dict was changed directly.
+        """
+        index = self._index
+        if index is None or index.stamp != self.recipes.mutations:
+            with _INDEX_LOCK:
+                recipes = self.recipes
+                index = self._index
+                if index is None or index.stamp != recipes.mutations:
+                    index = _RecipeIndex(recipes)
+                    index.stamp = recipes.mutations
+                    self._index = index  # published only once complete
+        return index
+
+    def select(self, pred, candidates=None):
+        """Bitmask (see recipe_index) of the candidates for which pred holds."""
+        index = self.recipe_index()
+        if candidates is None:
+            candidates = self._members()
+        node = getattr(pred, "node", None)
+        if not candidates:
+            return 0
+        if node is None:
+            return index.mask_of(
+                n for n in index.names_in(candidates) if pred(self.recipes[n])
+            )
+        op = node[0]
+        if op == "key":
+            return candidates & index.mask(node[1])
+        if op == "range":
+            return candidates & index.range_mask(*node[1:])
+        if op == "and":
+            return self.select(node[2], self.select(node[1], candidates))
+        if op == "or":
+            first = self.select(node[1], candidates)
+            return first | self.select(node[2], candidates & ~first)
+        if op == "not":
+            return candidates & ~self.select(node[1], candidates)
+        raise ValueError(f"Unknown predicate node {op!r}")
+
+    def _members(self):
+        return self.recipe_index().all
+
+    def _items(self, mask):
+        recipes = self.recipes
+        return [(n, recipes[n]) for n in self.recipe_index().names_in(mask)]
+
+    def _lookup(self, key):
+        return self._items(self._members() & self.recipe_index().mask(key))
 
     def producing(self, resource):
-        return self._filter_items(ProcessPredicates.outputs_part(resource))
+        return self._lookup(("out", resource))
 
     def consuming(self, resource):
-        return self._filter_items(ProcessPredicates.requires_part(resource))
+        return self._lookup(("in", resource))
 
     def using(self, process):
-        return self._filter_items(ProcessPredicates.uses_process(process))
+        return self._lookup(("process", process))
+
+    def _subset(self, mask):
+        index = self.recipe_index()
+        return index.view(mask, lambda: LibraryView(self, mask))
 
     def with_augment_filter(self, skip_augments=None, only_augments=None):
-        skip_set = set(skip_augments or [])
-        only_set = set(only_augments) if only_augments is not None else None
-
-        def _keep(proc):
-            aug_set = set(proc.applied_augments)
-            if skip_set and aug_set & skip_set:
-                return False
-            if only_set is not None and not aug_set.issubset(only_set):
-                return False
-            return True
-
-        matching = {n: p for (n, p) in self.recipes.items() if _keep(p)}
-        result = ProcessLibrary(self.mode, recipes=matching)
-        result._augments = self._augments
-        return result
+        """LibraryView without the recipes carrying skipped or unlisted augments.
+
+        Original (unaugmented) recipes are always kept.  The same arguments
+        on an unchanged library return the same view.
+        """
+        index = self.recipe_index()
+        keep = self._members()
+        for aug in set(skip_augments or []):
+            keep &= ~index.mask(("augment", aug))
+        if only_augments is not None:
+            for aug in index.augments - set(only_augments):
+                keep &= ~index.mask(("augment", aug))
+        return self._subset(keep)
 
     def filter(self, pred):
-        """Return a new library containing only recipes where pred(process) is true.
+        """Return a LibraryView of the recipes where pred(process) is true.
 
-        pred can be any callable or a Pred built from the P namespace.
-        The augment registry is preserved on the returned library.
+        pred can be any callable or a Pred built from the P namespace; P
+        predicates and their &, |, ~ combinations are answered from the
+        library's indexes.  The augment registry is preserved on the
+        returned library.
         """
-        matching = {n: p for (n, p) in self.recipes.items() if pred(p)}
-        result = ProcessLibrary(self.mode, recipes=matching)
-        result._augments = self._augments
-        return result
+        return self._subset(self.select(pred))
 
     # Backwards-compatible alias
     filtered = filter
@@ -568,7 +931,9 @@ class ProcessLibrary:
     def __or__(self, other):
         """Merge two libraries. On name collision the right-hand library wins.
 
-        Raises ValueError if the two libraries have different modes.
+        Copies both libraries' recipes into a new, independent library; see
+        FederatedLibrary to layer many libraries without copying.  Raises
+        ValueError if the two libraries have different modes.
         """
         if self.mode != other.mode:
             raise ValueError(
@@ -579,3 +944,291 @@ class ProcessLibrary:
         result = ProcessLibrary(self.mode, recipes=merged)
         result._augments = {**self._augments, **other._augments}
         return result
+
+
+class _MemberRecipes(Mapping):
+    """Read-only name -> process mapping over the members of a LibraryView."""
+
+    def __init__(self, store, index, mask):
+        self._store = store
+        self._index = index
+        self._mask = mask
+        self._names = None
+
+    def __iter__(self):
+        return self._index.names_in(self._mask)
+
+    def __len__(self):
+        return self._mask.bit_count()
+
+    def __contains__(self, name):
+        if self._names is None:
+            self._names = frozenset(self)
+        return name in self._names
+
+    def __getitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        return self._store[name]
+
+    def __repr__(self):
+        return f"{type(self).__name__}({len(self)} recipes)"
+
+
+class LibraryView(ProcessLibrary):
+    """A read-only subset of a library that shares its storage and indexes.
+
+    Returned by filter and with_augment_filter.  A view holds only a
+    membership bitmask over its parent's recipe_index(); views of views
+    narrow the same mask, and lookups on a view are memoized.  A view keeps
+    the members it was made with: recipes added to the parent afterwards are
+    not members, so filter again to pick them up.  When the parent rebuilds
+    its index (a recipe was replaced), the view maps its members onto the
+    new index by name and drops its memoized lookups.
+    """
+
+    _version = 0
+
+    def __init__(self, parent, mask):
+        self.mode = parent.mode
+        self._augments = parent._augments
+        self._parent = parent
+        self._index = None
+        self._sync(parent.recipe_index(), mask)
+
+    def _sync(self, index, mask):
+        parent = self._parent
+        self._index = index
+        self._mask = mask
+        self._store = parent._store if isinstance(parent, LibraryView) else parent.recipes
+        self._recipes = _MemberRecipes(self._store, index, mask)
+        self._lookups = {}
+
+    @property
+    def recipes(self):
+        self.recipe_index()
+        return self._recipes
+
+    @property
+    def names(self):
+        return set(self.recipes)
+
+    def __repr__(self):
+        return f"LibraryView({self.mode!r}, {len(self.recipes)} recipes)"
+
+    def _state(self):
+        return self._parent._state()
+
+    def recipe_index(self):
+        index = self._parent.recipe_index()
+        if index is not self._index:
+            with _INDEX_LOCK:
+                if index is not self._index:
+                    positions = index.positions
+                    old = self._index.names_in(self._mask)
+                    self._sync(index, index.mask_of(n for n in old if n in positions))
+        return index
+
+    def _members(self):
+        self.recipe_index()
+        return self._mask
+
+    def _items(self, mask):
+        store = self._store
+        return [(n, store[n]) for n in self._index.names_in(mask)]
+
+    def _lookup(self, key):
+        self.recipe_index()
+        lookups = self._lookups  # a resync replaces it; never fill the new one
+        items = lookups.get(key)
+        if items is None:
+            items = lookups[key] = super()._lookup(key)
+        return list(items)
+
+    def register_augment(self, name, fn):
+        raise ValueError("LibraryView is read-only; register augments on its parent")
+
+    def _put(self, name, process):
+        raise ValueError("LibraryView is read-only; add recipes to its parent")
+
+
+class _FederatedRecipes(Mapping):
+    """Read-only name -> process mapping over a FederatedLibrary's winners."""
+
+    def __init__(self, federation):
+        self._federation = federation
+
+    def __iter__(self):
+        index = self._federation._index
+        return index.names_in(index.all)
+
+    def __len__(self):
+        return self._federation._index.all.bit_count()
+
+    def __contains__(self, name):
+        return name in self._federation._owner
+
+    def __getitem__(self, name):
+        federation = self._federation
+        return federation.members[federation._owner[name]].recipes[name]
+
+    def __repr__(self):
+        return f"{type(self).__name__}({len(self)} recipes)"
+
+
+_FEDERATIONS = {}  # tuple of member ids -> FederatedLibrary, see FederatedLibrary.of
+_MAX_FEDERATIONS = 32
+
+
+class FederatedLibrary(ProcessLibrary):
+    """Several libraries layered without copying; later members win on name collisions.
+
+    The merged recipe_index() is built from the members' own indexes by
+    shifting each member's bucket masks to its own block of positions, so no
+    recipe is re-indexed.  A name defined by several members is live only at
+    its winning (rightmost) member's position, so recipes are listed member
+    by member.  The merged index is kept for as long as the members' versions
+    are unchanged; recipes added to the last member afterwards are merged in
+    incrementally, and growth of any other member rebuilds it.  Augment
+    registries are merged right-wins.  Add recipes to the members: the
+    federation itself is read-only.
+    """
+
+    _version = 0
+
+    def __init__(self, libraries):
+        libraries = tuple(libraries)
+        if not libraries:
+            raise ValueError("FederatedLibrary needs at least one library")
+        modes = sorted({lib.mode for lib in libraries})
+        if len(modes) > 1:
+            raise ValueError(f"Cannot federate libraries with different modes: {modes}")
+        self.mode = modes[0]
+        self.members = libraries
+        self._index = None
+        self._states = None  # member states the merged index reflects
+        self._merged = None  # per member: (its index, number of its names merged)
+        self._owner = {}  # name -> number of the member that wins it
+        self._augments = {}
+        self._recipes = _FederatedRecipes(self)
+
+    @classmethod
+    def of(cls, *libraries):
+        """The FederatedLibrary of exactly these library objects, reused across calls."""
+        key = tuple(id(lib) for lib in libraries)
+        cached = _FEDERATIONS.get(key)
+        # The cached federation holds its members, so their ids are not reused
+        # while it is in the cache; the identity check is belt and braces.
+        if cached is not None and all(a is b for (a, b) in zip(cached.members, libraries)):
+            return cached
+        federation = cls(libraries)
+        if len(_FEDERATIONS) >= _MAX_FEDERATIONS:
+            del _FEDERATIONS[next(iter(_FEDERATIONS))]
+        _FEDERATIONS[key] = federation
+        return federation
+
+    def __repr__(self):
+        return f"FederatedLibrary({self.mode!r}, {len(self.members)} members)"
+
+    @property
+    def recipes(self):
+        self.recipe_index()
+        return self._recipes
+
+    @property
+    def names(self):
+        self.recipe_index()
+        return set(self._owner)
+
+    def _state(self):
+        return tuple(lib._state() for lib in self.members)
+
+    def recipe_index(self):
+        if self._state() != self._states:
+            with _INDEX_LOCK:
+                state = self._state()
+                if state != self._states:
+                    self._refresh()
+                    self._states = state
+        return self._index
+
+    def _refresh(self):
+        indexes = [lib.recipe_index() for lib in self.members]
+        merged = self._merged
+        # Only the last member's block ends the merged index, so only its new
+        # recipes can be appended in place; growth anywhere else would put
+        # them out of member order, so it rebuilds like a new federation.
+        if merged is None or any(
+            idx is not old or (i < len(merged) - 1 and len(idx.names) > count)
+            for (i, (idx, (old, count))) in enumerate(zip(indexes, merged))
+        ):
+            self._rebuild(indexes)
+        else:
+            (idx, (_, count)) = (indexes[-1], merged[-1])
+            if len(idx.names) > count:
+                self._extend(len(indexes) - 1, idx, count)
+        self._merged = [(idx, len(idx.names)) for idx in indexes]
+        self._augments = {}
+        for lib in self.members:
+            self._augments.update(lib._augments)
+
+    def _rebuild(self, indexes):
+        index = _RecipeIndex({})
+        owner = {}
+        dead = 0
+        for (i, member) in enumerate(indexes):
+            offset = len(index.names)
+            buckets = index.buckets
+            if not buckets:
+                buckets.update(member.buckets)  # ints are immutable: share them
+            else:
+                for (key, mask) in member.buckets.items():
+                    buckets[key] = buckets.get(key, 0) | (mask << offset)
+            for (key, entries) in member.numeric.items():
+                index.numeric.setdefault(key, []).extend(
+                    (value, pos + offset) for (value, pos) in entries
+                )
+                index._unsorted.add(key)
+            index.augments |= member.augments
+            positions = index.positions
+            # member.positions holds live names only (a nested federation
+            # keeps shadowed names in names but not in positions).
+            for (name, pos) in member.positions.items():
+                old = positions.get(name)
+                if old is not None:
+                    dead |= 1 << old
+                positions[name] = offset + pos
+                owner[name] = i
+            index.names.extend(member.names)
+            index.all |= member.all << offset
+        # Shadowed positions keep their bucket bits; every lookup is
+        # intersected with all, so clearing them there is enough.
+        index.all &= ~dead
+        self._index = index
+        self._owner = owner
+
+    def _extend(self, i, member, start):
+        # Member i is the last, so its new names win and go at the end.
+        index = self._index
+        owner = self._owner
+        lib = self.members[i]
+        for name in member.names[start:]:
+            old = index.positions.get(name)
+            index.add(name, lib.recipes[name])
+            if old is not None:
+                index.all &= ~(1 << old)
+            owner[name] = i
+
+    def _items(self, mask):
+        members = self.members
+        owner = self._owner
+        return [
+            (n, members[owner[n]].recipes[n]) for n in self._index.names_in(mask)
+        ]
+
+    def register_augment(self, name, fn):
+        raise ValueError("FederatedLibrary is read-only; register augments on a member")
+
+    def _put(self, name, process):
+        raise ValueError("FederatedLibrary is read-only; add recipes to a member")
+
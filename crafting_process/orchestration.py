@@ -1,15 +1,23 @@
+import bisect
+import hashlib
 import heapq
 import itertools
+import os
+import pickle
+import time
+from collections import deque
+from contextlib import nullcontext
 from dataclasses import dataclass, field
 from pprint import pprint
 from math import ceil
 
+import numpy as np
 from cytoolz import unique
-from cytoolz import interleave
 
+from . import profiling
 from .graph import GraphBuilder
 from .process import Process, Ingredients, BatchProcess, ContinuousProcess
-from .solver import best_milp_sequence
+from .solver import best_milp_solutions
 from .utils import only as _only
 from .library import Pred
 
@@ -32,8 +40,58 @@ class PlanResult:
     process_counts: list  # list[ProcessCount]
     output_quantities: dict
     process_augments: dict
+    optimal: bool = True  # False when a solver budget cut the solve short
     graph: object = field(default=None, hash=False, compare=False)
 
+    @classmethod
+    def lazy(cls, graph, m, solved):
+        """A result holding only leak, total and the MILP answer m on graph.
+
+        The other fields are worked out from the answer on first access, so
+        ranking by leak and total_processes (the default) never builds them,
+        and a sort key builds only what it reads.  solved is the graph's
+        dict from _solve_graph, shared by all of its answers.
+        """
+        result = object.__new__(cls)
+        object.__setattr__(result, "total_processes", sum(c for (c, _, _) in m["counts"]))
+        object.__setattr__(result, "leak", m["leakage"])
+        object.__setattr__(result, "optimal", m["optimal"])
+        object.__setattr__(result, "graph", graph)
+        object.__setattr__(result, "_answer", (m, solved))
+        return result
+
+    def __getattr__(self, name):
+        # Only reached for fields a lazy result has not computed yet.
+        answer = self.__dict__.get("_answer")
+        if answer is None or name not in _LAZY_FIELDS:
+            raise AttributeError(name)
+        start = time.perf_counter()
+        value = _LAZY_FIELDS[name](self, *answer)
+        object.__setattr__(self, name, value)
+        prof = profiling.current()
+        if prof is not None:
+            prof.add_time("analyze", time.perf_counter() - start)
+        return value
+
+    def to_dict(self):
+        """JSON-friendly summary (the graph and Process objects are omitted)."""
+        return {
+            "desired": dict(self.desired.nonzero_components),
+            "total_processes": self.total_processes,
+            "leak": self.leak,
+            "transfer": dict(self.transfer.nonzero_components),
+            "inputs": [[amt, kind] for (amt, kind) in self.inputs],
+            "process_counts": [
+                {"count": pc.count, "description": pc.description, "slug": pc.slug}
+                for pc in self.process_counts
+            ],
+            "output_quantities": dict(self.output_quantities),
+            "process_augments": {
+                name: list(augs) for (name, augs) in self.process_augments.items()
+            },
+            "optimal": self.optimal,
+        }
+
 
 class PlanResultPredicates:
 
@@ -51,7 +109,23 @@ class R:
         return Pred(PlanResultPredicates.max_leak(threshold))
 
 
-def plan(library, transfer, *, num_keep=5, sort_key=None, reverse=False, **production_graphs_kwargs):
+def _default_sort_key(result):
+    return (abs(result.leak), result.total_processes)
+
+
+def plan(
+    library,
+    transfer,
+    *,
+    num_keep=5,
+    sort_key=None,
+    reverse=False,
+    milp_options=None,
+    profile=None,
+    checkpoint=None,
+    checkpoint_interval=60.0,
+    **production_graphs_kwargs,
+):
     """Run the full pipeline and return the top num_keep PlanResults.
 
     transfer can be a string ("10 iron plate") or an Ingredients instance.
@@ -59,114 +133,583 @@ def plan(library, transfer, *, num_keep=5, sort_key=None, reverse=False, **produ
     value; lower values rank higher (ascending order).  Defaults to
     (leak, total_processes).
     reverse=True returns the num_keep results with the highest key values instead.
+    milp_options is a dict of per-solve budgets (time_limit, mip_rel_gap,
+    node_limit) forwarded to solve_milp; see PlanResult.optimal.
+    profile is an optional profiling.PlanProfile that collects per-stage
+    timings and counters for this call.
+    checkpoint is an optional file path: the search state is written there
+    every checkpoint_interval seconds and when the plan finishes, and a run
+    given an existing checkpoint of the same query resumes from it.
     """
     if sort_key is None:
-        sort_key = lambda r: (abs(r.leak), r.total_processes)
+        sort_key = _default_sort_key
     if isinstance(transfer, str):
         transfer = Ingredients.parse(transfer)
-    graphs = list(production_graphs(library, transfer, **production_graphs_kwargs))
-    results = analyze_graphs(graphs)
-    selector = heapq.nlargest if reverse else heapq.nsmallest
-    return selector(num_keep, results, key=sort_key)
+    with profile.activate() if profile is not None else nullcontext():
+        if checkpoint is not None:
+            return _checkpointed_plan(
+                library,
+                transfer,
+                checkpoint,
+                checkpoint_interval,
+                num_keep=num_keep,
+                sort_key=sort_key,
+                reverse=reverse,
+                milp_options=milp_options,
+                production_graphs_kwargs=production_graphs_kwargs,
+            )
+        graphs = list(production_graphs(library, transfer, **production_graphs_kwargs))
+        results = analyze_graphs(graphs, milp_options=milp_options)
+        selector = heapq.nlargest if reverse else heapq.nsmallest
+        return selector(num_keep, results, key=sort_key)
 
 
-def analyze_graphs(graphs):
-    return interleave(analyze_graph(g) for g in graphs)
+class _Rank:
+    """Position of an item in heapq.nsmallest/nlargest output (smaller is better).
 
+    Both are stable, so ties go to the earlier item.
+    """
 
-def analyze_graph(graph):
-    # Get the output node so we can figure out what was being asked for
-    output_process_name = _only(
-        name for (name, kind) in graph.open_outputs if kind == "_"
-    )
-    output_process = graph.processes[output_process_name]
-    desired = output_process.inputs
+    __slots__ = ("key", "seq", "reverse")
 
-    milps = exchange_milps(graph)
+    def __init__(self, key, seq, reverse):
+        self.key = key
+        self.seq = seq
+        self.reverse = reverse
 
-    output_depths = graph.output_depths()
+    def __lt__(self, other):
+        if self.key != other.key:
+            return (self.key > other.key) if self.reverse else (self.key < other.key)
+        return self.seq < other.seq
 
-    for m in milps:
-        total_processes = sum(c for (c, _, _) in m["counts"])
-        count_by_process = {name: count for (count, _, name) in m["counts"]}
-        dangling = graph.open_outputs + graph.open_inputs
-        transfer = Ingredients.sum(
-            count_by_process[name]
-            * graph.processes[name].exchange.project(kind)
-            for (name, kind) in dangling
-        )
 
-        inputs = sorted(
-            [(-amt, kind) for (kind, amt, _) in transfer.triples() if kind != "_"],
-            reverse=True,
-        )
+class _TopK:
+    """Incremental heapq.nsmallest (or nlargest if reverse) over pushed items.
 
-        process_counts = [
-            ProcessCount(count=c, description=desc, slug=slug, process=graph.processes.get(slug))
-            for (c, desc, slug) in sorted(
-                m["counts"],
-                key=lambda x: (output_depths[x[1]], x[1]),
-                reverse=True,
-            )
+    push() reports whether the item entered the current top, so callers can
+    stream improvements; items() is then what plan() would have returned.
+    """
+
+    def __init__(self, num_keep, key, reverse=False):
+        self.num_keep = num_keep
+        self.key = key
+        self.reverse = reverse
+        self._pushed = 0
+        self._kept = []  # [(_Rank, item)], best first
+
+    def push(self, item, seq=None):
+        """Offer item; seq orders ties (default: push order)."""
+        if seq is None:
+            seq = self._pushed
+        entry = (_Rank(self.key(item), seq, self.reverse), item)
+        self._pushed += 1
+        bisect.insort(self._kept, entry, key=lambda e: e[0])
+        return not (len(self._kept) > self.num_keep and self._kept.pop() is entry)
+
+    def items(self):
+        return [item for (_, item) in self._kept]
+
+    def ranked(self):
+        """[(seq, item)] best first, for merging into another _TopK."""
+        return [(rank.seq, item) for (rank, item) in self._kept]
+
+    def checkpoint(self):
+        # The key function is not saved (it may be a lambda); the caller
+        # passes the same one to the _TopK it restores into.
+        return {
+            "pushed": self._pushed,
+            "kept": [(rank.key, rank.seq, item) for (rank, item) in self._kept],
+        }
+
+    def restore(self, state):
+        self._pushed = state["pushed"]
+        self._kept = [
+            (_Rank(key, seq, self.reverse), item) for (key, seq, item) in state["kept"]
         ]
 
-        output_quantities = {
-            kind: sum(
-                count_by_process.get(name, 0) * proc.outputs[kind]
-                for (name, proc) in graph.processes.items()
-                if kind in proc.outputs.nonzero_components
+
+def _checkpointed_plan(
+    library,
+    transfer,
+    path,
+    interval,
+    *,
+    num_keep,
+    sort_key,
+    reverse,
+    milp_options,
+    production_graphs_kwargs,
+):
+    # Same ranking as heapq.nsmallest/nlargest, kept incrementally so it can
+    # be saved between results.
+    query = repr(
+        (
+            str(transfer),
+            num_keep,
+            reverse,
+            milp_options,
+            sorted(production_graphs_kwargs.items()),
+        )
+    )
+    library_key = _library_fingerprint(library)
+    top = _TopK(num_keep, sort_key, reverse=reverse)
+    state = _load_checkpoint(path, query, library_key)
+    if state is None:
+        graphs = []
+        search = GraphSearch.start(library, transfer, **production_graphs_kwargs)
+        analysis = None
+        end = None
+    else:
+        graphs = state["graphs"]
+        top.restore(state["top"])
+        if state["search"] is not None:
+            search = GraphSearch.resume(library, state["search"])
+            analysis = None
+        else:
+            search = None
+            analysis = _Analysis.resume(
+                graphs, state["analysis"], state["solved"], milp_options
             )
-            for kind in desired.nonzero_components
+        end = state["end"]
+    # Each save appends only what the file does not hold yet.
+    saved_graphs = len(graphs)
+    saved_pulled = state["analysis"]["pulled"] if state and state["analysis"] else 0
+
+    def save():
+        nonlocal end, saved_graphs, saved_pulled
+        if analysis is not None:
+            analysis_state = analysis.checkpoint(since=saved_pulled)
+        else:
+            analysis_state = None
+        frame = {
+            "graphs": graphs[saved_graphs:],
+            "search": search.checkpoint() if search is not None else None,
+            "analysis": analysis_state,
+            "top": top.checkpoint(),
         }
+        if end is None:
+            header = {"query": query, "library": library_key}
+            end = _start_checkpoint(path, header, frame)
+        else:
+            end = _append_checkpoint(path, end, frame)
+        saved_graphs = len(graphs)
+        if analysis_state is not None:
+            saved_pulled = analysis_state["pulled"]
+
+    if end is None:
+        save()
+    saved_at = time.monotonic()
+
+    def tick():
+        nonlocal saved_at
+        if time.monotonic() - saved_at >= interval:
+            save()
+            saved_at = time.monotonic()
+
+    if search is not None:
+        for graph in search:
+            graphs.append(graph)
+            tick()
+        search = None
+        analysis = _Analysis(graphs, milp_options=milp_options)
+    for result in analysis:
+        top.push(result)
+        tick()
+    save()  # a finished checkpoint resumes straight to the results
+    return top.items()
+
+
+_CHECKPOINT_VERSION = 3
+
+
+def _library_fingerprint(library):
+    # Saved graphs and search positions are only valid for the same recipes,
+    # in the same order (order decides ties between equally good plans).
+    recipes = [
+        (name, type(proc).__name__, proc.to_dict())
+        for (name, proc) in library.recipes.items()
+    ]
+    return hashlib.sha256(repr((library.mode, recipes)).encode()).hexdigest()
 
-        process_augments = {
-            name: proc.applied_augments for (name, proc) in graph.processes.items()
+
+def _load_checkpoint(path, query, library_key):
+    """The state saved at path, merged over its frames, or None if there is none.
+
+    A checkpoint is a header pickle followed by one pickle per save.  Each
+    frame holds the graphs and solves added since the previous one, and the
+    latest search, analysis and top-k state.  A frame cut short by a killed
+    worker is ignored; "end" is where the next frame goes.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        header = pickle.load(f)
+        if not isinstance(header, dict) or header.get("version") != _CHECKPOINT_VERSION:
+            raise ValueError(f"Checkpoint {path} has an unsupported version")
+        if header["query"] != query:
+            raise ValueError(
+                f"Checkpoint {path} is for a different query: {header['query']}"
+            )
+        if header["library"] != library_key:
+            raise ValueError(f"Checkpoint {path} was made with a different library")
+        state = {"graphs": [], "solved": {}}
+        while True:
+            try:
+                frame = pickle.load(f)
+            except (EOFError, pickle.UnpicklingError):
+                break
+            state["graphs"].extend(frame["graphs"])
+            if frame["analysis"] is not None:
+                state["solved"].update(frame["analysis"]["solved"])
+            state.update(
+                search=frame["search"], analysis=frame["analysis"], top=frame["top"]
+            )
+            state["end"] = f.tell()
+    return state
+
+
+def _start_checkpoint(path, header, frame):
+    # Write then rename, so the file always holds a header and one complete
+    # frame.
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump({"version": _CHECKPOINT_VERSION, **header}, f)
+        pickle.dump(frame, f)
+        end = f.tell()
+    os.replace(tmp, path)
+    return end
+
+
+def _append_checkpoint(path, end, frame):
+    # Overwrite from the end of the last complete frame, dropping any frame
+    # a killed worker left half written.
+    with open(path, "r+b") as f:
+        f.seek(end)
+        pickle.dump(frame, f)
+        f.truncate()
+        return f.tell()
+
+
+def plan_quantities(
+    library,
+    transfers,
+    *,
+    num_keep=5,
+    sort_key=None,
+    reverse=False,
+    milp_options=None,
+    **production_graphs_kwargs,
+):
+    """Run plan() for several quantities of the same target kinds.
+
+    transfers is an iterable of strings or Ingredients that all request the
+    same set of kinds, e.g. ["1 widget", "10 widget", "100 widget"].  Graph
+    topology does not depend on the amounts, so production_graphs runs once;
+    each quantity only swaps the sink process and re-solves the MILPs.
+
+    Returns a list of (transfer, results) pairs in input order, where results
+    is what plan() would have returned for that transfer.
+    """
+    if sort_key is None:
+        sort_key = _default_sort_key
+    transfers = [
+        Ingredients.parse(t) if isinstance(t, str) else t for t in transfers
+    ]
+    if not transfers:
+        return []
+
+    kinds = set(transfers[0].nonzero_components)
+    for t in transfers[1:]:
+        if set(t.nonzero_components) != kinds:
+            raise ValueError(
+                f"All transfers must request the same kinds: "
+                f"'{transfers[0]}' vs '{t}'"
+            )
+
+    graphs = list(production_graphs(library, transfers[0], **production_graphs_kwargs))
+    for g in graphs:
+        # Warm the caches with_process carries into every retargeted copy.
+        g.build_exchange_matrix()
+        g.process_depths()
+    process_class = library.process_class
+    selector = heapq.nlargest if reverse else heapq.nsmallest
+
+    table = []
+    for t in transfers:
+        sink = _sink_process(process_class, t)
+        retargeted = [g.with_process(_sink_name(g), sink) for g in graphs]
+        results = analyze_graphs(retargeted, milp_options=milp_options)
+        table.append((t, selector(num_keep, results, key=sort_key)))
+    return table
+
+
+def analyze_graphs(graphs, milp_options=None):
+    """PlanResults of every graph, round-robin: each graph's best, then second best, ..."""
+    yield from _Analysis(graphs, milp_options=milp_options)
+
+
+class _Analysis:
+    """Resumable round-robin over analyze_graph for a sequence of graphs.
+
+    Equivalent to cytoolz.interleave of analyze_graph(g) over graphs: a first
+    pass takes each graph's best solution in order (solving it on the way),
+    then later passes take the next solution of every graph that has one.
+    Each queued graph keeps its solved MILPs, so checkpoint() captures the
+    position and the solve cache together.
+    """
+
+    def __init__(self, graphs, milp_options=None, *, queue=(), pulled=0):
+        self.milp_options = milp_options
+        self._source = iter(graphs)
+        self._pulled = pulled  # graphs taken from graphs so far
+        for _ in range(pulled):
+            next(self._source)
+        self._queue = deque(queue)  # (graph number, graph, solved, next solution)
+        self.order = None  # (solution number, graph number) of the last result
+
+    @classmethod
+    def resume(cls, graphs, state, solved, milp_options=None):
+        """Continue from checkpoint() state; solved maps graph number to its solve."""
+        queue = [(i, graphs[i], solved[i], j) for (i, j) in state["queue"]]
+        return cls(graphs, milp_options, queue=queue, pulled=state["pulled"])
+
+    def checkpoint(self, since=0):
+        """The position as (graph number, next solution) pairs, plus solves.
+
+        Only the solves of queued graphs numbered since or later are included:
+        a graph stays queued from its solve until it runs out of solutions, so
+        a caller saving every checkpoint already holds the earlier ones.
+        """
+        return {
+            "pulled": self._pulled,
+            "queue": [(i, j) for (i, _, _, j) in self._queue],
+            "solved": {
+                i: {"milps": solved["milps"], "output_depths": solved["output_depths"]}
+                for (i, _, solved, _) in self._queue
+                if i >= since
+            },
         }
 
-        yield PlanResult(
-            desired=desired,
-            total_processes=total_processes,
-            leak=m["leakage"],
-            transfer=transfer,
-            inputs=inputs,
-            process_counts=process_counts,
-            output_quantities=output_quantities,
-            process_augments=process_augments,
-            graph=graph,
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        queue = self._queue
+        while True:
+            graph = next(self._source, None)
+            if graph is not None:
+                (i, solved, j) = (self._pulled, None, 0)
+                self._pulled += 1
+            elif queue:
+                (i, graph, solved, j) = queue.popleft()
+            else:
+                raise StopIteration
+            if solved is None:
+                solved = _solve_graph(graph, self.milp_options)
+            if j < len(solved["milps"]):
+                queue.append((i, graph, solved, j + 1))
+                self.order = (j, i)
+                return _plan_result(graph, solved, solved["milps"][j])
+
+
+def analyze_graph(graph, milp_options=None):
+    solved = _solve_graph(graph, milp_options)
+    for m in solved["milps"]:
+        yield _plan_result(graph, solved, m)
+
+
+def _solve_graph(graph, milp_options=None):
+    milps = exchange_milps(graph, milp_options=milp_options)
+
+    with profiling.stage("depths"):
+        output_depths = graph.output_depths()
+
+    return {"milps": milps, "output_depths": output_depths}
+
+
+def _plan_result(graph, solved, m):
+    analyze_start = time.perf_counter()
+    result = PlanResult.lazy(graph, m, solved)
+    prof = profiling.current()
+    if prof is not None:
+        prof.add_time("analyze", time.perf_counter() - analyze_start)
+        prof.count("results")
+    return result
+
+
+def _desired(result, m, solved):
+    graph = result.graph
+    return graph.processes[_sink_name(graph)].inputs
+
+
+def _transfer(result, m, solved):
+    ports = _ports(result.graph, solved)
+    return ports.vector(ports.transfer.evaluate(ports.counts(m)))
+
+
+def _inputs(result, m, solved):
+    return sorted(
+        [(-amt, kind) for (kind, amt, _) in result.transfer.triples() if kind != "_"],
+        reverse=True,
+    )
+
+
+def _process_counts(result, m, solved):
+    processes = result.graph.processes
+    output_depths = solved["output_depths"]
+    return [
+        ProcessCount(count=c, description=desc, slug=slug, process=processes.get(slug))
+        for (c, desc, slug) in sorted(
+            m["counts"],
+            key=lambda x: (output_depths[x[1]], x[1]),
+            reverse=True,
         )
+    ]
+
+
+def _output_quantities(result, m, solved):
+    ports = _ports(result.graph, solved)
+    return dict(zip(ports.desired, ports.outputs.evaluate(ports.counts(m))))
+
+
+def _process_augments(result, m, solved):
+    return {
+        name: proc.applied_augments for (name, proc) in result.graph.processes.items()
+    }
+
+
+def _ports(graph, solved):
+    ports = solved.get("ports")
+    if ports is None:
+        ports = solved["ports"] = _Ports(graph)
+    return ports
+
+
+class _Terms:
+    """Sparse (row, column, coefficient) terms, evaluated against count vectors.
+
+    Terms are accumulated in the order given, one row at a time, so sums
+    come out exactly as the sequential Python sums they replace; rows whose
+    coefficients are all ints give ints.
+    """
+
+    __slots__ = ("size", "rows", "cols", "coefs", "ints")
+
+    def __init__(self, size, terms):
+        self.size = size
+        (rows, cols, coefs) = zip(*terms) if terms else ((), (), ())
+        self.rows = np.array(rows, dtype=np.intp)
+        self.cols = np.array(cols, dtype=np.intp)
+        self.coefs = np.array(coefs, dtype=float)
+        self.ints = np.ones(size, dtype=bool)
+        for (i, coef) in zip(rows, coefs):
+            self.ints[i] &= isinstance(coef, int)
+
+    def evaluate(self, counts):
+        amounts = np.zeros(self.size)
+        np.add.at(amounts, self.rows, self.coefs * counts[self.cols])
+        return [int(v) if i else v for (v, i) in zip(amounts.tolist(), self.ints.tolist())]
+
+
+class _Ports:
+    """Per-graph terms turning an answer's process counts into its vectors.
+
+    transfer holds the exchange coefficient of every dangling port, and
+    outputs the output coefficient of every producer of a desired kind.
+    Built once per graph on first use and shared by all of its answers, so
+    each answer costs a count vector and two evaluations.
+    """
+
+    __slots__ = ("column", "kinds", "bases", "transfer", "desired", "outputs")
+
+    def __init__(self, graph):
+        processes = graph.processes
+        self.column = {name: j for (j, name) in enumerate(processes)}
+        row = {}
+        self.bases = {}
+        terms = []
+        for (name, kind) in graph.open_outputs + graph.open_inputs:
+            for (k, coef, basis) in processes[name].exchange.project(kind).triples():
+                self.bases.setdefault(k, basis)
+                terms.append((row.setdefault(k, len(row)), self.column[name], coef))
+        self.kinds = list(row)
+        self.transfer = _Terms(len(row), terms)
+
+        self.desired = list(processes[_sink_name(graph)].inputs.nonzero_components)
+        self.outputs = _Terms(
+            len(self.desired),
+            [
+                (i, self.column[name], proc.outputs[kind])
+                for (i, kind) in enumerate(self.desired)
+                for (name, proc) in processes.items()
+                if kind in proc.outputs.nonzero_components
+            ],
+        )
+
+    def counts(self, m):
+        vec = np.zeros(len(self.column))
+        for (count, _, name) in m["counts"]:
+            vec[self.column[name]] = count
+        return vec
+
+    def vector(self, amounts):
+        return Ingredients.from_triples(
+            [
+                (kind, v, self.bases[kind])
+                for (kind, v) in zip(self.kinds, amounts)
+                if v != 0
+            ]
+        )
+
+
+# PlanResult fields a lazy result computes on first access.
+_LAZY_FIELDS = {
+    "desired": _desired,
+    "transfer": _transfer,
+    "inputs": _inputs,
+    "process_counts": _process_counts,
+    "output_quantities": _output_quantities,
+    "process_augments": _process_augments,
+}
 
 
 def show_graph(graph):
     pprint(list(analyze_graph(graph)))
 
 
-def batch_milps(graph):
-    m = graph.build_batch_matrix()
-    seq = best_milp_sequence(m["matrix"], m["processes"])
+def batch_milps(graph, milp_options=None):
+    with profiling.stage("build_matrix"):
+        m = graph.build_batch_matrix()
+    seq = best_milp_solutions(m["matrix"], m["processes"], **(milp_options or {}))
     return [
         {
-            "leakage": leak,
+            "leakage": soln["leak"],
             "counts": [
                 (count, graph.processes[name].describe(), name)
-                for (name, count) in counts.items()
+                for (name, count) in soln["answer"].items()
             ],
+            "optimal": soln["optimal"],
         }
-        for (leak, counts) in seq
+        for soln in seq
     ]
 
 
-def exchange_milps(graph):
-    m = graph.build_exchange_matrix()
-    seq = best_milp_sequence(m["matrix"], m["processes"])
+def exchange_milps(graph, milp_options=None):
+    with profiling.stage("build_matrix"):
+        m = graph.build_exchange_matrix()
+    seq = best_milp_solutions(m["matrix"], m["processes"], **(milp_options or {}))
     return [
         {
-            "leakage": leak,
+            "leakage": soln["leak"],
             "counts": [
                 (count, graph.processes[name].describe(), name)
-                for (name, count) in counts.items()
+                for (name, count) in soln["answer"].items()
             ],
+            "optimal": soln["optimal"],
         }
-        for (leak, counts) in seq
+        for soln in seq
     ]
 
 
@@ -214,22 +757,34 @@ def production_graphs(
     skip_augments=None,
     only_augments=None,
 ):
+    yield from GraphSearch.start(
+        recipes,
+        transfer,
+        max_overlap=max_overlap,
+        stop_kinds=stop_kinds,
+        skip_processes=skip_processes,
+        skip_augments=skip_augments,
+        only_augments=only_augments,
+    )
+
+
+def _augment_filtered(recipes, skip_augments=None, only_augments=None):
     if skip_augments or only_augments is not None:
-        recipes = recipes.with_augment_filter(
+        return recipes.with_augment_filter(
             skip_augments=skip_augments,
             only_augments=only_augments,
         )
+    return recipes
+
+
+def _sink_process(process_class, transfer):
     new_transfer = Ingredients.parse("_") - transfer
-    process_class = recipes.process_class
     sink_kwargs = {"duration": 1} if process_class is ContinuousProcess else {}
-    g = GraphBuilder.from_process(process_class.from_transfer(new_transfer, **sink_kwargs))
-    yield from _production_graphs(
-        recipes,
-        g,
-        max_overlap=max_overlap,
-        stop_kinds=stop_kinds,
-        skip_processes=skip_processes,
-    )
+    return process_class.from_transfer(new_transfer, **sink_kwargs)
+
+
+def _sink_name(graph):
+    return _only(name for (name, kind) in graph.open_outputs if kind == "_")
 
 
 def _production_graphs(
@@ -240,88 +795,331 @@ def _production_graphs(
     skip_processes=None,
     visited=None,
 ):
-    skip_processes = skip_processes or []
-    stop_kinds = stop_kinds or []
-    visited = visited if visited is not None else {}
-
-    desired_kinds = set(
-        kind for (name, kind) in consuming_graph.open_inputs if kind not in stop_kinds
+    yield from GraphSearch(
+        recipes,
+        consuming_graph,
+        max_overlap=max_overlap,
+        stop_kinds=stop_kinds,
+        skip_processes=skip_processes,
+        visited=visited,
     )
 
-    input_recipes = []
-    recursable_kinds = []
-    for kind in desired_kinds:
-        producers = [
-            (name, proc)
-            for (name, proc) in recipes.producing(kind)
-            if proc.process not in skip_processes
-        ]
-        if producers:
-            input_recipes.extend(producers)
-            recursable_kinds.append(kind)
-
-    # Deduplicate: a process that satisfies multiple desired kinds would
-    # otherwise appear once per kind, producing degenerate combos that
-    # instantiate the same process more than once in a single graph.
-    seen_names = set()
-    deduped = []
-    for item in input_recipes:
-        if item[0] not in seen_names:
-            seen_names.add(item[0])
-            deduped.append(item)
-    input_recipes = deduped
-
-    if not input_recipes:
-        yield consuming_graph
-        return
 
-    indexed = dict(enumerate(input_recipes))
-    kinds_produced = [
-        tuple(process.outputs.nonzero_components) for (_, process) in input_recipes
-    ]
-    combos = input_combinations(
-        recursable_kinds,
-        kinds_produced,
-        max_overlap=max_overlap,
-    )
-    for combo in combos:
-        new_visited = {**visited}
-        combo_graphs = []
-        for i in combo:
-            recipe_name, proc = indexed[i]
-            if recipe_name in visited:
-                # Reuse the existing node: expose its outputs as a stub so
-                # output_into can wire new connections without a duplicate node.
-                node_name = visited[recipe_name]
-                stub = GraphBuilder()
-                stub.open_outputs = [
-                    (node_name, k) for k in proc.outputs.nonzero_components
-                ]
-                combo_graphs.append(stub)
-            else:
-                g = GraphBuilder()
-                result = g.add_process(proc)
-                node_name = result["name"]
-                combo_graphs.append(g)
-                new_visited[recipe_name] = node_name
+class _Level:
+    """One expansion level of a GraphSearch: a graph and its remaining combos."""
+
+    __slots__ = ("graph", "visited", "indexed", "kinds", "combos", "position", "stop")
+
+    def __init__(self, graph, visited, indexed, kinds, combos, position=0, stop=None):
+        self.graph = graph
+        self.visited = visited
+        self.indexed = indexed  # [(library name, process)] the combos index into
+        self.kinds = kinds  # recursable kinds, in input_combinations order
+        self.combos = combos
+        self.position = position  # combos consumed so far
+        self.stop = stop  # combo number this level ends before (None: all)
+
+
+class GraphSearch:
+    """Iterator over the production graphs that feed consuming_graph.
 
-        upstream_graph = GraphBuilder()
-        for g in combo_graphs:
-            upstream_graph.unify(g)
+    Depth-first, with an explicit stack of _Level frames instead of one
+    generator per level, so chains of any depth are safe.  Yields graphs in
+    the same order as the recursive expansion it replaces.
 
-        total_graph = upstream_graph.output_into(consuming_graph)
+    checkpoint() returns the search frontier as plain data (graphs, visited
+    maps, recipe names and combo positions); GraphSearch.resume(recipes,
+    state) continues from it.  Combos are regenerated from the stored kinds
+    and skipped up to each level's position, so resuming needs the same
+    recipes, not the same process.
 
-        yield from _production_graphs(
+    path is the combo number taken at each level for the graph last
+    yielded.  Graphs come out in lexicographic path order, so paths order
+    graphs from different shards (see shards()) as one search would.
+    """
+
+    def __init__(
+        self,
+        recipes,
+        consuming_graph,
+        max_overlap=2,
+        stop_kinds=None,
+        skip_processes=None,
+        visited=None,
+    ):
+        self.recipes = recipes
+        self.max_overlap = max_overlap
+        self.stop_kinds = stop_kinds or []
+        self.skip_processes = skip_processes or []
+        self.augment_filter = {}  # set by start(); reapplied by resume()
+        self.path = None
+        self._stack = []
+        self._pending = None  # a graph to yield before popping the stack
+        if consuming_graph is not None:
+            self._push(consuming_graph, visited if visited is not None else {})
+
+    @classmethod
+    def start(
+        cls,
+        recipes,
+        transfer,
+        max_overlap=2,
+        stop_kinds=None,
+        skip_processes=None,
+        skip_augments=None,
+        only_augments=None,
+    ):
+        """The search production_graphs runs: from a sink consuming transfer."""
+        augment_filter = {"skip_augments": skip_augments, "only_augments": only_augments}
+        recipes = _augment_filtered(recipes, **augment_filter)
+        g = GraphBuilder.from_process(_sink_process(recipes.process_class, transfer))
+        search = cls(
             recipes,
-            total_graph,
+            g,
             max_overlap=max_overlap,
             stop_kinds=stop_kinds,
             skip_processes=skip_processes,
-            visited=new_visited,
         )
+        search.augment_filter = augment_filter
+        return search
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._pending is not None:
+            (graph, self._pending) = (self._pending, None)
+            self.path = ()
+            return graph
+        stack = self._stack
+        while stack:
+            level = stack[-1]
+            combo = next(level.combos, None)
+            if combo is None:
+                stack.pop()
+                continue
+            level.position += 1
+            (graph, visited) = self._combine(level, combo)
+            if self._push(graph, visited):
+                self.path = tuple(level.position - 1 for level in stack)
+                return graph
+        raise StopIteration
+
+    def _push(self, graph, visited):
+        """Push the level expanding graph; return True if graph is a leaf."""
+        # First-seen order rather than set order, so the search (and a resumed
+        # search in another process) does not depend on string hashing.
+        desired_kinds = dict.fromkeys(
+            kind for (name, kind) in graph.open_inputs if kind not in self.stop_kinds
+        )
+
+        input_recipes = []
+        recursable_kinds = []
+        with profiling.stage("producing"):
+            for kind in desired_kinds:
+                producers = [
+                    (name, proc)
+                    for (name, proc) in self.recipes.producing(kind)
+                    if proc.process not in self.skip_processes
+                ]
+                if producers:
+                    input_recipes.extend(producers)
+                    recursable_kinds.append(kind)
+
+        # Deduplicate: a process that satisfies multiple desired kinds would
+        # otherwise appear once per kind, producing degenerate combos that
+        # instantiate the same process more than once in a single graph.
+        seen_names = set()
+        deduped = []
+        for item in input_recipes:
+            if item[0] not in seen_names:
+                seen_names.add(item[0])
+                deduped.append(item)
+
+        if not deduped:
+            profiling.count("graphs")
+            if not self._stack:
+                self._pending = graph  # the starting graph is itself a leaf
+            return True
+
+        combos = self._combos(deduped, recursable_kinds)
+        self._stack.append(_Level(graph, visited, deduped, recursable_kinds, combos))
+        return False
+
+    def _combos(self, indexed, kinds, skip=0, stop=None):
+        kinds_produced = [
+            tuple(process.outputs.nonzero_components) for (_, process) in indexed
+        ]
+        combos = input_combinations(kinds, kinds_produced, max_overlap=self.max_overlap)
+        if skip or stop is not None:
+            return itertools.islice(combos, skip, stop)
+        return combos
+
+    def _combine(self, level, combo):
+        profiling.count("combos")
+        with profiling.stage("output_into"):
+            visited = level.visited
+            new_visited = {**visited}
+            combo_graphs = []
+            for i in combo:
+                recipe_name, proc = level.indexed[i]
+                if recipe_name in visited:
+                    # Reuse the existing node: expose its outputs as a stub so
+                    # output_into can wire new connections without a duplicate node.
+                    profiling.count("visited_reuse")
+                    node_name = visited[recipe_name]
+                    stub = GraphBuilder()
+                    stub.open_outputs = [
+                        (node_name, k) for k in proc.outputs.nonzero_components
+                    ]
+                    combo_graphs.append(stub)
+                else:
+                    g = GraphBuilder()
+                    result = g.add_process(proc)
+                    node_name = result["name"]
+                    combo_graphs.append(g)
+                    new_visited[recipe_name] = node_name
+
+            upstream_graph = GraphBuilder()
+            for g in combo_graphs:
+                upstream_graph.unify(g)
+
+            return (upstream_graph.output_into(level.graph), new_visited)
+
+    def checkpoint(self):
+        """The search frontier as picklable plain data."""
+        return self._state(self._stack)
+
+    def _state(self, levels, limits=None):
+        # limits optionally overrides (position, stop) per level.
+        limits = limits or [(level.position, level.stop) for level in levels]
+        return {
+            "options": {
+                "max_overlap": self.max_overlap,
+                "stop_kinds": list(self.stop_kinds),
+                "skip_processes": list(self.skip_processes),
+            },
+            "augment_filter": dict(self.augment_filter),
+            "pending": self._pending,
+            "levels": [
+                {
+                    "graph": level.graph,
+                    "visited": dict(level.visited),
+                    "names": [name for (name, _) in level.indexed],
+                    "kinds": list(level.kinds),
+                    "position": position,
+                    "stop": stop,
+                }
+                for (level, (position, stop)) in zip(levels, limits)
+            ],
+        }
+
+    def shards(self):
+        """Split a search that has not started into one state per first-level combo.
+
+        Each state resumes (see resume) to the subtree under one combo of
+        the first expansion level; together, in order, they yield exactly
+        what this search would.  A start graph with nothing to expand is a
+        single shard.
+        """
+        if self.path is not None:
+            raise ValueError("Only a search that has not yielded yet can be sharded")
+        if not self._stack:
+            return [self.checkpoint()]
+        (root,) = self._stack
+        count = sum(1 for _ in self._combos(root.indexed, root.kinds, root.position, root.stop))
+        first = root.position
+        return [self._state([root], [(j, j + 1)]) for j in range(first, first + count)]
+
+    def seek(self, path):
+        """Build the graph this unstarted search would yield at path.
+
+        Descends straight down the given combos instead of searching, so a
+        graph known by its path is rebuilt in one expansion per level.  Node
+        names are fresh slugs; node order matches the searched graph.  Uses
+        up the search.
+        """
+        if self.path is not None:
+            raise ValueError("Only a search that has not yielded yet can seek")
+        if self._pending is not None and path == ():
+            return self._pending
+        graph = None
+        for (depth, number) in enumerate(path):
+            if len(self._stack) != depth + 1 or number < self._stack[-1].position:
+                raise ValueError(f"No graph at path {path}")
+            level = self._stack[-1]
+            combo = next(itertools.islice(level.combos, number - level.position, None), None)
+            if combo is None:
+                raise ValueError(f"No graph at path {path}")
+            level.position = number + 1
+            (graph, visited) = self._combine(level, combo)
+            if self._push(graph, visited) != (depth == len(path) - 1):
+                raise ValueError(f"No graph at path {path}")
+        if graph is None:
+            raise ValueError(f"No graph at path {path}")
+        return graph
+
+    def split(self):
+        """Hand off half of the unstarted work at the shallowest level that has any.
+
+        Returns a state (see resume) for the back half of that level's
+        remaining combos and narrows this search to the front half, so the
+        two together yield what this search alone would have.  Returns None
+        if every level is down to the subtree in progress.
+        """
+        for (k, level) in enumerate(self._stack):
+            remaining = list(level.combos)
+            if not remaining:
+                level.combos = iter(())
+                continue
+            keep = len(remaining) // 2
+            mid = level.position + keep
+            # Levels above k are pinned to the combo being explored there.
+            limits = [(above.position, above.position) for above in self._stack[:k]]
+            limits.append((mid, level.stop))
+            level.combos = iter(remaining[:keep])
+            level.stop = mid
+            return self._state(self._stack[: k + 1], limits)
+        return None
+
+    @classmethod
+    def resume(cls, recipes, state):
+        """A GraphSearch continuing from checkpoint() state over recipes.
+
+        recipes is the unfiltered library: the augment filter of a search made
+        by start() is stored in the state and applied again here.
+        """
+        recipes = _augment_filtered(recipes, **state["augment_filter"])
+        search = cls(recipes, None, **state["options"])
+        search.augment_filter = dict(state["augment_filter"])
+        search._pending = state["pending"]
+        for saved in state["levels"]:
+            try:
+                indexed = [(name, recipes.recipes[name]) for name in saved["names"]]
+            except KeyError as e:
+                raise ValueError(f"Checkpoint refers to recipe {e} missing from the library")
+            search._stack.append(
+                _Level(
+                    saved["graph"],
+                    saved["visited"],
+                    indexed,
+                    saved["kinds"],
+                    search._combos(
+                        indexed, saved["kinds"], saved["position"], saved["stop"]
+                    ),
+                    saved["position"],
+                    saved["stop"],
+                )
+            )
+        return search
 
 
 def printable_analysis(aly, show_augments=False, show_type=False):
+    with profiling.stage("printable_analysis"):
+        return _printable_analysis(aly, show_augments=show_augments, show_type=show_type)
+
+
+def _printable_analysis(aly, show_augments=False, show_type=False):
     out_lines = []
 
     first = next(iter(aly))
@@ -410,9 +1208,7 @@ def printable_graph(result):
     for proc_name, kind in graph.open_inputs:
         open_inputs_by_proc.setdefault(proc_name, []).append(kind)
 
-    output_process_name = _only(
-        name for (name, kind) in graph.open_outputs if kind == "_"
-    )
+    output_process_name = _sink_name(graph)
 
     seen = set()
 
@@ -465,9 +1261,7 @@ def printable_dot(result):
 
     pc_by_slug = {pc.slug: pc for pc in result.process_counts}
 
-    output_process_name = _only(
-        name for (name, kind) in graph.open_outputs if kind == "_"
-    )
+    output_process_name = _sink_name(graph)
 
     open_inputs_by_proc = {}
     for proc_name, kind in graph.open_inputs:
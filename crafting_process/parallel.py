@@ -0,0 +1,298 @@
+"""Sharded plan(): one heavy query spread over worker processes.
+
+    results = plan_sharded(library, "10 computer", workers=8)
+
+The search tree under the sink splits at its first expansion level: every
+combo there roots an independent subtree.  shard_tasks() turns each into a
+picklable task (a GraphSearch checkpoint limited to that combo), run_shard()
+runs one task to its local top results, and merge_shards() merges those into
+the overall top.  plan_sharded() does all three on a process pool; to spread
+a query over machines, send the tasks through any queue, call run_shard on
+the other end and merge what comes back.
+
+Every result carries its position in the unsharded search: (solution
+number, path of the graph's combos).  Ties are broken by that position, so
+the merged ranking is the one plan() returns, whatever the completion order.
+sort_key is shipped with each task and must be picklable (a module-level
+function, not a lambda).
+
+Workers do not send PlanResults back.  Each kept result travels as a
+_Compact record: its sort key, leak, and the counts as (node number, count)
+arrays, a few hundred bytes where a PlanResult pickles its whole graph and
+every Process in it.  Only the overall top num_keep are rebuilt into
+PlanResults, in the parent: the path leads GraphSearch.seek straight to the
+graph, and node numbers follow the graph's insertion order.
+
+Subtrees differ in size by orders of magnitude, so plan_sharded() also
+steals work: while a worker slot is idle, a busy worker splits its search
+after the graph in hand (GraphSearch.split), returns both halves to the
+scheduler, and they are queued like any other task.  Positions are global,
+so the merge stays deterministic however the work was divided.
+"""
+
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+
+from .orchestration import GraphSearch
+from .orchestration import _TopK
+from .orchestration import _plan_result
+from .orchestration import _solve_graph
+from .process import Ingredients
+
+
+def shard_tasks(
+    library,
+    transfer,
+    *,
+    num_keep=5,
+    sort_key=None,
+    reverse=False,
+    milp_options=None,
+    **production_graphs_kwargs,
+):
+    """Picklable tasks, one per first-level combo of the query's search."""
+    if isinstance(transfer, str):
+        transfer = Ingredients.parse(transfer)
+    search = GraphSearch.start(library, transfer, **production_graphs_kwargs)
+    root = search.checkpoint()
+    return [
+        {
+            "shard": i,
+            "root": root,
+            "search": state,
+            "num_keep": num_keep,
+            "sort_key": sort_key,
+            "reverse": reverse,
+            "milp_options": milp_options,
+        }
+        for (i, state) in enumerate(search.shards())
+    ]
+
+
+class _Compact:
+    """A solved result reduced to what ranking and rebuilding need."""
+
+    __slots__ = ("key", "leak", "optimal", "nodes", "counts")
+
+    def __init__(self, key, leak, optimal, nodes, counts):
+        self.key = key
+        self.leak = leak
+        self.optimal = optimal
+        self.nodes = nodes  # graph node numbers, in MILP answer order
+        self.counts = counts
+
+    def __getstate__(self):
+        return (self.key, self.leak, self.optimal, self.nodes, self.counts)
+
+    def __setstate__(self, state):
+        (self.key, self.leak, self.optimal, self.nodes, self.counts) = state
+
+    @classmethod
+    def of(cls, graph, m, key):
+        number = {name: i for (i, name) in enumerate(graph.processes)}
+        return cls(
+            key,
+            m["leakage"],
+            m["optimal"],
+            tuple(number[name] for (_, _, name) in m["counts"]),
+            tuple(count for (count, _, _) in m["counts"]),
+        )
+
+    def rebuild(self, graph, solved=None):
+        """The PlanResult of this answer on graph (rebuilt at the same path).
+
+        solved is a dict shared by the answers rebuilt on one graph.
+        """
+        names = list(graph.processes)
+        m = {
+            "leakage": self.leak,
+            "optimal": self.optimal,
+            "counts": [
+                (count, graph.processes[names[i]].describe(), names[i])
+                for (i, count) in zip(self.nodes, self.counts)
+            ],
+        }
+        if solved is None:
+            solved = {"output_depths": graph.output_depths()}
+        return _plan_result(graph, solved, m)
+
+
+def _record_key(record):
+    return record.key
+
+
+def run_shard(library, task):
+    """Run one task; returns its top results as [(position, _Compact)]."""
+    return run_slice(library, task)["ranked"]
+
+
+def run_slice(library, task, hungry=None):
+    """Run one task until it is done or an idle worker wants a share of it.
+
+    hungry is a shared counter of idle worker slots (a multiprocessing
+    Value).  After each graph, if it is positive, one slot is claimed and the
+    search split in two; both halves come back under "split" and this task
+    stops there.  Returns {"ranked", "split", "load"}.
+    """
+    start = time.perf_counter()
+    search = GraphSearch.resume(library, task["search"])
+    sort_key = task["sort_key"]
+    top = _TopK(task["num_keep"], _record_key, reverse=task["reverse"])
+    split = []
+    load = {"tasks": 1, "graphs": 0, "results": 0, "splits": 0}
+    for graph in search:
+        path = search.path
+        load["graphs"] += 1
+        solved = _solve_graph(graph, task["milp_options"])
+        for (j, m) in enumerate(solved["milps"]):
+            if sort_key is None:
+                # _default_sort_key without building the PlanResult.
+                key = (abs(m["leakage"]), sum(c for (c, _, _) in m["counts"]))
+            else:
+                key = sort_key(_plan_result(graph, solved, m))
+            top.push(_Compact.of(graph, m, key), seq=(j, path))
+            load["results"] += 1
+        if hungry is not None and _claim(hungry):
+            stolen = search.split()
+            if stolen is not None:
+                split = [search.checkpoint(), stolen]
+                load["splits"] += 1
+                break
+            with hungry.get_lock():
+                hungry.value += 1
+    load["busy"] = time.perf_counter() - start
+    return {"ranked": top.ranked(), "split": split, "load": load}
+
+
+def _claim(hungry):
+    with hungry.get_lock():
+        if hungry.value <= 0:
+            return False
+        hungry.value -= 1
+        return True
+
+
+def merge_shards(library, tasks, partials):
+    """The overall top of the query behind tasks, from run_shard outputs in any order.
+
+    Only the survivors are rebuilt into PlanResults, each graph once.
+    """
+    task = tasks[0]
+    top = _TopK(task["num_keep"], _record_key, reverse=task["reverse"])
+    for partial in partials:
+        for (seq, record) in partial:
+            top.push(record, seq=seq)
+    return _rebuild(library, task["root"], top.ranked())
+
+
+def _rebuild(library, root, ranked):
+    graphs = {}
+    results = []
+    for ((_, path), record) in ranked:
+        if path not in graphs:
+            graph = GraphSearch.resume(library, root).seek(path)
+            graphs[path] = (graph, {"output_depths": graph.output_depths()})
+        results.append(record.rebuild(*graphs[path]))
+    return results
+
+
+#
+# Process pool
+#
+
+_WORKER_LIBRARY = None
+_WORKER_HUNGRY = None
+
+
+def init_worker(library, hungry=None):
+    """Process pool initializer: keep one library per worker process."""
+    global _WORKER_LIBRARY, _WORKER_HUNGRY
+    _WORKER_LIBRARY = library
+    _WORKER_HUNGRY = hungry
+
+
+def run_worker_shard(task):
+    return run_shard(_WORKER_LIBRARY, task)
+
+
+def run_worker_slice(task):
+    out = run_slice(_WORKER_LIBRARY, task, _WORKER_HUNGRY)
+    out["worker"] = os.getpid()
+    return out
+
+
+def plan_sharded(
+    library,
+    transfer,
+    *,
+    workers=None,
+    num_keep=5,
+    sort_key=None,
+    reverse=False,
+    milp_options=None,
+    mp_context=None,
+    executor=None,
+    load=None,
+    **production_graphs_kwargs,
+):
+    """plan() with the search spread over a process pool, stealing work.
+
+    workers bounds the pool and the tasks in flight (default: the number of
+    CPUs).  executor replaces the owned pool; its workers must already have
+    run init_worker(library), and the caller shuts it down.  Such workers
+    have no idle counter, so they run the first-level shards without
+    splitting them.  Pass a dict as load to receive per-worker totals of
+    tasks, graphs, results, splits and busy seconds, keyed by process id.
+    """
+    tasks = shard_tasks(
+        library,
+        transfer,
+        num_keep=num_keep,
+        sort_key=sort_key,
+        reverse=reverse,
+        milp_options=milp_options,
+        **production_graphs_kwargs,
+    )
+    slots = workers or os.cpu_count() or 1
+    hungry = None
+    if executor is None:
+        hungry = (mp_context or multiprocessing).Value("i", 0)
+    pool = executor or ProcessPoolExecutor(
+        max_workers=slots,
+        mp_context=mp_context,
+        initializer=init_worker,
+        initargs=(library, hungry),
+    )
+    top = _TopK(num_keep, _record_key, reverse=reverse)
+    pending = deque(tasks)
+    running = {}  # future -> task
+    try:
+        while pending or running:
+            while pending and len(running) < slots:
+                task = pending.popleft()
+                running[pool.submit(run_worker_slice, task)] = task
+            if hungry is not None:
+                # Under the lock: workers claim (decrement) concurrently.
+                with hungry.get_lock():
+                    hungry.value = slots - len(running)
+            (done, _) = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                out = future.result()
+                for (seq, result) in out["ranked"]:
+                    top.push(result, seq=seq)
+                for state in out["split"]:
+                    pending.append({**task, "search": state})
+                if load is not None:
+                    totals = load.setdefault(out["worker"], dict.fromkeys(out["load"], 0))
+                    for (name, value) in out["load"].items():
+                        totals[name] += value
+        return _rebuild(library, tasks[0]["root"], top.ranked())
+    finally:
+        if executor is None:
+            pool.shutdown(cancel_futures=True)
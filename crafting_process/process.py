@@ -2,6 +2,8 @@ import re
 
 from formal_vector import FormalVector
 
+from .kinds import KINDS
+
 
 class Ingredients(FormalVector):
     _ZERO = "Ingredients.NONE"
@@ -13,7 +15,19 @@ class Ingredients(FormalVector):
         # Newlines are intentionally left alone — they are meaningful at the
         # recipe level but should never appear inside an ingredient string.
         normalized = re.sub(r"[ \t]+", " ", s).strip()
-        return super().parse(normalized, **kwargs)
+        parsed = super().parse(normalized, **kwargs)
+        triples = parsed.triples()
+        if all(KINDS.intern(name) is name for (name, _, _) in triples):
+            return parsed
+        return cls.from_triples(triples)
+
+    @classmethod
+    def from_triples(cls, triples):
+        # Kind names are interned (see kinds.py): one object per name.
+        intern = KINDS.intern
+        return super().from_triples(
+            [(intern(name), coef, basis) for (name, coef, basis) in triples]
+        )
 
 
 def describe_process(output_names, process=None):
@@ -96,6 +110,39 @@ class Process:
         else:
             return self.transfer_rate
 
+    @property
+    def exchange_by_id(self):
+        """{kind id: exchange coefficient}, nonzero only; see kinds.py.
+
+        Only registered kinds have ids; the others are left out, and the
+        cache is rebuilt once KINDS grows.  Otherwise it is kept until
+        outputs, inputs or duration are replaced, so matrix builders can read
+        many coefficients without rebuilding exchange.
+        """
+        key = (self.outputs, self.inputs, self.duration)
+        cache = self.__dict__.get("_exchange_by_id")
+        if (
+            cache is None
+            or any(a is not b for (a, b) in zip(cache[0], key))
+            or (cache[2] is not None and cache[2] != len(KINDS))
+        ):
+            triples = self.exchange.triples()
+            coefs = {}
+            for (kind, coef, _) in triples:
+                i = KINDS.find(kind)
+                if i is not None:
+                    coefs[i] = coef
+            # A table size to recheck against if some kind was left out.
+            size = None if len(coefs) == len(triples) else len(KINDS)
+            cache = self._exchange_by_id = (key, coefs, size)
+        return cache[1]
+
+    def __getstate__(self):
+        # Kind ids belong to one interpreter's KINDS; drop caches keyed by them.
+        state = dict(self.__dict__)
+        state.pop("_exchange_by_id", None)
+        return state
+
     def describe(self):
         return describe_process(self.outputs.nonzero_components, self.process)
 
@@ -0,0 +1,139 @@
+"""Opt-in per-stage timing and counters for the planning pipeline.
+
+A PlanProfile collects stage durations, event counters and a histogram of
+MILP solve times.  Instrumented code reports to whichever profile is active
+in the current context, so nothing has to be threaded through the call
+chain and the hooks cost one ContextVar lookup when profiling is off:
+
+    prof = PlanProfile()
+    results = plan(lib, "10 widget", profile=prof)
+    print(prof.report())
+
+or, around lower-level calls:
+
+    with prof.activate():
+        graphs = list(production_graphs(lib, transfer))
+"""
+
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+_active = ContextVar("crafting_process_profile", default=None)
+_NULL_STAGE = nullcontext()
+
+
+class PlanProfile:
+
+    # Upper bounds (seconds) of the solve-time histogram buckets; the last
+    # bucket collects everything slower.
+    SOLVE_BUCKETS = (0.001, 0.01, 0.1, 1.0, 10.0)
+
+    def __init__(self):
+        self.durations = {}
+        self.calls = {}
+        self.counters = {}
+        self.solve_histogram = [0] * (len(self.SOLVE_BUCKETS) + 1)
+        self.wall = 0.0
+
+    @contextmanager
+    def activate(self):
+        token = _active.set(self)
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.wall += time.perf_counter() - start
+            _active.reset(token)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def record_solve(self, seconds):
+        self.add_time("milp", seconds)
+        self.count("milp_solves")
+        for i, bound in enumerate(self.SOLVE_BUCKETS):
+            if seconds < bound:
+                self.solve_histogram[i] += 1
+                break
+        else:
+            self.solve_histogram[-1] += 1
+
+    def to_dict(self):
+        return {
+            "wall": self.wall,
+            "stages": {
+                name: {"calls": self.calls[name], "seconds": self.durations[name]}
+                for name in self.durations
+            },
+            "counters": dict(self.counters),
+            "solve_histogram": dict(zip(self._bucket_labels(), self.solve_histogram)),
+        }
+
+    def _bucket_labels(self):
+        labels = [f"<{_fmt_seconds(b)}" for b in self.SOLVE_BUCKETS]
+        return labels + [f">={_fmt_seconds(self.SOLVE_BUCKETS[-1])}"]
+
+    def report(self):
+        lines = [f"profile: {self.wall * 1000:.1f} ms wall", ""]
+        lines.append(f"    {'stage':<20} {'calls':>8} {'total ms':>11} {'mean ms':>9} {'%':>6}")
+        for name in sorted(self.durations, key=self.durations.get, reverse=True):
+            total = self.durations[name]
+            calls = self.calls[name]
+            pct = 100 * total / self.wall if self.wall else 0.0
+            lines.append(
+                f"    {name:<20} {calls:>8} {total * 1000:>11.2f} "
+                f"{total * 1000 / calls:>9.3f} {pct:>6.1f}"
+            )
+
+        if self.counters:
+            lines.append("")
+            for name in sorted(self.counters):
+                lines.append(f"    {name:<20} {self.counters[name]:>8}")
+
+        if any(self.solve_histogram):
+            lines.append("")
+            lines.append("    milp solve times:")
+            for label, n in zip(self._bucket_labels(), self.solve_histogram):
+                lines.append(f"    {label:>10} {n:>8}")
+
+        return "\n".join(lines)
+
+
+def _fmt_seconds(s):
+    return f"{s * 1000:g}ms" if s < 1 else f"{s:g}s"
+
+
+def current():
+    """The profile active in this context, or None."""
+    return _active.get()
+
+
+def stage(name):
+    """Time a block against the active profile; a no-op when none is active."""
+    prof = _active.get()
+    return _NULL_STAGE if prof is None else prof.stage(name)
+
+
+def count(name, n=1):
+    prof = _active.get()
+    if prof is not None:
+        prof.count(name, n)
+
+
+def record_solve(seconds):
+    prof = _active.get()
+    if prof is not None:
+        prof.record_solve(seconds)
@@ -0,0 +1,391 @@
+"""ASGI planning service.
+
+    from crafting_process import ProcessLibrary
+    from crafting_process.service import create_app
+
+    app = create_app(ProcessLibrary("batch", path="recipes.txt"), max_workers=4)
+    # uvicorn mymodule:app
+
+Endpoints:
+
+    GET  /library        processes and augments in the library
+    POST /graphs/count   number of production graphs for a query
+    POST /plan           top plans for a query
+    POST /plan/stream    NDJSON: each improvement to the running top plans,
+                         then the final list
+
+Solves run in a bounded process pool whose workers hold their own copy of the
+library, so the event loop only waits on futures.  Identical concurrent
+queries share one solve, and every request may carry a deadline in seconds
+(504 when it passes).  The deadline also travels to the worker, which stops
+searching and caps each MILP's time_limit by it, so a timed-out request does
+not hold its pool slot.  A /plan/stream worker is likewise cancelled when its
+client disconnects.
+
+This module is not imported by the package root: it needs fastapi.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import multiprocessing
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi import HTTPException
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from pydantic import ConfigDict
+from pydantic import Field
+
+from .orchestration import _TopK
+from .orchestration import _default_sort_key
+from .orchestration import analyze_graphs
+from .orchestration import production_graphs
+from .process import Ingredients
+
+
+# Seconds between client-disconnect checks while a stream waits on its worker.
+DISCONNECT_POLL = 0.5
+
+SORT_KEYS = {
+    "min-leak-processes": None,  # plan() default: (leak, total_processes)
+    "min-leak": lambda r: abs(r.leak),
+    "min-processes": lambda r: r.total_processes,
+}
+
+
+class Query(BaseModel):
+    yield_: str = Field(alias="yield")
+    stop_kinds: list[str] | None = None
+    skip_processes: list[str] | None = None
+    skip_augments: list[str] | None = None
+    only_augments: list[str] | None = None
+    max_overlap: int = 2
+    deadline: float | None = Field(default=None, gt=0)
+
+    def graph_kwargs(self):
+        return {
+            "max_overlap": self.max_overlap,
+            "stop_kinds": self.stop_kinds,
+            "skip_processes": self.skip_processes,
+            "skip_augments": self.skip_augments,
+            "only_augments": self.only_augments,
+        }
+
+
+class CountQuery(Query):
+    limit: int | None = Field(default=None, gt=0)
+
+
+class MilpOptions(BaseModel):
+    """Per-solve budgets forwarded to solve_milp; unknown names are rejected."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    time_limit: float | None = Field(default=None, gt=0)
+    mip_rel_gap: float | None = Field(default=None, ge=0)
+    node_limit: int | None = Field(default=None, ge=0)
+
+
+class PlanQuery(Query):
+    num_keep: int = Field(default=5, gt=0)
+    sort_key: str = "min-leak-processes"
+    reverse: bool = False
+    milp_options: MilpOptions | None = None
+
+
+#
+# Worker side
+#
+
+_WORKER_LIBRARY = None
+
+
+def init_worker(library):
+    """Process pool initializer: keep one library per worker process."""
+    global _WORKER_LIBRARY
+    _WORKER_LIBRARY = library
+
+
+def _sort_key(name):
+    if name not in SORT_KEYS:
+        raise ValueError(f"Unknown sort_key {name!r}; expected one of {list(SORT_KEYS)}")
+    return SORT_KEYS[name]
+
+
+def _cutoff(items, query, cancel=None):
+    """Yield from items until the query's deadline (wall-clock "deadline_at").
+
+    Stops early, without an error, once the optional cancel Event is set.
+    """
+    deadline_at = query.get("deadline_at")
+    for item in items:
+        if deadline_at is not None and time.time() > deadline_at:
+            raise TimeoutError("Deadline exceeded")
+        if cancel is not None and cancel.is_set():
+            return
+        yield item
+
+
+def _milp_options(query):
+    # No single solve may outlive the request's deadline.
+    options = query["milp_options"]
+    deadline_at = query.get("deadline_at")
+    if deadline_at is None:
+        return options
+    options = dict(options or {})
+    remaining = max(deadline_at - time.time(), 0.001)
+    options["time_limit"] = min(options.get("time_limit") or remaining, remaining)
+    return options
+
+
+def _plan_kwargs(query):
+    return {
+        "num_keep": query["num_keep"],
+        "sort_key": _sort_key(query["sort_key"]),
+        "reverse": query["reverse"],
+        "milp_options": _milp_options(query),
+        **query["graph_kwargs"],
+    }
+
+
+def _graphs(query, cancel=None, **graph_kwargs):
+    graphs = production_graphs(
+        _WORKER_LIBRARY, Ingredients.parse(query["yield"]), **graph_kwargs
+    )
+    return _cutoff(graphs, query, cancel)
+
+
+def solve_plan(query):
+    # plan(), with the deadline checked between graphs and between solves.
+    kwargs = _plan_kwargs(query)
+    num_keep = kwargs.pop("num_keep")
+    sort_key = kwargs.pop("sort_key") or _default_sort_key
+    selector = heapq.nlargest if kwargs.pop("reverse") else heapq.nsmallest
+    milp_options = kwargs.pop("milp_options")
+    graphs = list(_graphs(query, **kwargs))
+    results = _cutoff(analyze_graphs(graphs, milp_options=milp_options), query)
+    return [r.to_dict() for r in selector(num_keep, results, key=sort_key)]
+
+
+def count_graphs(query):
+    graphs = _graphs(query, **query["graph_kwargs"])
+    limit = query["limit"]
+    count = sum(1 for _ in itertools.islice(graphs, limit))
+    return {"count": count, "truncated": limit is not None and count == limit}
+
+
+def stream_plan(query, queue, cancel=None):
+    """Run plan() incrementally, putting each top-k improvement on queue.
+
+    Ranks exactly like plan(): same key, same tie order, same final list.
+    cancel is an optional Event: once it is set the search stops between
+    graphs or results and a "cancelled" event ends the queue.
+    """
+    kwargs = _plan_kwargs(query)
+    top = _TopK(
+        kwargs.pop("num_keep"),
+        kwargs.pop("sort_key") or _default_sort_key,
+        reverse=kwargs.pop("reverse"),
+    )
+    milp_options = kwargs.pop("milp_options")
+    try:
+        graphs = _graphs(query, cancel, **kwargs)
+        results = analyze_graphs(graphs, milp_options=milp_options)
+        for result in _cutoff(results, query, cancel):
+            if top.push(result):
+                queue.put({"type": "result", "result": result.to_dict()})
+        if cancel is not None and cancel.is_set():
+            queue.put({"type": "cancelled"})
+            return
+        queue.put({"type": "done", "results": [r.to_dict() for r in top.items()]})
+    except Exception as e:
+        queue.put({"type": "error", "detail": f"{type(e).__name__}: {e}"})
+
+
+#
+# App
+#
+
+
+def _payload(query):
+    # Everything the worker needs, minus transport-only fields like deadline.
+    base = set(Query.model_fields)
+    d = {name: getattr(query, name) for name in type(query).model_fields if name not in base}
+    for (name, value) in d.items():
+        if isinstance(value, BaseModel):  # e.g. milp_options: plain dict for solve_milp
+            d[name] = value.model_dump(exclude_none=True)
+    d["yield"] = query.yield_
+    d["graph_kwargs"] = query.graph_kwargs()
+    return d
+
+
+def _coalesce_key(endpoint, payload):
+    return (endpoint, json.dumps(payload, sort_keys=True, default=str))
+
+
+def create_app(
+    library,
+    *,
+    max_workers=None,
+    default_deadline=None,
+    mp_context=None,
+    executor=None,
+):
+    """Build the FastAPI app serving library.
+
+    max_workers bounds the solve process pool.  default_deadline (seconds)
+    applies to requests that do not send their own.  mp_context is passed to
+    the ProcessPoolExecutor (e.g. multiprocessing.get_context("spawn")).
+    executor replaces the owned pool; its workers must already have run
+    init_worker(library), and the caller shuts it down.
+    """
+    state = {}
+    in_flight = {}
+
+    @asynccontextmanager
+    async def lifespan(app):
+        ctx = mp_context or multiprocessing.get_context()
+        if executor is None:
+            state["pool"] = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=ctx,
+                initializer=init_worker,
+                initargs=(library,),
+            )
+        else:
+            state["pool"] = executor
+        state["manager"] = ctx.Manager()
+        try:
+            yield
+        finally:
+            state["manager"].shutdown()
+            if executor is None:
+                state["pool"].shutdown(cancel_futures=True)
+
+    app = FastAPI(title="crafting-process", lifespan=lifespan)
+
+    def _deadline(query):
+        return query.deadline if query.deadline is not None else default_deadline
+
+    def _deadline_at(query):
+        # Wall-clock time, so the worker process can check it too.
+        deadline = _deadline(query)
+        return None if deadline is None else time.time() + deadline
+
+    async def _submit(endpoint, fn, query):
+        payload = _payload(query)
+        key = _coalesce_key(endpoint, payload)
+        deadline_at = _deadline_at(query)
+        (future, until) = in_flight.get(key, (None, None))
+        # Join a shared solve only if it will run at least as long as we wait.
+        if future is None or (
+            until is not None and (deadline_at is None or deadline_at > until)
+        ):
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                state["pool"], fn, {**payload, "deadline_at": deadline_at}
+            )
+            entry = in_flight[key] = (future, deadline_at)
+            future.add_done_callback(
+                lambda _: in_flight.pop(key) if in_flight.get(key) is entry else None
+            )
+        try:
+            # shield: one caller timing out or disconnecting must not cancel
+            # the solve other callers are waiting on.
+            return await asyncio.wait_for(asyncio.shield(future), _deadline(query))
+        except (asyncio.TimeoutError, TimeoutError):
+            raise HTTPException(status_code=504, detail="Deadline exceeded")
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    @app.get("/library")
+    async def get_library():
+        return {
+            "mode": library.mode,
+            "augments": sorted(library._augments),
+            "processes": {
+                name: proc.to_dict() for (name, proc) in library.recipes.items()
+            },
+        }
+
+    @app.post("/graphs/count")
+    async def post_graphs_count(query: CountQuery):
+        return await _submit("graphs/count", count_graphs, query)
+
+    @app.post("/plan")
+    async def post_plan(query: PlanQuery):
+        _check_sort_key(query)
+        return {"results": await _submit("plan", solve_plan, query)}
+
+    @app.post("/plan/stream")
+    async def post_plan_stream(query: PlanQuery, request: Request):
+        _check_sort_key(query)
+        loop = asyncio.get_running_loop()
+        events_queue = state["manager"].Queue()
+        cancel = state["manager"].Event()
+        deadline = _deadline(query)
+        future = loop.run_in_executor(
+            state["pool"],
+            stream_plan,
+            {**_payload(query), "deadline_at": _deadline_at(query)},
+            events_queue,
+            cancel,
+        )
+        end = None if deadline is None else loop.time() + deadline
+
+        async def next_event():
+            # The worker's next event; None once the client has gone away.
+            # Raises queue.Empty at the deadline.
+            while True:
+                timeout = DISCONNECT_POLL
+                if end is not None:
+                    timeout = min(timeout, max(0.0, end - loop.time()))
+                try:
+                    return await loop.run_in_executor(
+                        None, events_queue.get, True, timeout
+                    )
+                except queue.Empty:
+                    if end is not None and loop.time() >= end:
+                        raise
+                if await request.is_disconnected():
+                    return None
+
+        async def events():
+            try:
+                while True:
+                    try:
+                        event = await next_event()
+                    except queue.Empty:
+                        yield json.dumps(
+                            {"type": "error", "detail": "Deadline exceeded"}
+                        ) + "\n"
+                        return
+                    if event is None:
+                        return
+                    yield json.dumps(event) + "\n"
+                    if event["type"] != "result":
+                        await future
+                        return
+            finally:
+                # Also runs when a disconnect cancels or closes this generator:
+                # either way the worker stops and gives its pool slot back.
+                cancel.set()
+
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
+    return app
+
+
+def _check_sort_key(query):
+    if query.sort_key not in SORT_KEYS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown sort_key {query.sort_key!r}; expected one of {list(SORT_KEYS)}",
+        )
@@ -1,10 +1,35 @@
+import math
+import time
+from fractions import Fraction
+
 import numpy as np
 from scipy.optimize import milp
 from scipy.optimize import LinearConstraint
 from scipy.optimize import Bounds
 
+from . import profiling
+
+
+# Relative MIP gap below which HiGHS has proved the incumbent optimal.
+_OPTIMAL_GAP = 1e-9
 
-def solve_milp(dense, keys, max_leak=0):
+
+def solve_milp(
+    dense,
+    keys,
+    max_leak=0,
+    time_limit=None,
+    mip_rel_gap=None,
+    node_limit=None,
+):
+    """Minimise the total process count subject to |A @ x| <= max_leak.
+
+    time_limit (seconds), mip_rel_gap and node_limit bound the work HiGHS may
+    spend on one solve.  When a budget runs out, or HiGHS stops at
+    mip_rel_gap before closing the gap, the best incumbent found so far is
+    returned with optimal=False; if no incumbent exists the solve fails like
+    an infeasible one.
+    """
     c = np.ones(len(keys))
     A = np.array(dense)
     b_u = max_leak * np.ones(len(dense))
@@ -19,47 +44,114 @@ def solve_milp(dense, keys, max_leak=0):
     ub = max(10_000, int(matrix_scale) * 10) * np.ones_like(c)
     bounds = Bounds(lb=np.ones_like(c), ub=ub)
 
+    options = {
+        name: value
+        for (name, value) in [
+            ("time_limit", time_limit),
+            ("mip_rel_gap", mip_rel_gap),
+            ("node_limit", node_limit),
+        ]
+        if value is not None
+    }
+
+    start = time.perf_counter()
     res = milp(
         c=c,
         constraints=constraints,
         integrality=integrality,
         bounds=bounds,
+        options=options,
     )
+    profiling.record_solve(time.perf_counter() - start)
 
-    if res.success:
+    # Status 1 means a time/node limit was hit; HiGHS still reports its best
+    # incumbent in res.x when it found one.  A mip_rel_gap stop is status 0
+    # with success=True, so optimality also needs the final gap to be closed.
+    if res.success or (res.status == 1 and res.x is not None):
+        gap = getattr(res, "mip_gap", None) or 0
         return {
-            "answer": dict(zip(keys, map(int, res.x))),
+            "answer": dict(zip(keys, (int(round(v)) for v in res.x))),
             "result": res,
+            "optimal": res.status == 0 and gap <= _OPTIMAL_GAP,
         }
     else:
         raise ValueError("No solution found")
 
 
-def best_milp_sequence(matrix, keys):
-    max_leak = 1e12
-    last_answer = None
+# Matrix coefficients arrive as floats (rates like 2/3.2 per second), but they
+# almost always come from small rationals.  Recovering those lets leaks on an
+# integer answer be computed exactly instead of picking up rounding noise.
+_MAX_DENOMINATOR = 10**6
 
-    try:
-        soln = solve_milp(matrix, keys, max_leak=max_leak)
-    except ValueError:
-        return
-    else:
-        last_answer = soln["answer"]
-        leaks = matrix @ soln["result"].x
-        actual_leak = max(leaks, key=abs)
-        max_leak = 0.9 * abs(actual_leak)
-        yield (actual_leak, soln["answer"])
+
+def _rational(v):
+    exact = Fraction(v)
+    approx = exact.limit_denominator(_MAX_DENOMINATOR)
+    # Only accept the small-denominator form if it is the same number up to
+    # float rounding; otherwise keep the exact binary value of the float.
+    if abs(approx - exact) <= abs(exact) * 4 * 2**-52:
+        return approx
+    return exact
+
+
+def integerize(matrix):
+    """Scale each row of matrix to integers.
+
+    Returns a list of (int_row, scale) pairs such that int_row / scale
+    equals the rational value of the original row.
+    """
+    rows = []
+    for row in matrix:
+        fracs = [_rational(v) for v in row]
+        scale = math.lcm(*(f.denominator for f in fracs)) if fracs else 1
+        rows.append(([int(f * scale) for f in fracs], scale))
+    return rows
+
+
+def exact_leaks(int_matrix, counts):
+    """Exact per-pool leaks (as Fractions) for an integer count vector."""
+    return [
+        Fraction(sum(a * x for (a, x) in zip(int_row, counts)), scale)
+        for (int_row, scale) in int_matrix
+    ]
+
+
+def best_milp_solutions(matrix, keys, **milp_options):
+    """Like best_milp_sequence, but yield the solution dicts.
+
+    Each dict has "leak", "answer" and "optimal" (False when the solve hit a
+    time or node limit before proving optimality).  milp_options are passed
+    through to solve_milp.
+
+    Leaks are computed exactly on the integer answer, so the sequence stops
+    as soon as a solve fails to strictly reduce the leak (or reaches zero)
+    instead of chasing float noise with extra solves.
+    """
+    int_matrix = integerize(matrix)
+    max_leak = 1e12
+    best_leak = None
 
     while True:
         try:
-            soln = solve_milp(matrix, keys, max_leak=max_leak)
+            soln = solve_milp(matrix, keys, max_leak=max_leak, **milp_options)
         except ValueError:
             return
         else:
-            if soln["answer"] == last_answer:
+            counts = [soln["answer"][k] for k in keys]
+            actual_leak = max(exact_leaks(int_matrix, counts), key=abs, default=0)
+            if best_leak is not None and abs(actual_leak) >= best_leak:
+                return
+            best_leak = abs(actual_leak)
+            yield {
+                "leak": float(actual_leak),
+                "answer": soln["answer"],
+                "optimal": soln["optimal"],
+            }
+            if actual_leak == 0:
                 return
-            last_answer = soln["answer"]
-            leaks = matrix @ soln["result"].x
-            actual_leak = max(leaks, key=abs)
-            max_leak = 0.9 * abs(actual_leak)
-            yield (actual_leak, soln["answer"])
+            max_leak = 0.9 * float(best_leak)
+
+
+def best_milp_sequence(matrix, keys, **milp_options):
+    for soln in best_milp_solutions(matrix, keys, **milp_options):
+        yield (soln["leak"], soln["answer"])
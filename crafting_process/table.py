@@ -0,0 +1,266 @@
+"""Array-backed recipe tables for applying augments to many recipes at once.
+
+A RecipeTable holds the numbers of a set of processes as NumPy arrays: a
+duration vector (NaN where a process has no duration) and, for inputs and
+outputs, one (row, kind, amount) entry per nonzero component.  Recipe books
+have many kinds but few per recipe, so the entries are kept sparse rather
+than as a recipes x kinds matrix.  Amounts are computed as floats, but each
+entry remembers whether the per-process arithmetic would have stayed in ints
+(so "2 iron" stays 2, not 2.0, in descriptions and results).
+augmented(affine) evaluates an Affine augment for every row with
+broadcasting, and processes() turns the rows back into Process objects.
+"""
+
+import numpy as np
+
+from .augment import Affine
+from .process import Ingredients
+
+
+class _Entries:
+    """Sparse (row, col, value) components of one side of a table, row-sorted.
+
+    Within a row, entries keep the order their kinds were first seen in, like
+    the per-process arithmetic, so components come out in the same order and
+    graph search expands kinds in the same order.  ints flags the entries
+    whose value is an int in per-process arithmetic.
+    """
+
+    __slots__ = ("rows", "cols", "vals", "ints")
+
+    def __init__(self, rows, cols, vals, ints):
+        self.rows = rows
+        self.cols = cols
+        self.vals = vals
+        self.ints = ints
+
+    @classmethod
+    def coalesced(cls, rows, cols, vals, ints):
+        # Sum duplicate (row, col) pairs, then sort by row and, within a row,
+        # by where each pair first appeared.
+        order = np.lexsort((cols, rows))  # stable: duplicates stay in order
+        rows, cols, vals, ints = rows[order], cols[order], vals[order], ints[order]
+        if len(rows) == 0:
+            return cls(rows, cols, vals, ints)
+        starts = np.flatnonzero(
+            np.concatenate(([True], (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])))
+        )
+        rows = rows[starts]
+        first_seen = np.lexsort((order[starts], rows))
+        return cls(
+            rows[first_seen],
+            cols[starts][first_seen],
+            np.add.reduceat(vals, starts)[first_seen],
+            np.logical_and.reduceat(ints, starts)[first_seen],
+        )
+
+
+class RecipeTable:
+
+    def __init__(
+        self,
+        names,
+        templates,
+        kinds,
+        bases,
+        inputs,
+        outputs,
+        durations,
+        int_durations=None,
+        source=None,
+    ):
+        self.names = names
+        self.templates = templates  # source processes: class, name, annotations, ...
+        self.kinds = kinds
+        self.bases = bases  # kind -> basis object for Ingredients.from_triples
+        self.inputs = inputs
+        self.outputs = outputs
+        self.durations = durations
+        # Rows whose duration is still the template's int duration.
+        self.int_durations = (
+            np.zeros(len(names), dtype=bool) if int_durations is None else int_durations
+        )
+        self._source = source or self  # table built straight from the templates
+
+    @classmethod
+    def from_processes(cls, items):
+        """Build a table from (name, process) pairs."""
+        items = list(items)
+        kinds = []
+        index = {}
+        bases = {}
+        sides = ([], [])  # (rows, cols, vals) triples per side
+        for (i, (_, proc)) in enumerate(items):
+            for (side, vec) in zip(sides, (proc.inputs, proc.outputs)):
+                for (kind, coef, basis) in vec.triples():
+                    if kind not in index:
+                        index[kind] = len(kinds)
+                        kinds.append(kind)
+                        bases[kind] = basis
+                    side.append((i, index[kind], coef))
+
+        def _entries(triples):
+            rows, cols, vals = zip(*triples) if triples else ((), (), ())
+            return _Entries.coalesced(
+                np.array(rows, dtype=np.intp),
+                np.array(cols, dtype=np.intp),
+                np.array(vals, dtype=float),
+                np.array([isinstance(v, int) for v in vals], dtype=bool),
+            )
+
+        durations = np.array(
+            [np.nan if p.duration is None else p.duration for (_, p) in items],
+            dtype=float,
+        )
+        return cls(
+            [n for (n, _) in items],
+            [p for (_, p) in items],
+            kinds,
+            bases,
+            _entries(sides[0]),
+            _entries(sides[1]),
+            durations,
+            np.array([isinstance(p.duration, int) for (_, p) in items], dtype=bool),
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def _side(self, entries, index, scale, kind_scale, offset, rate_offset):
+        if scale == 1 and not kind_scale and offset is None and rate_offset is None:
+            return entries
+        factors = np.full(len(index), float(scale))
+        int_factors = np.full(len(index), isinstance(scale, int))
+        for (kind, f) in kind_scale.items():
+            if kind in index:
+                factors[index[kind]] *= f
+                int_factors[index[kind]] &= isinstance(f, int)
+        rows = [entries.rows]
+        cols = [entries.cols]
+        vals = [entries.vals * factors[entries.cols]]
+        ints = [entries.ints & int_factors[entries.cols]]
+
+        n = len(self.names)
+        all_rows = np.arange(n, dtype=np.intp)
+        for (vec, per_row, int_rows) in (
+            (offset, None, np.ones(n, dtype=bool)),
+            (rate_offset, self.durations, self.int_durations),
+        ):
+            if vec is None:
+                continue
+            if per_row is not None and np.isnan(per_row).any():
+                raise ValueError(
+                    "Process which has no duration cannot take a rate offset"
+                )
+            for (kind, coef, _) in vec.triples():
+                rows.append(all_rows)
+                cols.append(np.full(n, index[kind], dtype=np.intp))
+                vals.append(
+                    np.full(n, float(coef)) if per_row is None else coef * per_row
+                )
+                ints.append(int_rows & isinstance(coef, int))
+
+        return _Entries.coalesced(
+            np.concatenate(rows),
+            np.concatenate(cols),
+            np.concatenate(vals),
+            np.concatenate(ints),
+        )
+
+    def augmented(self, aug):
+        """Return a new table with the Affine augment aug applied to every row."""
+        if not isinstance(aug, Affine):
+            raise ValueError(
+                f"Only Affine augments can be vectorized, got {aug!r}; "
+                "apply other callables per process"
+            )
+        # Kinds that only appear in the augment's offsets get new columns.
+        kinds = list(self.kinds)
+        bases = dict(self.bases)
+        for vec in (
+            aug.input_offset,
+            aug.input_rate_offset,
+            aug.output_offset,
+            aug.output_rate_offset,
+        ):
+            for (kind, _, basis) in vec.triples() if vec is not None else ():
+                if kind not in bases:
+                    kinds.append(kind)
+                    bases[kind] = basis
+        index = {kind: j for (j, kind) in enumerate(kinds)}
+
+        inputs = self._side(
+            self.inputs,
+            index,
+            aug.input_scale,
+            aug.input_kind_scale,
+            aug.input_offset,
+            aug.input_rate_offset,
+        )
+        outputs = self._side(
+            self.outputs,
+            index,
+            aug.output_scale,
+            aug.output_kind_scale,
+            aug.output_offset,
+            aug.output_rate_offset,
+        )
+        # NaN (no duration) stays NaN.  Any real change is a true division.
+        if aug.duration_mul == 1 and aug.duration_div == 1:
+            durations = self.durations
+            int_durations = self.int_durations
+        else:
+            durations = self.durations * aug.duration_mul / aug.duration_div
+            int_durations = None
+        return RecipeTable(
+            self.names,
+            self.templates,
+            kinds,
+            bases,
+            inputs,
+            outputs,
+            durations,
+            int_durations,
+            source=self._source,
+        )
+
+    def _vectors(self, entries, attr):
+        if entries is getattr(self._source, attr):
+            # Untouched since from_processes: reuse the templates' vectors.
+            return [getattr(p, attr) for p in self.templates]
+        rows = [[] for _ in self.names]
+        kinds = self.kinds
+        bases = self.bases
+        for (i, j, v, is_int) in zip(
+            entries.rows.tolist(),
+            entries.cols.tolist(),
+            entries.vals.tolist(),
+            entries.ints.tolist(),
+        ):
+            kind = kinds[j]
+            rows[i].append((kind, int(v) if is_int else v, bases[kind]))
+        return [Ingredients.from_triples(row) for row in rows]
+
+    def processes(self, **overrides):
+        """One Process per row, copied from its template with the table's numbers.
+
+        overrides are passed to each copy; a callable override is called with
+        the template process to get that row's value.
+        """
+        inputs = self._vectors(self.inputs, "inputs")
+        outputs = self._vectors(self.outputs, "outputs")
+        durations = [
+            None if d != d else int(d) if is_int else d  # NaN: no duration
+            for (d, is_int) in zip(self.durations.tolist(), self.int_durations.tolist())
+        ]
+        result = []
+        for (template, ins, outs, duration) in zip(
+            self.templates, inputs, outputs, durations
+        ):
+            extra = {
+                k: (v(template) if callable(v) else v) for (k, v) in overrides.items()
+            }
+            result.append(
+                template.copy(inputs=ins, outputs=outs, duration=duration, **extra)
+            )
+        return result
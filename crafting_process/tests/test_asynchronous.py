@@ -0,0 +1,205 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from crafting_process import asynchronous
+from crafting_process import library as library_module
+from crafting_process.asynchronous import AsyncPlanner, analyze_async, plan_async
+from crafting_process.library import ProcessLibrary
+from crafting_process.orchestration import analyze_graphs, plan, production_graphs
+from crafting_process.process import Ingredients
+
+
+@pytest.fixture
+def library():
+    lib = ProcessLibrary("batch")
+    lib.add_from_text("""
+        2 iron | smelt
+        3 ore
+
+        2 iron + 1 slag | smelt_messy
+        3 ore
+
+        1 widget | press
+        2 iron
+    """)
+    return lib
+
+
+@pytest.fixture
+def planner():
+    p = AsyncPlanner(max_workers=4, max_concurrency=2)
+    yield p
+    p.shutdown()
+
+
+def _summary(results):
+    return [
+        (r.leak, r.total_processes, sorted(pc.description for pc in r.process_counts))
+        for r in results
+    ]
+
+
+def test_plan_async_matches_plan(library, planner):
+    got = asyncio.run(plan_async(library, "1 widget", num_keep=3, planner=planner))
+    assert _summary(got) == _summary(plan(library, "1 widget", num_keep=3))
+
+
+def test_plan_async_reverse_and_sort_key(library, planner):
+    kwargs = {"num_keep": 1, "reverse": True, "sort_key": lambda r: r.total_processes}
+    got = asyncio.run(plan_async(library, "1 widget", planner=planner, **kwargs))
+    assert _summary(got) == _summary(plan(library, "1 widget", **kwargs))
+
+
+def test_plan_async_forwards_graph_options(library, planner):
+    got = asyncio.run(
+        plan_async(library, "1 widget", skip_processes=["smelt_messy"], planner=planner)
+    )
+    descriptions = {pc.description for r in got for pc in r.process_counts}
+    assert not any("smelt_messy" in d for d in descriptions)
+
+
+def test_analyze_async_yields_analyze_graphs_order(library, planner):
+    async def collect():
+        return [r async for r in analyze_async(library, "1 widget", planner=planner)]
+
+    expected = analyze_graphs(
+        production_graphs(library, Ingredients.parse("1 widget"))
+    )
+    assert _summary(asyncio.run(collect())) == _summary(expected)
+
+
+def test_default_planner_survives_separate_event_loops(library):
+    first = asyncio.run(plan_async(library, "1 widget"))
+    second = asyncio.run(plan_async(library, "1 widget"))
+    assert _summary(first) == _summary(second)
+
+
+def _fake_search(log, name, steps, delay=0.05):
+    def analyze(graphs, milp_options=None):
+        try:
+            for i in range(steps):
+                log.append(("start", name, i))
+                time.sleep(delay)
+                log.append(("end", name, i))
+                yield i
+        finally:
+            log.append(("closed", name))
+
+    return analyze
+
+
+def test_cancellation_stops_the_search(library, monkeypatch):
+    log = []
+    monkeypatch.setattr(asynchronous, "analyze_graphs", _fake_search(log, "q", 100))
+    planner = AsyncPlanner(max_workers=2)
+
+    async def run():
+        task = asyncio.create_task(planner.plan(library, "1 widget", sort_key=int))
+        await asyncio.sleep(0.12)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    planner.shutdown()
+    assert log[-1] == ("closed", "q")
+    assert sum(1 for e in log if e[0] == "end") < 10
+
+
+def test_concurrency_limit_interleaves_queries(library, monkeypatch):
+    log = []
+    searches = iter([_fake_search(log, "a", 4), _fake_search(log, "b", 4)])
+    monkeypatch.setattr(
+        asynchronous,
+        "analyze_graphs",
+        lambda graphs, milp_options=None: next(searches)(graphs, milp_options),
+    )
+    planner = AsyncPlanner(ThreadPoolExecutor(max_workers=4), max_concurrency=1)
+
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def watch(event):
+        nonlocal active, peak
+        with lock:
+            active += 1 if event[0] == "start" else -1 if event[0] == "end" else 0
+            peak = max(peak, active)
+
+    async def run():
+        return await asyncio.gather(
+            planner.plan(library, "1 widget", sort_key=int),
+            planner.plan(library, "1 widget", sort_key=int),
+        )
+
+    asyncio.run(run())
+    for event in log:
+        watch(event)
+    assert peak == 1
+    starts = [name for (kind, name, *_) in log if kind == "start"]
+    # Neither query runs all of its steps before the other gets a turn.
+    assert starts[:4] != [starts[0]] * 4
+
+
+def test_concurrent_queries_index_a_cold_library_once(monkeypatch):
+    text = """
+        @fast
+
+        2 iron | smelt [tier=1]
+        3 ore
+
+        @-
+
+        2 iron + 1 slag | smelt_messy [tier=2]
+        3 ore
+
+        1 widget | press [tier=2]
+        2 iron
+    """
+    from crafting_process.augment import Augments
+
+    augments = {"fast": Augments.mul_speed(2)}
+    expected = plan(ProcessLibrary("batch", text=text, augments=augments), "1 widget")
+    builds = []
+    real_init = library_module._RecipeIndex.__init__
+
+    def slow_init(self, recipes):
+        builds.append(len(recipes))
+        time.sleep(0.05)  # widen the window for a racing second build
+        real_init(self, recipes)
+
+    monkeypatch.setattr(library_module._RecipeIndex, "__init__", slow_init)
+    cold = ProcessLibrary("batch", text=text, augments=augments)
+    planner = AsyncPlanner(max_workers=4, max_concurrency=4)
+    options = [{}, {"skip_augments": ["fast"]}, {}, {"skip_augments": ["fast"]}]
+
+    async def run():
+        return await asyncio.gather(
+            *(plan_async(cold, "1 widget", planner=planner, **o) for o in options)
+        )
+
+    got = asyncio.run(run())
+    planner.shutdown()
+    assert builds == [4]
+    assert _summary(got[0]) == _summary(got[2]) == _summary(expected)
+    assert got[1] and _summary(got[1]) == _summary(got[3])
+    assert len(cold.recipe_index().views) == 1
+
+
+def test_results_close_after_shutdown(library, monkeypatch):
+    log = []
+    monkeypatch.setattr(asynchronous, "analyze_graphs", _fake_search(log, "q", 5, 0))
+    planner = AsyncPlanner(max_workers=1)
+
+    async def run():
+        results = planner.results(library, "1 widget")
+        assert await results.__anext__() == 0
+        planner.shutdown()
+        await results.aclose()
+
+    asyncio.run(run())
+    assert log[-1] == ("closed", "q")
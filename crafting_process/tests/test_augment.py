@@ -61,6 +61,14 @@ def test_mul_speed_preserves_io():
     assert result.inputs["iron"] == 3
 
 
+def test_factories_accept_the_process_directly():
+    p = make_process(duration=4.0)
+    assert Augments.mul_speed(2, p).duration == pytest.approx(2.0)
+    assert Augments.mul_outputs(3, p).outputs["widget"] == 6
+    more = Ingredients.parse("1 coal")
+    assert Augments.add_input(more, p).inputs["coal"] == 1
+
+
 # ---------------------------------------------------------------------------
 # Augments.mul_inputs / mul_outputs
 # ---------------------------------------------------------------------------
@@ -188,3 +196,94 @@ def test_augment_annotations_independent():
     result = Augments.mul_speed(2.0)(p)
     result.annotations["tier"] = 99
     assert p.annotations["tier"] == 2
+
+
+# ---------------------------------------------------------------------------
+# Affine fusion
+# ---------------------------------------------------------------------------
+
+
+def _stepwise(augs, p):
+    for aug in augs:
+        p = aug(p)
+    return p
+
+
+def _assert_same_numbers(a, b):
+    assert a.duration == pytest.approx(b.duration)
+    for attr in ("inputs", "outputs"):
+        va, vb = getattr(a, attr), getattr(b, attr)
+        kinds = set(va.nonzero_components) | set(vb.nonzero_components)
+        for kind in kinds:
+            assert va[kind] == pytest.approx(vb[kind]), (attr, kind)
+
+
+def test_builtin_augments_are_affine():
+    from crafting_process.augment import Affine
+
+    assert isinstance(Augments.mul_speed(2.0), Affine)
+    assert isinstance(Augments.increase_energy_pct("kWe", 10), Affine)
+
+
+def test_composed_builtins_fuse_into_one_affine():
+    from crafting_process.augment import Affine
+
+    aug = Augments.composed(
+        [
+            Augments.mul_speed(2.0),
+            Augments.mul_inputs(3.0),
+            Augments.add_input_rate(Ingredients.parse("1 kWe")),
+        ]
+    )
+    assert isinstance(aug, Affine)
+
+
+def test_fused_chain_matches_stepwise_application():
+    augs = [
+        Augments.add_input(Ingredients.parse("10 kWe")),
+        Augments.mul_speed(3.0),
+        Augments.add_input_rate(Ingredients.parse("2 kWe + 1 water")),
+        Augments.increase_energy_pct("kWe", 25),
+        Augments.mul_duration(1.5),
+        Augments.mul_outputs(2.0),
+        Augments.add_output_rate(Ingredients.parse("0.5 scrap")),
+        Augments.mul_inputs(0.75),
+        Augments.add_output(Ingredients.parse("1 widget")),
+    ]
+    p = make_process(inputs="3 iron + 100 kWe", outputs="2 widget", duration=4.0)
+    _assert_same_numbers(Augments.composed(augs)(p), _stepwise(augs, p))
+
+
+def test_fused_chain_on_process_without_duration():
+    augs = [Augments.mul_speed(2.0), Augments.mul_outputs(3.0), Augments.mul_duration(2)]
+    p = make_process(duration=None)
+    result = Augments.composed(augs)(p)
+    assert result.duration is None
+    _assert_same_numbers(result, _stepwise(augs, p))
+
+
+def test_rate_offset_without_duration_raises():
+    p = make_process(duration=None)
+    with pytest.raises(ValueError):
+        Augments.add_input_rate(Ingredients.parse("1 kWe"))(p)
+
+
+def test_composed_mixes_affine_and_custom_callables():
+    def rename(p):
+        return p.copy(process="renamed")
+
+    augs = [Augments.mul_speed(2.0), rename, Augments.mul_outputs(3.0)]
+    p = make_process(duration=4.0, outputs="2 widget")
+    result = Augments.composed(augs)(p)
+    assert result.process == "renamed"
+    _assert_same_numbers(result, _stepwise(augs, p))
+
+
+def test_apply_folds_overrides_into_single_copy():
+    p = make_annotated({"tier": 1}, applied_augments=["a"])
+    aug = Augments.composed([Augments.mul_speed(2.0), Augments.mul_outputs(2.0)])
+    result = Augments.apply(aug, p, applied_augments=["a", "b"])
+    assert result.applied_augments == ["a", "b"]
+    assert result.annotations == {"tier": 1}
+    assert result.duration == pytest.approx(2.0)
+    assert p.applied_augments == ["a"]
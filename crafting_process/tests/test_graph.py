@@ -283,6 +283,80 @@ def test_union_contains_all_processes():
     assert "p" in g3.processes
 
 
+# ---------------------------------------------------------------------------
+# with_process
+# ---------------------------------------------------------------------------
+
+
+def test_with_process_replaces_process():
+    g, _, press = two_process_graph()
+    bigger = BatchProcess(
+        outputs=Ingredients.parse("2 widget"), inputs=Ingredients.parse("4 iron")
+    )
+    new = g.with_process(press, bigger)
+    assert new.processes[press] is bigger
+
+
+def test_with_process_is_non_mutating():
+    g, _, press = two_process_graph()
+    original = g.processes[press]
+    bigger = BatchProcess(
+        outputs=Ingredients.parse("2 widget"), inputs=Ingredients.parse("4 iron")
+    )
+    g.with_process(press, bigger)
+    assert g.processes[press] is original
+
+
+def test_with_process_keeps_structure():
+    g, smelter, press = two_process_graph()
+    bigger = BatchProcess(
+        outputs=Ingredients.parse("2 widget"), inputs=Ingredients.parse("4 iron")
+    )
+    new = g.with_process(press, bigger)
+    assert new.pools == g.pools
+    assert new.open_inputs == g.open_inputs
+    assert new.open_outputs == g.open_outputs
+    matrix = new.build_exchange_matrix()
+    press_col = matrix["processes"].index(press)
+    assert matrix["matrix"][0][press_col] == pytest.approx(-4.0)
+
+
+def test_with_process_reuses_depths_and_matrix_columns():
+    g, smelter, press = two_process_graph()
+    before = g.build_exchange_matrix()
+    g.process_depths()
+    bigger = BatchProcess(
+        outputs=Ingredients.parse("2 widget"), inputs=Ingredients.parse("4 iron")
+    )
+    new = g.with_process(press, bigger)
+    assert new._depth_cache[1] is g._depth_cache[1]
+    assert new.process_depths() == g.process_depths()
+    assert new._depth_cache[1] is g._depth_cache[1]
+    rows = new._matrix_cache[1][2]
+    matrix = new.build_exchange_matrix()
+    assert new._matrix_cache[1][2] is rows  # served from the carried matrix
+    fresh = GraphBuilder.union(new, GraphBuilder()).build_exchange_matrix()
+    assert matrix == fresh
+    col = matrix["processes"].index(smelter)
+    assert [row[col] for row in matrix["matrix"]] == [
+        row[col] for row in before["matrix"]
+    ]
+    assert g.build_exchange_matrix() == before
+
+
+def test_exchange_matrix_cache_follows_process_swaps():
+    g, _, press = two_process_graph()
+    first = g.build_exchange_matrix()
+    assert g.build_exchange_matrix() == first
+    first["matrix"][0][0] = 99  # callers get their own lists
+    assert g.build_exchange_matrix()["matrix"][0][0] != 99
+    g.processes[press] = BatchProcess(
+        outputs=Ingredients.parse("1 widget"), inputs=Ingredients.parse("5 iron")
+    )
+    col = g.build_exchange_matrix()["processes"].index(press)
+    assert g.build_exchange_matrix()["matrix"][0][col] == pytest.approx(-5.0)
+
+
 # ---------------------------------------------------------------------------
 # coalesce_pools
 # ---------------------------------------------------------------------------
@@ -455,6 +529,86 @@ def test_output_depths_keys_are_process_descriptions():
     assert set(depths.keys()) == expected_descs
 
 
+def _batch(text_out, text_in):
+    return BatchProcess(outputs=Ingredients.parse(text_out), inputs=Ingredients.parse(text_in))
+
+
+def _graph_of(*steps):
+    """A graph holding the named processes, not yet connected."""
+    g = GraphBuilder()
+    for (name, process) in steps:
+        g.add_process(process, name=name)
+    return g
+
+
+def test_process_depths_take_the_longest_path():
+    # ore -> a -> b -> sink and ore -> sink directly: ore is 3 deep, not 1.
+    g = _graph_of(
+        ("sink", _batch("1 _", "1 b + 1 ore")),
+        ("b", _batch("1 b", "1 a")),
+        ("a", _batch("1 a", "1 ore")),
+        ("ore", _batch("2 ore", "1 rock")),
+    )
+    g.connect_named("b", "sink", kind="b")
+    g.connect_named("a", "b", kind="a")
+    g.connect_named("ore", "a", kind="ore")
+    g.connect_named("ore", "sink", kind="ore")
+    assert g.process_depths() == {"sink": 0, "b": 1, "a": 2, "ore": 3}
+
+
+def test_process_depths_cycle_shares_a_depth():
+    g = _graph_of(
+        ("sink", _batch("1 _", "1 a")),
+        ("a", _batch("2 a", "1 b")),
+        ("b", _batch("1 b", "1 a + 1 ore")),
+        ("ore", _batch("1 ore", "1 rock")),
+    )
+    g.connect_named("a", "sink", kind="a")
+    g.connect_named("b", "a", kind="b")
+    g.connect_named("a", "b", kind="a")
+    g.connect_named("ore", "b", kind="ore")
+    depths = g.process_depths()
+    assert depths["a"] == depths["b"] == 1
+    assert depths["ore"] == 2
+
+
+def test_process_depths_deep_chain_is_stack_safe():
+    import sys
+
+    n = 3 * sys.getrecursionlimit()
+    g = _graph_of(*((f"p{i}", _batch(f"1 k{i}", f"1 k{i + 1}")) for i in range(n)))
+    for i in range(n - 1):
+        g.connect_named(f"p{i + 1}", f"p{i}", kind=f"k{i + 1}")
+    assert g.process_depths()[f"p{n - 1}"] == n - 1
+
+
+def test_depths_are_cached_until_the_graph_changes():
+    g, smelter, press = two_process_graph()
+    assert g.output_depths() is not g.output_depths()  # callers get copies
+    cache = g._depth_cache
+    g.process_depths()
+    assert g._depth_cache is cache
+    g.add_process(make_ore_smelter(), name="second")
+    g.connect_named("second", "press", kind="iron")
+    assert g.process_depths()["second"] == 1
+    assert g._depth_cache is not cache
+
+
+def test_depths_follow_rewiring_that_keeps_the_counts():
+    g = _graph_of(
+        ("a", _batch("1 x", "1 ore")),
+        ("b", _batch("1 y", "1 x")),
+        ("c", _batch("1 z", "1 y")),
+    )
+    g.connect_named("a", "b", kind="x")
+    g.connect_named("b", "c", kind="y")
+    assert g.process_depths() == {"a": 2, "b": 1, "c": 0}
+    # Pool dicts are shared between graphs, so they can change behind g's back.
+    (pool,) = g.find_pools_by_kind("y")
+    (pool["inputs"], pool["outputs"]) = (["c"], ["b"])
+    assert g.process_depths() == {"a": 1, "b": 0, "c": 1}
+
+
 # ---------------------------------------------------------------------------
 # build_matrix (continuous / rate-based) — analogous to build_batch_matrix
 # ---------------------------------------------------------------------------
@@ -0,0 +1,49 @@
+import subprocess
+import sys
+
+import pytest
+
+import crafting_process
+
+
+def _modules_after_import(code):
+    out = subprocess.run(
+        [sys.executable, "-c", f"{code}\nimport sys; print(' '.join(sys.modules))"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(out.stdout.split())
+
+
+def test_import_does_not_load_solver_dependencies():
+    modules = _modules_after_import(
+        "import crafting_process\n"
+        "from crafting_process import ProcessLibrary, P, Ingredients"
+    )
+    assert "crafting_process.orchestration" not in modules
+    assert "scipy" not in modules
+    assert "numpy" not in modules
+    assert "coolname" not in modules
+
+
+def test_lazy_symbol_loads_orchestration():
+    modules = _modules_after_import("from crafting_process import plan")
+    assert "crafting_process.orchestration" in modules
+
+
+def test_lazy_symbols_resolve_to_their_module_objects():
+    import importlib
+
+    for (name, module) in crafting_process._LAZY.items():
+        source = importlib.import_module(module, "crafting_process")
+        assert getattr(crafting_process, name) is getattr(source, name)
+
+
+def test_all_names_listed_in_dir():
+    assert set(crafting_process.__all__) <= set(dir(crafting_process))
+
+
+def test_unknown_attribute_raises_attribute_error():
+    with pytest.raises(AttributeError):
+        crafting_process.no_such_symbol
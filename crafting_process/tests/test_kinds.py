@@ -0,0 +1,143 @@
+import pickle
+import threading
+
+from crafting_process.graph import GraphBuilder
+from crafting_process.kinds import KINDS, KindTable
+from crafting_process.library import ProcessLibrary
+from crafting_process.process import BatchProcess, ContinuousProcess, Ingredients
+
+# ---------------------------------------------------------------------------
+# KindTable
+# ---------------------------------------------------------------------------
+
+
+def test_ids_are_small_and_stable():
+    table = KindTable()
+    assert [table.id(k) for k in ("iron", "ore", "iron")] == [0, 1, 0]
+    assert table.name(1) == "ore"
+    assert len(table) == 2
+    assert "ore" in table and "coal" not in table
+    assert table.find("ore") == 1 and table.find("coal") is None
+
+
+def test_intern_returns_one_object_per_name():
+    table = KindTable()
+    a = "".join(["iron", " plate"])
+    b = "".join(["iron ", "plate"])
+    assert a is not b
+    assert table.intern(a) is a  # not registered: returned as is
+    table.id(a)
+    assert table.intern(b) is a
+    assert len(table) == 1
+
+
+def test_concurrent_ids_are_unique():
+    table = KindTable()
+    names = [f"kind{i}" for i in range(200)]
+
+    def assign():
+        for name in names:
+            table.id(name)
+
+    threads = [threading.Thread(target=assign) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(table.id(n) for n in names) == list(range(200))
+
+
+# ---------------------------------------------------------------------------
+# Ingredients and processes
+# ---------------------------------------------------------------------------
+
+
+def test_parsed_kinds_are_interned():
+    KINDS.id("iron plate")
+    a = Ingredients.parse("2 iron  plate + 1 ore")
+    b = Ingredients.parse("3 iron plate")
+    (name_a,) = [n for n in a.nonzero_components if n.startswith("iron")]
+    (name_b,) = list(b.nonzero_components)
+    assert name_a is name_b is KINDS.intern("iron plate")
+    assert a["iron plate"] == 2
+
+
+def test_parsing_does_not_register_kinds():
+    before = len(KINDS)
+    q = Ingredients.parse("1 never seen kind xyzzy + 2 another unseen kind")
+    assert q["never seen kind xyzzy"] == 1
+    assert len(KINDS) == before
+    assert KINDS.find("never seen kind xyzzy") is None
+
+
+def test_library_registers_recipe_kinds():
+    ProcessLibrary("batch", text="1 zinc plate | roll\n2 zinc ingot\n")
+    assert KINDS.find("zinc plate") is not None
+    assert KINDS.find("zinc ingot") is not None
+    (name,) = list(Ingredients.parse("1 zinc plate").nonzero_components)
+    assert name is KINDS.intern("zinc plate")
+
+
+def test_exchange_by_id_skips_unregistered_kinds_until_registered():
+    p = BatchProcess(
+        Ingredients.parse("1 iron"), Ingredients.parse("2 unregistered ore qux")
+    )
+    KINDS.id("iron")
+    assert p.exchange_by_id == {KINDS.id("iron"): 1}
+    ore = KINDS.id("unregistered ore qux")
+    assert p.exchange_by_id[ore] == -2
+
+
+def test_exchange_by_id_matches_exchange():
+    KINDS.id("iron")
+    KINDS.id("ore")
+    p = ContinuousProcess(Ingredients.parse("2 iron"), Ingredients.parse("3 ore"), duration=2)
+    assert p.exchange_by_id == {KINDS.id("iron"): 1.0, KINDS.id("ore"): -1.5}
+
+
+def test_exchange_by_id_follows_replaced_vectors():
+    for kind in ("iron", "ore", "coal"):
+        KINDS.id(kind)
+    p = BatchProcess(Ingredients.parse("2 iron"), Ingredients.parse("3 ore"))
+    assert p.exchange_by_id[KINDS.id("ore")] == -3
+    p.inputs = Ingredients.parse("1 coal")
+    assert KINDS.id("ore") not in p.exchange_by_id
+    assert p.exchange_by_id[KINDS.id("coal")] == -1
+
+
+def test_pickled_process_drops_id_cache():
+    p = BatchProcess(Ingredients.parse("2 iron"), Ingredients.parse("3 ore"))
+    p.exchange_by_id
+    copy = pickle.loads(pickle.dumps(p))
+    assert "_exchange_by_id" not in vars(copy)
+    assert copy.exchange_by_id == p.exchange_by_id
+
+
+# ---------------------------------------------------------------------------
+# Matrix builder
+# ---------------------------------------------------------------------------
+
+
+def test_exchange_matrix_reads_pool_members_only():
+    g = GraphBuilder.from_process(
+        BatchProcess(Ingredients.parse("2 iron"), Ingredients.parse("3 ore")), name="smelt"
+    ).output_into(
+        GraphBuilder.from_process(
+            BatchProcess(Ingredients.parse("1 plate"), Ingredients.parse("1 iron + 1 ore")),
+            name="press",
+        )
+    )
+    m = g.build_exchange_matrix()
+    (pool,) = m["pools"]
+    assert m["processes"] == ["smelt", "press"]
+    assert m["matrix"] == [[2, -1]]
+
+
+def test_planning_a_query_registers_no_new_kinds():
+    from crafting_process.orchestration import plan
+
+    lib = ProcessLibrary("batch", text="1 gear | press\n2 iron\n\n1 iron | smelt\n2 ore\n")
+    before = len(KINDS)
+    results = plan(lib, "1 gear + 1 client made up kind")
+    assert results
+    assert len(KINDS) == before
@@ -1323,3 +1323,323 @@ def test_with_augment_filter_propagates_mode():
     lib = ProcessLibrary("batch", text="1 iron | smelt\n2 ore\n")
     filtered = lib.with_augment_filter()
     assert filtered.mode == "batch"
+
+
+# ---------------------------------------------------------------------------
+# Indexed predicates
+# ---------------------------------------------------------------------------
+
+
+INDEXED_TEXT = """
+@mk2
+
+1 iron | smelt duration=2 [tier=1 | category=smelting]
+2 ore
+
+1 copper | smelt duration=2 [tier=1 | category=smelting]
+2 copper_ore
+
+@-
+
+1 widget | press [tier=2 | category=assembly]
+2 iron + 1 copper
+
+1 gear | press [tier=3 | category=assembly]
+1 iron
+"""
+
+
+@pytest.fixture
+def indexed_library():
+    from crafting_process.augment import Augments
+
+    return ProcessLibrary(
+        "batch", augments={"mk2": Augments.mul_speed(2)}, text=INDEXED_TEXT
+    )
+
+
+def _indexed_preds():
+    from crafting_process.library import P
+
+    opaque = P.annotation("tier", lambda t: t >= 2)
+    return [
+        P.produces("iron"),
+        P.consumes("iron"),
+        P.process_is("press"),
+        P.has_augment("mk2"),
+        P.annotation_eq("category", "smelting"),
+        P.annotation_eq("tier", 1),
+        P.annotation_eq("category", "assembly") & P.annotation_eq("tier", 3),
+        P.produces("iron") | P.consumes("iron"),
+        P.process_is("smelt") & ~P.has_augment("mk2"),
+        ~(P.produces("gear") | P.annotation_eq("tier", 1)),
+        opaque & P.consumes("iron"),
+        P.process_is("press") | opaque,
+        ~opaque,
+        P.produces("iron") & (lambda p: p.duration == 1),
+        P.annotation_between("tier", 2, 3),
+        P.annotation_between("tier", hi=1),
+        P.annotation_between("tier", lo=2.5),
+        P.annotation_between("tier", 5, 9),
+        P.annotation_between("category", 0, 9),
+        P.annotation_between("tier", 1, 2) & P.has_augment("mk2"),
+        ~P.annotation_between("tier", 2),
+    ]
+
+
+@pytest.mark.parametrize("index", range(len(_indexed_preds())))
+def test_indexed_filter_matches_scan(indexed_library, index):
+    pred = _indexed_preds()[index]
+    expected = [n for (n, p) in indexed_library.recipes.items() if pred(p)]
+    assert list(indexed_library.filter(pred).recipes) == expected
+
+
+def test_annotation_eq_pred_is_indexed():
+    from crafting_process.library import P
+
+    assert P.annotation_eq("tier", 1).node == ("key", ("ann", "tier", 1))
+    assert P.annotation_eq("tags", ["a"]).node is None
+
+
+def test_annotation_between_is_inclusive_and_numeric_only():
+    from crafting_process.library import P
+
+    proc = BatchProcess(Ingredients.parse("1 a"), Ingredients.parse("1 b"))
+    between = P.annotation_between("tier", 1, 3)
+    assert between.node == ("range", "tier", 1, 3)
+    assert between(proc.copy(annotations={"tier": 1}))
+    assert between(proc.copy(annotations={"tier": 3.0}))
+    assert not between(proc.copy(annotations={"tier": 4}))
+    assert not between(proc.copy(annotations={"tier": True}))
+    assert not between(proc.copy(annotations={"tier": "2"}))
+    assert not between(proc)
+
+
+def test_annotation_range_index_tracks_recipes_added_later(indexed_library):
+    from crafting_process.library import P
+
+    low = P.annotation_between("tier", hi=1)
+    assert len(indexed_library.filter(low).recipes) == 4
+    indexed_library.add_from_text("1 plate | roll [tier=0]\n1 iron\n")
+    assert "plate via roll" in indexed_library.filter(low).recipes
+    assert len(indexed_library.filter(low).recipes) == 5
+
+
+def test_opaque_pred_only_scans_remaining_candidates(indexed_library):
+    from crafting_process.library import P
+
+    seen = []
+
+    def opaque(p):
+        seen.append(p)
+        return True
+
+    indexed_library.filter(P.process_is("press") & opaque)
+    assert len(seen) == 2
+    assert all(p.process == "press" for p in seen)
+
+
+def test_producing_uses_index_in_insertion_order(indexed_library):
+    names = [n for (n, _) in indexed_library.producing("iron")]
+    assert names == ["iron via smelt", "iron via smelt @mk2"]
+
+
+def test_index_tracks_recipes_added_later(indexed_library):
+    from crafting_process.library import P
+
+    indexed_library.filter(P.produces("plate"))  # build the index
+    indexed_library.add_from_text("1 plate | roll\n1 iron\n")
+    assert list(indexed_library.filter(P.produces("plate")).recipes) == ["plate via roll"]
+    assert len(indexed_library.consuming("iron")) == 3
+
+
+def test_index_rebuilt_after_direct_dict_insert(indexed_library):
+    from crafting_process.library import P
+
+    indexed_library.filter(P.produces("plate"))
+    proc = BatchProcess(Ingredients.parse("1 plate"), Ingredients.parse("1 iron"))
+    indexed_library.recipes["plate"] = proc
+    assert indexed_library.producing("plate") == [("plate", proc)]
+
+
+def test_index_rebuilt_after_direct_dict_replace(indexed_library):
+    (name, _) = indexed_library.producing("iron")[0]
+    proc = BatchProcess(Ingredients.parse("1 plate"), Ingredients.parse("1 iron"))
+    indexed_library.recipes.update({name: proc})  # same number of recipes
+    assert name not in dict(indexed_library.producing("iron"))
+    assert indexed_library.producing("plate")[-1] == (name, proc)
+
+
+# ---------------------------------------------------------------------------
+# Library views
+# ---------------------------------------------------------------------------
+
+
+def test_filter_view_shares_parent_storage(indexed_library):
+    from crafting_process.library import LibraryView, P
+
+    view = indexed_library.filter(P.process_is("smelt"))
+    assert isinstance(view, LibraryView)
+    assert len(view.recipes) == 4
+    for (name, proc) in view.recipes.items():
+        assert proc is indexed_library.recipes[name]
+    assert "widget via press" not in view.recipes
+    with pytest.raises(KeyError):
+        view.recipes["widget via press"]
+
+
+def test_with_augment_filter_reuses_view(indexed_library):
+    first = indexed_library.with_augment_filter(skip_augments=["mk2"])
+    assert indexed_library.with_augment_filter(skip_augments=["mk2"]) is first
+    assert indexed_library.with_augment_filter(only_augments=[]) is first
+    assert first.producing("iron") == [("iron via smelt", indexed_library.recipes["iron via smelt"])]
+
+
+def test_views_compose(indexed_library):
+    from crafting_process.library import P
+
+    view = indexed_library.filter(P.annotation_eq("tier", 1)).with_augment_filter(
+        skip_augments=["mk2"]
+    )
+    assert list(view.recipes) == ["iron via smelt", "copper via smelt"]
+    assert view.filter(P.produces("copper")).producing("copper") == [
+        ("copper via smelt", indexed_library.recipes["copper via smelt"])
+    ]
+    assert view.producing("widget") == []
+    assert view.names == {"iron via smelt", "copper via smelt"}
+
+
+def test_view_is_read_only(indexed_library):
+    view = indexed_library.with_augment_filter()
+    with pytest.raises(ValueError, match="read-only"):
+        view.add_from_text("1 plate | roll\n1 iron\n")
+    with pytest.raises(ValueError, match="read-only"):
+        view.register_augment("fast", lambda p: p)
+    assert "plate via roll" not in indexed_library.recipes
+
+
+def test_view_cache_sees_recipes_added_later(indexed_library):
+    before = indexed_library.with_augment_filter(skip_augments=["mk2"])
+    indexed_library.add_from_text("1 plate | roll\n1 iron\n")
+    after = indexed_library.with_augment_filter(skip_augments=["mk2"])
+    assert after is not before
+    assert "plate via roll" in after.recipes
+    assert "plate via roll" not in before.recipes
+
+
+def test_view_follows_recipe_replaced_in_parent(indexed_library):
+    view = indexed_library.with_augment_filter(skip_augments=["mk2"])
+    narrow = view.filter(lambda p: p.process == "press")
+    assert [n for (n, _) in view.producing("iron")] == ["iron via smelt"]
+    assert narrow.consuming("copper") == [
+        ("widget via press", indexed_library.recipes["widget via press"])
+    ]
+    steel = BatchProcess(Ingredients.parse("1 steel"), Ingredients.parse("2 ore"))
+    wrench = BatchProcess(Ingredients.parse("1 wrench"), Ingredients.parse("1 steel"))
+    indexed_library._put("iron via smelt", steel)
+    indexed_library._put("widget via press", wrench)
+    assert view.producing("iron") == []
+    assert view.producing("steel") == [("iron via smelt", steel)]
+    assert narrow.consuming("copper") == []
+    assert narrow.consuming("steel") == [("widget via press", wrench)]
+    assert list(view.recipes) == [
+        "iron via smelt",
+        "copper via smelt",
+        "widget via press",
+        "gear via press",
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Federated libraries
+# ---------------------------------------------------------------------------
+
+
+def _fed_members():
+    base = ProcessLibrary("batch", text="1 iron | smelt\n2 ore\n\n1 gear | press\n1 iron\n")
+    mod = ProcessLibrary("batch", text="1 iron | smelt\n3 ore\n\n1 plate | roll\n1 iron\n")
+    return (base, mod)
+
+
+def test_federation_matches_merge():
+    from crafting_process.library import FederatedLibrary
+
+    (base, mod) = _fed_members()
+    fed = FederatedLibrary([base, mod])
+    assert dict(fed.recipes) == dict((base | mod).recipes)
+    assert fed.recipes["iron via smelt"] is mod.recipes["iron via smelt"]
+    assert fed.producing("iron") == [("iron via smelt", mod.recipes["iron via smelt"])]
+    assert [n for (n, _) in fed.consuming("iron")] == ["gear via press", "plate via roll"]
+    assert fed.names == {"iron via smelt", "gear via press", "plate via roll"}
+
+
+def test_federation_rejects_mixed_modes():
+    from crafting_process.library import FederatedLibrary
+
+    with pytest.raises(ValueError, match="different modes"):
+        FederatedLibrary([ProcessLibrary("batch"), ProcessLibrary("continuous")])
+
+
+def test_federation_merges_last_member_additions_incrementally():
+    from crafting_process.library import FederatedLibrary, P
+
+    (base, mod) = _fed_members()
+    fed = FederatedLibrary([base, mod])
+    index = fed.recipe_index()
+    mod.add_from_text("1 gear | press\n5 iron\n")
+    mod.add_from_text("1 wire | draw\n1 iron\n")
+    assert fed.recipe_index() is index
+    assert dict(fed.recipes) == dict((base | mod).recipes)
+    assert fed.recipes["gear via press"] is mod.recipes["gear via press"]
+    assert list(fed.filter(P.process_is("press")).recipes) == ["gear via press"]
+    assert list(fed.recipes) == list(FederatedLibrary([base, mod]).recipes)
+
+
+def test_federation_member_growth_keeps_member_order():
+    from crafting_process.library import FederatedLibrary
+
+    (base, mod) = _fed_members()
+    fed = FederatedLibrary([base, mod])
+    fed.recipe_index()
+    base.add_from_text("1 wire | draw\n1 iron\n")
+    mod.add_from_text("1 gear | press\n5 iron\n")
+    base.add_from_text("1 plate | roll\n9 iron\n")  # shadowed by mod
+    fresh = FederatedLibrary([base, mod])
+    assert list(fed.recipes) == list(fresh.recipes)
+    assert fed.consuming("iron") == fresh.consuming("iron")
+    assert fed.recipes["gear via press"] is mod.recipes["gear via press"]
+
+
+def test_federation_rebuilds_after_member_replaces_recipe():
+    from crafting_process.library import FederatedLibrary
+
+    (base, mod) = _fed_members()
+    fed = FederatedLibrary([base, mod])
+    fed.recipe_index()
+    proc = BatchProcess(Ingredients.parse("2 gear"), Ingredients.parse("1 iron"))
+    base._put("gear via press", proc)
+    assert fed.recipes["gear via press"] is proc
+
+
+def test_federations_nest():
+    from crafting_process.library import FederatedLibrary
+
+    (base, mod) = _fed_members()
+    top = ProcessLibrary("batch", text="1 iron | smelt\n9 ore\n")
+    fed = FederatedLibrary([FederatedLibrary([base, mod]), top])
+    assert dict(fed.recipes) == dict((base | mod | top).recipes)
+    assert fed.producing("iron") == [("iron via smelt", top.recipes["iron via smelt"])]
+
+
+def test_federation_of_is_cached_and_read_only():
+    from crafting_process.library import FederatedLibrary
+
+    (base, mod) = _fed_members()
+    base.register_augment("fast", lambda p: p)
+    fed = FederatedLibrary.of(base, mod)
+    assert FederatedLibrary.of(base, mod) is fed
+    assert FederatedLibrary.of(mod, base) is not fed
+    assert fed.with_augment_filter()._augments == {"fast": base._augments["fast"]}
+    with pytest.raises(ValueError, match="read-only"):
+        fed.add_from_text("1 wire | draw\n1 iron\n")
+
@@ -240,6 +240,87 @@ def test_production_graphs_skip_processes_excludes_process(linear_library):
     assert not any("iron" in d for d in descriptions)
 
 
+def _graph_signature(g):
+    # Node names are random slugs; compare what the graph is made of.
+    return (
+        sorted(p.describe() for p in g.processes.values()),
+        sorted(kind for (_, kind) in g.open_inputs),
+    )
+
+
+BRANCHING_TEXT = """
+1 iron | smelt
+2 ore
+
+1 iron | smelt2
+1 ore + 1 coal
+
+1 wire | draw
+1 copper
+
+1 wire | draw2
+2 copper
+
+1 copper | smelt
+2 cu_ore
+
+1 circuit | assemble
+1 iron + 3 wire
+
+1 coal | mine
+1 rock
+"""
+
+
+def test_production_graphs_deep_chain_is_stack_safe(monkeypatch):
+    import itertools
+    import sys
+
+    # 150 random two-word slugs collide often enough to make this flaky.
+    counter = itertools.count()
+    monkeypatch.setattr(
+        "crafting_process.graph.generate_slug", lambda n: f"node-{next(counter)}"
+    )
+    text = "\n".join(f"1 t{i} | step\n1 t{i + 1}\n" for i in range(150))
+    lib = ProcessLibrary("batch", text=text)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(150)
+    try:
+        graphs = list(production_graphs(lib, Ingredients.parse("1 t0")))
+    finally:
+        sys.setrecursionlimit(limit)
+    assert len(graphs) == 1
+    assert len(graphs[0].processes) == 151  # 150 steps plus the sink
+
+
+@pytest.mark.parametrize("stop_after", [0, 1, 3, 5])
+def test_graph_search_resumes_from_checkpoint(stop_after):
+    import pickle
+
+    from crafting_process.orchestration import GraphSearch
+
+    lib = ProcessLibrary("batch", text=BRANCHING_TEXT)
+    transfer = Ingredients.parse("1 circuit")
+    search = GraphSearch.start(lib, transfer, only_augments=[])
+    first = [next(search) for _ in range(stop_after)]
+    state = pickle.loads(pickle.dumps(search.checkpoint()))
+    rest = list(GraphSearch.resume(lib, state))
+    assert len(rest) == len(list(search))
+
+    expected = [_graph_signature(g) for g in production_graphs(lib, transfer)]
+    assert [_graph_signature(g) for g in first + rest] == expected
+
+
+def test_graph_search_resume_rejects_unknown_recipes():
+    from crafting_process.orchestration import GraphSearch
+
+    lib = ProcessLibrary("batch", text=BRANCHING_TEXT)
+    search = GraphSearch.start(lib, Ingredients.parse("1 circuit"))
+    next(search)
+    with pytest.raises(ValueError, match="missing from the library"):
+        GraphSearch.resume(ProcessLibrary("batch"), search.checkpoint())
+
+
 # ---------------------------------------------------------------------------
 # analyze_graph
 # ---------------------------------------------------------------------------
@@ -352,6 +433,67 @@ def test_analyze_graph_is_generator(linear_library):
     assert isinstance(analyze_graph(g), types.GeneratorType)
 
 
+def test_analyze_graph_builds_fields_on_access(linear_library):
+    result = _first_result(linear_library, "1 widget")
+    lazy = ("desired", "transfer", "inputs", "process_counts", "output_quantities")
+    assert not set(lazy) & set(vars(result))
+    assert result.inputs
+    assert {"transfer", "inputs"} <= set(vars(result))
+    assert "process_counts" not in vars(result)
+    assert result.to_dict()["process_counts"]
+
+
+def test_lazy_result_equals_its_built_copy(linear_library):
+    import pickle
+
+    result = _first_result(linear_library, "1 widget")
+    copy = pickle.loads(pickle.dumps(result))
+    assert copy.to_dict() == result.to_dict()
+    built = PlanResult(**{f: getattr(result, f) for f in PlanResult.__dataclass_fields__})
+    assert built == result
+
+
+def test_answer_vectors_match_summed_ingredients():
+    from crafting_process.orchestration import _solve_graph, _plan_result, _sink_name
+
+    lib = ProcessLibrary("batch", text=BRANCHING_TEXT + "\n1 iron | salvage\n0.5 scrap\n")
+    for g in production_graphs(lib, Ingredients.parse("2 circuit")):
+        solved = _solve_graph(g)
+        for m in solved["milps"]:
+            count = {name: c for (c, _, name) in m["counts"]}
+            transfer = Ingredients.sum(
+                count[name] * g.processes[name].exchange.project(kind)
+                for (name, kind) in g.open_outputs + g.open_inputs
+            )
+            result = _plan_result(g, solved, m)
+            assert result.transfer.triples() == transfer.triples()
+            desired = g.processes[_sink_name(g)].inputs
+            assert result.output_quantities == {
+                kind: sum(
+                    count[name] * p.outputs[kind]
+                    for (name, p) in g.processes.items()
+                    if kind in p.outputs.nonzero_components
+                )
+                for kind in desired.nonzero_components
+            }
+        # One set of port terms per graph, shared by its answers.
+        assert "ports" in solved
+
+
+def test_plan_sort_key_builds_only_what_it_reads(linear_library):
+    from crafting_process.orchestration import plan
+
+    seen = []
+
+    def by_inputs(result):
+        seen.append(result)
+        return len(result.inputs)
+
+    plan(linear_library, "1 widget", sort_key=by_inputs)
+    assert seen
+    assert all("process_counts" not in vars(r) for r in seen)
+
+
 # ---------------------------------------------------------------------------
 # analyze_graphs
 # ---------------------------------------------------------------------------
@@ -1314,6 +1456,34 @@ def test_plan_sorted_by_leak_then_total_processes(linear_library):
         assert (a.leak, a.total_processes) <= (b.leak, b.total_processes)
 
 
+def test_plan_result_to_dict_is_json_serializable(linear_library):
+    import json
+    from crafting_process.orchestration import plan
+
+    result = plan(linear_library, "1 widget", num_keep=1)[0]
+    d = json.loads(json.dumps(result.to_dict()))
+    assert d["desired"] == {"widget": 1}
+    assert d["total_processes"] == result.total_processes
+    assert d["optimal"] is True
+    assert [pc["slug"] for pc in d["process_counts"]] == [
+        pc.slug for pc in result.process_counts
+    ]
+    assert "graph" not in d
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_top_k_matches_heapq_selection_with_ties(reverse):
+    import heapq
+    from crafting_process.orchestration import _TopK
+
+    items = [(k, i) for (i, k) in enumerate([3, 1, 2, 1, 3, 0, 2, 1])]
+    top = _TopK(4, key=lambda item: item[0], reverse=reverse)
+    entered = [top.push(item) for item in items]
+    selector = heapq.nlargest if reverse else heapq.nsmallest
+    assert top.items() == selector(4, items, key=lambda item: item[0])
+    assert entered[:4] == [True] * 4
+
+
 # ---------------------------------------------------------------------------
 # PlanResultPredicates / R
 # ---------------------------------------------------------------------------
@@ -1436,3 +1606,272 @@ def test_plan_shared_ingredient_does_not_recurse_infinitely():
     assert any("craft" in name for name in process_names), (
         "Expected a crafted-intermediate plan among results"
     )
+
+
+# ---------------------------------------------------------------------------
+# Checkpointed plan()
+# ---------------------------------------------------------------------------
+
+
+def _plan_signature(results):
+    # Node slugs are random per graph build; compare everything else.
+    return [
+        (
+            r.leak,
+            r.total_processes,
+            str(r.inputs),
+            [(pc.count, pc.description) for pc in r.process_counts],
+        )
+        for r in results
+    ]
+
+
+class _Interrupted(Exception):
+    pass
+
+
+def _interrupt_after(monkeypatch, target, name, calls):
+    real = getattr(target, name)
+    seen = []
+
+    def wrapper(*args, **kwargs):
+        seen.append(1)
+        if len(seen) > calls:
+            raise _Interrupted
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(target, name, wrapper)
+
+
+@pytest.mark.parametrize(
+    ("stage", "calls"),
+    [("GraphSearch.__next__", 2), ("_plan_result", 0), ("_plan_result", 7)],
+)
+def test_plan_resumes_from_checkpoint(tmp_path, monkeypatch, stage, calls):
+    import crafting_process.orchestration as orch
+
+    lib = ProcessLibrary("batch", text=BRANCHING_TEXT)
+    expected = orch.plan(lib, "1 circuit", num_keep=4)
+    path = tmp_path / "plan.ckpt"
+
+    with monkeypatch.context() as m:
+        if stage == "GraphSearch.__next__":
+            _interrupt_after(m, orch.GraphSearch, "__next__", calls)
+        else:
+            _interrupt_after(m, orch, "_plan_result", calls)
+        with pytest.raises(_Interrupted):
+            orch.plan(lib, "1 circuit", num_keep=4, checkpoint=path, checkpoint_interval=0)
+    assert path.exists()
+
+    resumed = orch.plan(lib, "1 circuit", num_keep=4, checkpoint=path)
+    assert _plan_signature(resumed) == _plan_signature(expected)
+
+
+def _checkpoint_frames(path):
+    import pickle
+
+    frames = []
+    with open(path, "rb") as f:
+        pickle.load(f)  # header
+        while True:
+            try:
+                frames.append(pickle.load(f))
+            except EOFError:
+                return frames
+
+
+def test_plan_checkpoint_appends_only_new_state(tmp_path):
+    import crafting_process.orchestration as orch
+
+    lib = ProcessLibrary("batch", text=BRANCHING_TEXT)
+    graphs = list(orch.production_graphs(lib, Ingredients.parse("1 circuit")))
+    path = tmp_path / "plan.ckpt"
+    orch.plan(lib, "1 circuit", checkpoint=path, checkpoint_interval=0)
+    frames = _checkpoint_frames(path)
+    assert len(frames) > len(graphs)  # one frame per graph and per result
+    assert sum(len(f["graphs"]) for f in frames) == len(graphs)
+    solved = [i for f in frames if f["analysis"] for i in f["analysis"]["solved"]]
+    assert sorted(solved) == sorted(set(solved))  # each solve is saved once
+
+
+def test_plan_checkpoint_ignores_a_torn_last_frame(tmp_path, monkeypatch):
+    import crafting_process.orchestration as orch
+
+    lib = ProcessLibrary("batch", text=BRANCHING_TEXT)
+    expected = orch.plan(lib, "1 circuit", num_keep=4)
+    path = tmp_path / "plan.ckpt"
+    with monkeypatch.context() as m:
+        _interrupt_after(m, orch, "_plan_result", 5)
+        with pytest.raises(_Interrupted):
+            orch.plan(lib, "1 circuit", num_keep=4, checkpoint=path, checkpoint_interval=0)
+    complete = len(_checkpoint_frames(path))
+    with open(path, "r+b") as f:
+        f.truncate(path.stat().st_size - 3)  # a worker killed mid-append
+    resumed = orch.plan(lib, "1 circuit", num_keep=4, checkpoint=path)
+    assert _plan_signature(resumed) == _plan_signature(expected)
+    assert len(_checkpoint_frames(path)) == complete  # the final save replaced it
+
+
+def test_plan_finished_checkpoint_returns_saved_results(tmp_path, monkeypatch):
+    import crafting_process.orchestration as orch
+
+    lib = ProcessLibrary("batch", text=BRANCHING_TEXT)
+    path = tmp_path / "plan.ckpt"
+    first = orch.plan(lib, "1 circuit", checkpoint=path)
+    monkeypatch.setattr(orch, "exchange_milps", None)  # nothing may be solved again
+    again = orch.plan(lib, "1 circuit", checkpoint=path)
+    assert _plan_signature(again) == _plan_signature(first)
+
+
+def test_plan_checkpoint_rejects_other_query(tmp_path):
+    from crafting_process.orchestration import plan
+
+    lib = ProcessLibrary("batch", text=BRANCHING_TEXT)
+    path = tmp_path / "plan.ckpt"
+    plan(lib, "1 circuit", checkpoint=path)
+    with pytest.raises(ValueError, match="different query"):
+        plan(lib, "2 circuit", checkpoint=path)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        BRANCHING_TEXT + "\n1 wire | draw3\n5 copper\n",  # an added recipe
+        BRANCHING_TEXT.replace("2 copper", "9 copper"),  # same names, new numbers
+    ],
+)
+def test_plan_checkpoint_rejects_changed_library(tmp_path, text):
+    from crafting_process.orchestration import plan
+
+    path = tmp_path / "plan.ckpt"
+    plan(ProcessLibrary("batch", text=BRANCHING_TEXT), "1 circuit", checkpoint=path)
+    same = ProcessLibrary("batch", text=BRANCHING_TEXT)
+    plan(same, "1 circuit", checkpoint=path)  # an equal library resumes
+    changed = ProcessLibrary("batch", text=text)
+    assert set(changed.recipes) >= set(same.recipes)
+    with pytest.raises(ValueError, match="different library"):
+        plan(changed, "1 circuit", checkpoint=path)
+
+
+# ---------------------------------------------------------------------------
+# Solver budgets through plan()
+# ---------------------------------------------------------------------------
+
+
+def test_plan_results_are_optimal_by_default(linear_library):
+    from crafting_process.orchestration import plan
+
+    results = plan(linear_library, "1 widget")
+    assert all(r.optimal for r in results)
+
+
+def test_plan_forwards_milp_options(linear_library, monkeypatch):
+    import crafting_process.solver as solver
+    from crafting_process.orchestration import plan
+
+    seen = []
+    real_solve = solver.solve_milp
+
+    def spy(*args, **kwargs):
+        seen.append(kwargs)
+        return real_solve(*args, **kwargs)
+
+    monkeypatch.setattr(solver, "solve_milp", spy)
+    results = plan(linear_library, "1 widget", milp_options={"time_limit": 5.0})
+    assert results
+    assert seen and all(kw["time_limit"] == 5.0 for kw in seen)
+
+
+def test_exchange_milps_entries_report_optimal():
+    for entry in exchange_milps(_make_connected_graph()):
+        assert entry["optimal"] is True
+
+
+# ---------------------------------------------------------------------------
+# plan_quantities()
+# ---------------------------------------------------------------------------
+
+
+def test_plan_quantities_returns_row_per_transfer(linear_library):
+    from crafting_process.orchestration import plan_quantities
+
+    table = plan_quantities(linear_library, ["1 widget", "3 widget", "10 widget"])
+    assert [str(t) for (t, _) in table] == [
+        str(Ingredients.parse(s)) for s in ["1 widget", "3 widget", "10 widget"]
+    ]
+    assert all(isinstance(r, PlanResult) for (_, results) in table for r in results)
+
+
+def test_plan_quantities_matches_plan(linear_library):
+    from crafting_process.orchestration import plan, plan_quantities
+
+    for transfer, results in plan_quantities(linear_library, ["1 widget", "4 widget"]):
+        expected = plan(linear_library, transfer)
+        assert [(r.leak, r.total_processes, r.inputs) for r in results] == [
+            (r.leak, r.total_processes, r.inputs) for r in expected
+        ]
+
+
+def test_plan_quantities_desired_tracks_quantity(linear_library):
+    from crafting_process.orchestration import plan_quantities
+
+    table = plan_quantities(linear_library, ["1 widget", "6 widget"])
+    for transfer, results in table:
+        assert all(r.desired == transfer for r in results)
+    (_, small), (_, big) = table
+    assert big[0].output_quantities["widget"] >= 6
+    assert small[0].output_quantities["widget"] >= 1
+
+
+def test_plan_quantities_enumerates_graphs_once(linear_library, monkeypatch):
+    import crafting_process.orchestration as orch
+
+    calls = []
+    real = orch.production_graphs
+
+    def spy(*args, **kwargs):
+        calls.append(args)
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(orch, "production_graphs", spy)
+    orch.plan_quantities(linear_library, ["1 widget", "2 widget", "5 widget"])
+    assert len(calls) == 1
+
+
+def test_plan_quantities_builds_depths_and_matrices_once(linear_library, monkeypatch):
+    import crafting_process.graph as graph_module
+    import crafting_process.orchestration as orch
+
+    graphs = list(orch.production_graphs(linear_library, Ingredients.parse("1 widget")))
+    depths = []
+    matrices = []
+    real_depths = graph_module._longest_upstream
+    real_rows = graph_module.GraphBuilder._exchange_rows
+
+    def count_depths(graph):
+        depths.append(graph)
+        return real_depths(graph)
+
+    def count_rows(graph):
+        matrices.append(graph)
+        return real_rows(graph)
+
+    monkeypatch.setattr(graph_module, "_longest_upstream", count_depths)
+    monkeypatch.setattr(graph_module.GraphBuilder, "_exchange_rows", count_rows)
+    transfers = ["1 widget", "2 widget", "5 widget"]
+    table = orch.plan_quantities(linear_library, transfers)
+    assert all(results for (_, results) in table)
+    assert len(depths) == len(matrices) == len(graphs)
+
+
+def test_plan_quantities_rejects_mixed_kinds(linear_library):
+    from crafting_process.orchestration import plan_quantities
+
+    with pytest.raises(ValueError, match="same kinds"):
+        plan_quantities(linear_library, ["1 widget", "2 iron"])
+
+
+def test_plan_quantities_empty(linear_library):
+    from crafting_process.orchestration import plan_quantities
+
+    assert plan_quantities(linear_library, []) == []
@@ -0,0 +1,267 @@
+import multiprocessing
+import pickle
+import queue
+import threading
+
+import pytest
+
+from crafting_process.library import ProcessLibrary
+from crafting_process.orchestration import plan
+from crafting_process.orchestration import production_graphs
+from crafting_process.parallel import merge_shards
+from crafting_process.parallel import plan_sharded
+from crafting_process.parallel import run_shard
+from crafting_process.parallel import run_slice
+from crafting_process.parallel import shard_tasks
+from crafting_process.process import Ingredients
+
+TEXT = """
+1 iron | smelt
+2 ore
+
+1 iron | smelt2
+1 ore + 1 coal
+
+1 wire | draw
+1 copper
+
+1 wire | draw2
+2 copper
+
+1 copper | smelt
+2 cu_ore
+
+1 circuit | assemble
+1 iron + 3 wire
+
+1 circuit | assemble2
+2 iron + 1 wire
+
+1 coal | mine
+1 rock
+"""
+
+
+@pytest.fixture
+def library():
+    return ProcessLibrary("batch", text=TEXT)
+
+
+def _signature(results):
+    # Node slugs are random per graph build; compare everything else.
+    return [
+        (
+            r.leak,
+            r.total_processes,
+            str(r.inputs),
+            [(pc.count, pc.description) for pc in r.process_counts],
+        )
+        for r in results
+    ]
+
+
+def by_processes(result):
+    return result.total_processes
+
+
+# ---------------------------------------------------------------------------
+# Shards
+# ---------------------------------------------------------------------------
+
+
+def test_shards_cover_the_search_in_order(library):
+    from crafting_process.orchestration import GraphSearch
+
+    transfer = Ingredients.parse("1 circuit")
+    expected = [
+        sorted(p.describe() for p in g.processes.values())
+        for g in production_graphs(library, transfer)
+    ]
+    search = GraphSearch.start(library, transfer)
+    graphs = []
+    paths = []
+    for state in search.shards():
+        resumed = GraphSearch.resume(library, state)
+        for g in resumed:
+            graphs.append(sorted(p.describe() for p in g.processes.values()))
+            paths.append(resumed.path)
+    assert graphs == expected
+    assert paths == sorted(paths)
+    assert len(search.shards()) == 2  # assemble, assemble2
+
+
+def test_started_search_cannot_be_sharded(library):
+    from crafting_process.orchestration import GraphSearch
+
+    search = GraphSearch.start(library, Ingredients.parse("1 circuit"))
+    next(search)
+    with pytest.raises(ValueError, match="has not yielded"):
+        search.shards()
+
+
+def test_leaf_start_is_one_shard(library):
+    from crafting_process.orchestration import GraphSearch
+
+    tasks = shard_tasks(library, "1 rock")
+    assert len(tasks) == 1
+    search = GraphSearch.resume(library, tasks[0]["search"])
+    assert len(list(search)) == 1
+    assert search.path == ()
+
+
+# ---------------------------------------------------------------------------
+# Work stealing
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize("every", [1, 2, 3])
+def test_split_searches_cover_the_search(library, every):
+    from crafting_process.orchestration import GraphSearch
+
+    transfer = Ingredients.parse("1 circuit")
+    search = GraphSearch.start(library, transfer)
+    expected = [(search.path, sorted(p.describe() for p in g.processes.values())) for g in search]
+
+    got = []
+    todo = [GraphSearch.start(library, transfer).checkpoint()]
+    splits = 0
+    while todo:
+        search = GraphSearch.resume(library, pickle.loads(pickle.dumps(todo.pop())))
+        for (k, g) in enumerate(search):
+            got.append((search.path, sorted(p.describe() for p in g.processes.values())))
+            if k % every == 0 and (state := search.split()) is not None:
+                todo.append(state)
+                splits += 1
+    assert splits > 0
+    assert sorted(got) == expected
+
+
+def test_split_without_unstarted_work(library):
+    from crafting_process.orchestration import GraphSearch
+
+    assert GraphSearch.start(library, Ingredients.parse("1 rock")).split() is None
+    search = GraphSearch.start(library, Ingredients.parse("1 circuit"))
+    list(search)
+    assert search.split() is None
+
+
+def test_hungry_slice_splits_and_merges_to_plan(library):
+    hungry = multiprocessing.Value("i", 1)
+    (task, *others) = shard_tasks(library, "1 circuit", num_keep=3)
+    out = run_slice(library, task, hungry)
+    assert hungry.value == 0
+    assert len(out["split"]) == 2
+    assert out["load"]["graphs"] == 1 and out["load"]["splits"] == 1
+
+    partials = [out["ranked"]]
+    partials.extend(run_shard(library, {**task, "search": s}) for s in out["split"])
+    partials.extend(run_shard(library, other) for other in others)
+    expected = plan(library, "1 circuit", num_keep=3)
+    assert _signature(merge_shards(library, [task], partials)) == _signature(expected)
+
+
+# ---------------------------------------------------------------------------
+# Compact results
+# ---------------------------------------------------------------------------
+
+
+def test_seek_rebuilds_the_graph_at_a_path(library):
+    from crafting_process.orchestration import GraphSearch
+
+    transfer = Ingredients.parse("1 circuit")
+    search = GraphSearch.start(library, transfer)
+    for graph in search:
+        rebuilt = GraphSearch.start(library, transfer).seek(search.path)
+        assert [p.describe() for p in rebuilt.processes.values()] == [
+            p.describe() for p in graph.processes.values()
+        ]
+        assert len(rebuilt.open_inputs) == len(graph.open_inputs)
+
+
+@pytest.mark.parametrize("path", [(), (0,), (0, 9, 0), (2, 0, 0), (0, 0, 0, 0)])
+def test_seek_rejects_paths_off_the_tree(library, path):
+    from crafting_process.orchestration import GraphSearch
+
+    search = GraphSearch.start(library, Ingredients.parse("1 circuit"))
+    with pytest.raises(ValueError, match="No graph at path"):
+        search.seek(path)
+
+
+def test_shard_results_are_compact(library):
+    (task, _) = shard_tasks(library, "1 circuit", num_keep=3)
+    ranked = run_shard(library, task)
+    assert ranked
+    for (_, record) in ranked:
+        assert not hasattr(record, "graph")
+    full = plan(library, "1 circuit", num_keep=3)
+    assert len(pickle.dumps(ranked)) * 10 < len(pickle.dumps(full))
+
+
+def test_merged_results_are_full_plan_results(library):
+    tasks = shard_tasks(library, "1 circuit", num_keep=3)
+    merged = merge_shards(library, tasks, [run_shard(library, t) for t in tasks])
+    expected = plan(library, "1 circuit", num_keep=3)
+    for (got, want) in zip(merged, expected):
+        assert got.output_quantities == want.output_quantities
+        assert sorted(got.process_augments.values()) == sorted(want.process_augments.values())
+        assert set(got.graph.processes) == {pc.slug for pc in got.process_counts}
+        assert got.optimal == want.optimal
+
+
+# ---------------------------------------------------------------------------
+# Merging
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"num_keep": 2},
+        {"num_keep": 30},
+        {"sort_key": by_processes},
+        {"sort_key": by_processes, "reverse": True},
+    ],
+)
+def test_merged_shards_match_plan(library, options):
+    expected = plan(library, "1 circuit", **options)
+    tasks = shard_tasks(library, "1 circuit", **options)
+    partials = [run_shard(library, task) for task in reversed(tasks)]
+    assert _signature(merge_shards(library, tasks, partials)) == _signature(expected)
+
+
+def test_shards_through_a_queue(library):
+    # A stand-in for machines: tasks and results cross a queue as bytes.
+    tasks_q = queue.Queue()
+    results_q = queue.Queue()
+
+    def machine():
+        while (task := tasks_q.get()) is not None:
+            results_q.put(pickle.dumps(run_shard(library, pickle.loads(task))))
+
+    machines = [threading.Thread(target=machine) for _ in range(2)]
+    for m in machines:
+        m.start()
+    tasks = shard_tasks(library, "1 circuit", num_keep=3)
+    for task in tasks:
+        tasks_q.put(pickle.dumps(task))
+    for _ in machines:
+        tasks_q.put(None)
+    for m in machines:
+        m.join()
+    partials = [pickle.loads(results_q.get()) for _ in tasks]
+    expected = plan(library, "1 circuit", num_keep=3)
+    assert _signature(merge_shards(library, tasks, partials)) == _signature(expected)
+
+
+def test_plan_sharded_on_process_pool(library):
+    expected = plan(library, "1 circuit", num_keep=4, only_augments=[])
+    load = {}
+    results = plan_sharded(
+        library, "1 circuit", workers=2, num_keep=4, only_augments=[], load=load
+    )
+    assert _signature(results) == _signature(expected)
+    assert sum(w["graphs"] for w in load.values()) == len(
+        list(production_graphs(library, Ingredients.parse("1 circuit")))
+    )
+    assert sum(w["tasks"] for w in load.values()) >= 2
@@ -0,0 +1,208 @@
+import importlib.util
+import io
+import json
+import pathlib
+import sys
+import threading
+import time
+
+import pytest
+
+_PLAN_PY = pathlib.Path(__file__).resolve().parents[2] / "plan.py"
+
+
+def _load_cli():
+    # plan.py is a script at the repo root, not part of the package.
+    if "plan" not in sys.modules:
+        spec = importlib.util.spec_from_file_location("plan", _PLAN_PY)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["plan"] = module
+        spec.loader.exec_module(module)
+    return sys.modules["plan"]
+
+
+cli = _load_cli()
+
+RECIPES = """
+2 iron | smelt
+3 ore
+
+2 iron + 1 slag | smelt_messy
+3 ore
+
+1 widget | press
+2 iron
+"""
+
+
+@pytest.fixture
+def recipes(tmp_path):
+    path = tmp_path / "recipes.txt"
+    path.write_text(RECIPES)
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Server / client
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def server(tmp_path):
+    socket_path = str(tmp_path / "plan.sock")
+    srv = cli._Server(socket_path, cli._Handler)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield socket_path
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_answer_request_runs_the_query(recipes):
+    response = cli.answer_request(
+        {"argv": ["-r", recipes.name, "1 widget"], "cwd": str(recipes.parent)}
+    )
+    assert response["status"] == 0
+    assert "widget via press" in response["stdout"]
+    assert response["stderr"] == ""
+
+
+def test_answer_request_reports_usage_errors(recipes):
+    response = cli.answer_request({"argv": ["-r", str(recipes)], "cwd": "."})
+    assert response["status"] == 2
+    assert "required: yield" in response["stderr"]
+    response = cli.answer_request({"argv": ["--batch", "-", "1 widget"], "cwd": "."})
+    assert response["status"] == 2
+    assert "cannot be forwarded" in response["stderr"]
+
+
+def test_forward_round_trip(server, recipes, monkeypatch, capsys):
+    monkeypatch.chdir(recipes.parent)
+    argv = ["-r", "recipes.txt", "-n", "1", "1 widget"]
+    status = cli.forward(server, ["--connect", server, *argv])
+    forwarded = capsys.readouterr()
+    assert status == 0
+    local = cli.answer_request({"argv": argv, "cwd": str(recipes.parent)})
+    assert forwarded.out == local["stdout"]
+    assert forwarded.err == local["stderr"]
+
+
+@pytest.mark.parametrize(
+    "connect", [["--connect", "SOCK"], ["--conn", "SOCK"], ["--con=SOCK"]]
+)
+def test_forward_strips_connect_abbreviations(
+    server, recipes, monkeypatch, capsys, connect
+):
+    monkeypatch.chdir(recipes.parent)
+    connect = [a.replace("SOCK", server) for a in connect]
+    argv = ["-r", "recipes.txt", "-n", "1", "1 widget"]
+    assert cli.build_parser().parse_args([*argv, *connect]).connect == server
+    assert cli.forward(server, [*argv[:2], *connect, *argv[2:]]) == 0
+    assert "widget via press" in capsys.readouterr().out
+
+
+def test_forward_to_missing_server_returns_none(tmp_path, capsys):
+    assert cli.forward(str(tmp_path / "nobody.sock"), ["1 widget"]) is None
+    assert "cannot reach server" in capsys.readouterr().err
+
+
+def test_server_answers_one_query_at_a_time(server, recipes, monkeypatch):
+    active = []
+    overlaps = []
+    real_run = cli.run
+
+    def run(args, out, err):
+        active.append(args)
+        overlaps.append(len(active))
+        time.sleep(0.05)
+        try:
+            return real_run(args, out, err)
+        finally:
+            active.remove(args)
+
+    monkeypatch.setattr(cli, "run", run)
+    statuses = []
+
+    def client():
+        statuses.append(cli.forward(server, ["-r", str(recipes), "1 widget"]))
+
+    threads = [threading.Thread(target=client) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert statuses == [0, 0, 0, 0]
+    assert overlaps == [1, 1, 1, 1]
+
+
+# ---------------------------------------------------------------------------
+# Batch mode
+# ---------------------------------------------------------------------------
+
+
+def _run_batch(recipes, lines, *flags):
+    batch = recipes.parent / "targets.txt"
+    batch.write_text("\n".join(lines) + "\n")
+    argv = ["-r", str(recipes), "--batch", str(batch), *flags]
+    args = cli.build_parser().parse_args(argv)
+    out = io.StringIO()
+    status = cli.run_batch(args, out, io.StringIO())
+    return status, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_batch_answers_each_line_in_order(recipes):
+    lines = ["# comment", "1 widget", "", "2 iron", '{"yield": "1 widget"}']
+    status, records = _run_batch(recipes, lines)
+    assert status == 0
+    assert [r["index"] for r in records] == [0, 1, 2]
+    assert [r["query"]["yield"] for r in records] == ["1 widget", "2 iron", "1 widget"]
+    assert all(r["results"] for r in records)
+
+
+@pytest.mark.parametrize("order", ["input", "completion"])
+def test_batch_jobs_match_serial(recipes, order):
+    lines = ["1 widget", "2 iron", "3 widget", "1 ore"]
+    (_, serial) = _run_batch(recipes, lines)
+    status, parallel = _run_batch(recipes, lines, "-j", "2", "--order", order)
+    if order == "input":
+        assert [r["index"] for r in parallel] == [0, 1, 2, 3]
+    parallel.sort(key=lambda r: r["index"])
+    assert status == 1  # "1 ore" is a raw material: no plans
+    assert [r["query"] for r in parallel] == [r["query"] for r in serial]
+    assert [len(r.get("results", [])) for r in parallel] == [
+        len(r.get("results", [])) for r in serial
+    ]
+
+
+def test_batch_bad_lines_get_error_records(recipes):
+    lines = ["1 widget", '{"yield": ', '{"stop_kinds": []}', '{"yield" 1}', "2 iron"]
+    status, records = _run_batch(recipes, lines)
+    assert status == 1
+    assert [r["index"] for r in records] == [0, 1, 2, 3, 4]
+    assert "invalid JSON" in records[1]["error"]
+    assert records[1]["query"] == '{"yield":'
+    assert "needs a \"yield\"" in records[2]["error"]
+    assert "invalid JSON" in records[3]["error"]
+    assert records[4]["results"]
+
+
+def test_batch_string_override_is_one_item(recipes):
+    lines = [
+        '{"yield": "1 widget", "skip_processes": "smelt_messy"}',
+        '{"yield": "1 widget", "stop_kinds": 3}',
+    ]
+    (_, (one, bad)) = _run_batch(recipes, lines)
+    descriptions = {
+        pc["description"] for r in one["results"] for pc in r["process_counts"]
+    }
+    assert not any("smelt_messy" in d for d in descriptions)
+    assert "must be a string or a list of strings" in bad["error"]
+
+
+def test_batch_rejects_profile(recipes, monkeypatch, capsys):
+    argv = ["plan.py", "-r", str(recipes), "--batch", "-", "--profile"]
+    monkeypatch.setattr(sys, "argv", argv)
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main()
+    assert exit_info.value.code == 2
+    assert "--profile" in capsys.readouterr().err
@@ -0,0 +1,139 @@
+import pytest
+
+from crafting_process import profiling
+from crafting_process.library import ProcessLibrary
+from crafting_process.orchestration import plan, production_graphs, printable_analysis
+from crafting_process.process import Ingredients
+from crafting_process.profiling import PlanProfile
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def branching_library():
+    """Widget can be pressed from iron, which has two smelting routes."""
+    return ProcessLibrary("batch", text="""
+        2 iron | smelt
+        3 ore
+
+        3 iron | blast
+        4 ore + 1 coal
+
+        1 widget | press
+        2 iron
+    """)
+
+
+# ---------------------------------------------------------------------------
+# Module-level hooks
+# ---------------------------------------------------------------------------
+
+
+def test_current_is_none_by_default():
+    assert profiling.current() is None
+
+
+def test_hooks_are_noops_without_active_profile():
+    with profiling.stage("anything"):
+        pass
+    profiling.count("anything")
+    profiling.record_solve(0.5)
+    assert profiling.current() is None
+
+
+def test_activate_sets_and_resets_current():
+    prof = PlanProfile()
+    with prof.activate():
+        assert profiling.current() is prof
+    assert profiling.current() is None
+
+
+def test_stage_accumulates_time_and_calls():
+    prof = PlanProfile()
+    with prof.activate():
+        with profiling.stage("x"):
+            pass
+        with profiling.stage("x"):
+            pass
+    assert prof.calls["x"] == 2
+    assert prof.durations["x"] >= 0
+
+
+def test_count_accumulates():
+    prof = PlanProfile()
+    with prof.activate():
+        profiling.count("hits")
+        profiling.count("hits", 3)
+    assert prof.counters["hits"] == 4
+
+
+def test_record_solve_fills_histogram_buckets():
+    prof = PlanProfile()
+    prof.record_solve(0.0005)
+    prof.record_solve(0.05)
+    prof.record_solve(100.0)
+    assert prof.solve_histogram[0] == 1
+    assert prof.solve_histogram[2] == 1
+    assert prof.solve_histogram[-1] == 1
+    assert prof.counters["milp_solves"] == 3
+
+
+# ---------------------------------------------------------------------------
+# plan(profile=...)
+# ---------------------------------------------------------------------------
+
+
+def test_plan_profile_records_pipeline(branching_library):
+    prof = PlanProfile()
+    plan(branching_library, "1 widget", profile=prof)
+    assert prof.counters["graphs"] == 2
+    assert prof.counters["combos"] >= 2
+    assert prof.counters["milp_solves"] >= 2
+    assert prof.counters["results"] >= 2
+    for name in ("producing", "output_into", "build_matrix", "milp", "analyze", "depths"):
+        assert name in prof.durations
+
+
+def test_plan_profile_histogram_matches_solve_count(branching_library):
+    prof = PlanProfile()
+    plan(branching_library, "1 widget", profile=prof)
+    assert sum(prof.solve_histogram) == prof.counters["milp_solves"]
+
+
+def test_plan_without_profile_leaves_nothing_active(branching_library):
+    plan(branching_library, "1 widget")
+    assert profiling.current() is None
+
+
+def test_profile_wraps_lower_level_calls(branching_library):
+    prof = PlanProfile()
+    with prof.activate():
+        graphs = list(production_graphs(branching_library, Ingredients.parse("1 widget")))
+    assert prof.counters["graphs"] == len(graphs)
+
+
+def test_printable_analysis_is_timed(branching_library):
+    results = plan(branching_library, "1 widget")
+    prof = PlanProfile()
+    with prof.activate():
+        printable_analysis(iter(results))
+    assert prof.calls["printable_analysis"] == 1
+
+
+def test_report_lists_stages_and_counters(branching_library):
+    prof = PlanProfile()
+    plan(branching_library, "1 widget", profile=prof)
+    text = prof.report()
+    assert "milp" in text
+    assert "graphs" in text
+    assert "milp solve times" in text
+
+
+def test_to_dict_shape(branching_library):
+    prof = PlanProfile()
+    plan(branching_library, "1 widget", profile=prof)
+    d = prof.to_dict()
+    assert set(d) == {"wall", "stages", "counters", "solve_histogram"}
+    assert d["stages"]["milp"]["calls"] == prof.counters["milp_solves"]
@@ -0,0 +1,305 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from crafting_process import service
+from crafting_process.library import ProcessLibrary
+from crafting_process.orchestration import plan
+
+
+def _comparable(results):
+    # Node slugs are random per graph build; compare everything else.
+    out = []
+    for r in json.loads(json.dumps(results)):
+        r["process_counts"] = [
+            (pc["count"], pc["description"]) for pc in r["process_counts"]
+        ]
+        r["process_augments"] = sorted(map(tuple, r["process_augments"].values()))
+        out.append(r)
+    return out
+
+
+@pytest.fixture
+def library():
+    lib = ProcessLibrary("batch")
+    lib.add_from_text("""
+        2 iron | smelt
+        3 ore
+
+        2 iron + 1 slag | smelt_messy
+        3 ore
+
+        1 widget | press
+        2 iron
+    """)
+    return lib
+
+
+@pytest.fixture
+def client(library):
+    app = service.create_app(library, max_workers=2)
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def thread_app(library):
+    # Threads share module state, so tests can swap worker functions.
+    pool = ThreadPoolExecutor(
+        max_workers=4, initializer=service.init_worker, initargs=(library,)
+    )
+    yield service.create_app(library, executor=pool)
+    pool.shutdown()
+
+
+def test_library_lists_processes_and_augments(client, library):
+    body = client.get("/library").json()
+    assert body["mode"] == "batch"
+    assert set(body["processes"]) == set(library.recipes)
+    assert body["augments"] == []
+
+
+def test_graphs_count(client):
+    body = client.post("/graphs/count", json={"yield": "1 widget"}).json()
+    assert body == {"count": 2, "truncated": False}
+
+
+def test_graphs_count_limit_truncates(client):
+    body = client.post("/graphs/count", json={"yield": "1 widget", "limit": 1}).json()
+    assert body == {"count": 1, "truncated": True}
+
+
+def test_plan_matches_library_plan(client, library):
+    body = client.post("/plan", json={"yield": "1 widget", "num_keep": 2}).json()
+    expected = [r.to_dict() for r in plan(library, "1 widget", num_keep=2)]
+    assert _comparable(body["results"]) == _comparable(expected)
+
+
+def test_plan_forwards_graph_options(client):
+    body = client.post(
+        "/plan", json={"yield": "1 widget", "skip_processes": ["smelt_messy"]}
+    ).json()
+    descriptions = {
+        pc["description"] for r in body["results"] for pc in r["process_counts"]
+    }
+    assert not any("smelt_messy" in d for d in descriptions)
+    assert any("via smelt" in d for d in descriptions)
+
+
+def test_plan_rejects_unknown_sort_key(client):
+    response = client.post("/plan", json={"yield": "1 widget", "sort_key": "nope"})
+    assert response.status_code == 422
+
+
+def test_plan_forwards_milp_options(thread_app, monkeypatch):
+    seen = []
+    monkeypatch.setattr(service, "solve_plan", lambda query: seen.append(query) or [])
+    with TestClient(thread_app) as c:
+        response = c.post(
+            "/plan", json={"yield": "1 widget", "milp_options": {"time_limit": 5}}
+        )
+    assert response.status_code == 200
+    assert seen[0]["milp_options"] == {"time_limit": 5.0}
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{"bogus": 1}, {"time_limit": "x"}, {"time_limit": -1}, {"node_limit": 1.5}],
+)
+def test_plan_rejects_bad_milp_options(client, options):
+    response = client.post("/plan", json={"yield": "1 widget", "milp_options": options})
+    assert response.status_code == 422
+
+
+def test_plan_stream_ends_with_final_plan(client, library):
+    response = client.post("/plan/stream", json={"yield": "1 widget", "num_keep": 1})
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[-1]["type"] == "done"
+    assert all(e["type"] == "result" for e in events[:-1])
+    assert len(events) >= 2
+    expected = [r.to_dict() for r in plan(library, "1 widget", num_keep=1)]
+    assert _comparable(events[-1]["results"]) == _comparable(expected)
+
+
+def test_plan_stream_reverse_matches_plan(client, library):
+    response = client.post(
+        "/plan/stream",
+        json={"yield": "1 widget", "num_keep": 1, "reverse": True, "sort_key": "min-leak"},
+    )
+    final = json.loads(response.text.splitlines()[-1])
+    expected = plan(
+        library, "1 widget", num_keep=1, reverse=True, sort_key=lambda r: abs(r.leak)
+    )
+    assert _comparable(final["results"]) == _comparable([r.to_dict() for r in expected])
+
+
+def test_stream_worker_stops_when_cancelled(library):
+    import queue
+
+    payload = _worker_payload(library)
+    cancel = threading.Event()
+    cancel.set()
+    events = queue.Queue()
+    service.stream_plan({**payload, "deadline_at": None}, events, cancel)
+    assert events.get_nowait() == {"type": "cancelled"}
+    assert events.empty()
+
+
+async def _disconnect_after_first_line(app, spec_version):
+    # Drive the ASGI app by hand: TestClient reads the whole stream, so it
+    # cannot hang up halfway.
+    body = json.dumps({"yield": "1 widget"}).encode()
+    hung_up = asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await hung_up.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            hung_up.set()
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": spec_version},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/plan/stream",
+        "raw_path": b"/plan/stream",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    async with app.router.lifespan_context(app):
+        await asyncio.wait_for(app(scope, receive, send), 10)
+
+
+@pytest.mark.parametrize("spec_version", ["2.0", "2.4"])
+def test_stream_disconnect_cancels_the_worker(thread_app, monkeypatch, spec_version):
+    cancelled = []
+
+    def stream(query, events, cancel):
+        events.put({"type": "result", "result": {}})
+        cancelled.append(cancel.wait(5))  # a long search between improvements
+        events.put({"type": "cancelled"})
+
+    monkeypatch.setattr(service, "stream_plan", stream)
+    monkeypatch.setattr(service, "DISCONNECT_POLL", 0.05)
+    started = time.monotonic()
+    asyncio.run(_disconnect_after_first_line(thread_app, spec_version))
+    deadline = time.monotonic() + 5
+    while not cancelled and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cancelled == [True]
+    assert time.monotonic() - started < 4
+
+
+def test_deadline_returns_504(thread_app, monkeypatch):
+    monkeypatch.setattr(service, "solve_plan", lambda query: time.sleep(0.5) or [])
+    with TestClient(thread_app) as c:
+        response = c.post("/plan", json={"yield": "1 widget", "deadline": 0.05})
+    assert response.status_code == 504
+
+
+def _worker_payload(library, **fields):
+    service.init_worker(library)
+    return service._payload(service.PlanQuery(**{"yield": "1 widget", **fields}))
+
+
+def test_worker_receives_the_deadline(thread_app, monkeypatch):
+    seen = []
+    monkeypatch.setattr(service, "solve_plan", lambda query: seen.append(query) or [])
+    with TestClient(thread_app) as c:
+        c.post("/plan", json={"yield": "1 widget", "deadline": 30})
+        c.post("/plan", json={"yield": "1 widget"})
+    assert seen[0]["deadline_at"] == pytest.approx(time.time() + 30, abs=5)
+    assert seen[1]["deadline_at"] is None
+
+
+def test_worker_stops_at_its_deadline(library):
+    payload = _worker_payload(library)
+    with pytest.raises(TimeoutError):
+        service.solve_plan({**payload, "deadline_at": time.time() - 1})
+    with pytest.raises(TimeoutError):
+        service.count_graphs({**payload, "limit": None, "deadline_at": time.time() - 1})
+    results = service.solve_plan({**payload, "deadline_at": time.time() + 60})
+    expected = [r.to_dict() for r in plan(library, "1 widget")]
+    assert _comparable(results) == _comparable(expected)
+
+
+def test_worker_caps_milp_time_limit_by_deadline(library):
+    options = {"time_limit": 600, "node_limit": 5}
+    payload = _worker_payload(library, milp_options=options)
+    options = service._milp_options({**payload, "deadline_at": time.time() + 10})
+    assert options["time_limit"] == pytest.approx(10, abs=1)
+    assert options["node_limit"] == 5
+    assert service._milp_options({**payload, "deadline_at": None}) == {
+        "time_limit": 600.0,
+        "node_limit": 5,
+    }
+
+
+def test_longer_deadline_does_not_join_shorter_solve(thread_app, monkeypatch):
+    calls = []
+
+    def slow_solve(query):
+        calls.append(query["deadline_at"])
+        time.sleep(0.3)
+        return []
+
+    monkeypatch.setattr(service, "solve_plan", slow_solve)
+    with TestClient(thread_app) as c:
+        short = {"yield": "1 widget", "deadline": 5}
+        first = threading.Thread(target=c.post, args=("/plan",), kwargs={"json": short})
+        first.start()
+        time.sleep(0.1)
+        response = c.post("/plan", json={"yield": "1 widget", "deadline": 50})
+        first.join()
+    assert response.status_code == 200
+    assert len(calls) == 2
+
+
+def test_identical_concurrent_queries_share_one_solve(thread_app, monkeypatch):
+    calls = []
+
+    def slow_solve(query):
+        calls.append(query)
+        time.sleep(0.3)
+        return []
+
+    monkeypatch.setattr(service, "solve_plan", slow_solve)
+    with TestClient(thread_app) as c:
+        responses = []
+
+        def request():
+            responses.append(c.post("/plan", json={"yield": "1 widget"}))
+
+        threads = [threading.Thread(target=request) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert len(calls) == 1
+
+
+def test_different_queries_are_not_coalesced(thread_app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(service, "solve_plan", lambda query: calls.append(query) or [])
+    with TestClient(thread_app) as c:
+        c.post("/plan", json={"yield": "1 widget"})
+        c.post("/plan", json={"yield": "2 widget"})
+    assert len(calls) == 2
@@ -194,3 +194,185 @@ def test_best_milp_sequence_no_duplicate_answers():
     ]:
         answers = [a for _, a in best_milp_sequence(matrix, keys)]
         assert len(answers) == len({tuple(sorted(a.items())) for a in answers})
+
+
+# ---------------------------------------------------------------------------
+# Solver budgets (time_limit / mip_rel_gap / node_limit)
+# ---------------------------------------------------------------------------
+
+
+def test_solve_milp_reports_optimal():
+    result = solve_milp(RATIO_2TO3, ["P1", "P2"], max_leak=0)
+    assert result["optimal"] is True
+
+
+def test_solve_milp_accepts_budget_options():
+    result = solve_milp(
+        CHAIN,
+        ["A", "B", "C"],
+        max_leak=0,
+        time_limit=10.0,
+        mip_rel_gap=0.0,
+        node_limit=1000,
+    )
+    assert result["answer"] == {"A": 3, "B": 2, "C": 2}
+    assert result["optimal"] is True
+
+
+def test_solve_milp_passes_options_to_milp(monkeypatch):
+    import crafting_process.solver as solver
+
+    seen = {}
+    real_milp = solver.milp
+
+    def spy(*args, **kwargs):
+        seen.update(kwargs["options"])
+        return real_milp(*args, **kwargs)
+
+    monkeypatch.setattr(solver, "milp", spy)
+    solve_milp(RATIO_2TO3, ["P1", "P2"], time_limit=5.0, node_limit=10)
+    assert seen == {"time_limit": 5.0, "node_limit": 10}
+
+
+def test_solve_milp_budget_hit_returns_incumbent_not_optimal(monkeypatch):
+    import types
+
+    import numpy as np
+
+    import crafting_process.solver as solver
+
+    def limited(*args, **kwargs):
+        return types.SimpleNamespace(
+            success=False, status=1, x=np.array([3.0, 2.0])
+        )
+
+    monkeypatch.setattr(solver, "milp", limited)
+    result = solve_milp(RATIO_2TO3, ["P1", "P2"], time_limit=0.001)
+    assert result["answer"] == {"P1": 3, "P2": 2}
+    assert result["optimal"] is False
+
+
+def test_solve_milp_budget_hit_without_incumbent_raises(monkeypatch):
+    import types
+
+    import crafting_process.solver as solver
+
+    def limited(*args, **kwargs):
+        return types.SimpleNamespace(success=False, status=1, x=None)
+
+    monkeypatch.setattr(solver, "milp", limited)
+    with pytest.raises(ValueError, match="No solution"):
+        solve_milp(RATIO_2TO3, ["P1", "P2"], time_limit=0.001)
+
+
+# A small instance where HiGHS stops at mip_rel_gap=0.5 with the gap still open.
+GAP_LIMITED = [
+    [6, 4, 4, -2, 7, -7, 1, 4, 7, 0],
+    [-2, -4, -1, 0, 4, 7, -8, 8, 1, -3],
+    [3, 1, -5, -3, 4, 2, 0, -3, 5, -2],
+    [-3, 7, -4, -5, 4, 2, -9, -8, -2, 6],
+    [-2, 5, -3, -5, 6, 7, -8, -8, 3, -3],
+    [1, -7, 7, -1, 8, 6, 4, -5, 5, -9],
+]
+
+
+def test_solve_milp_gap_limited_solve_is_not_optimal():
+    keys = list("abcdefghij")
+    result = solve_milp(GAP_LIMITED, keys, max_leak=5, mip_rel_gap=0.5)
+    assert result["result"].success
+    assert result["result"].mip_gap > 0
+    assert result["optimal"] is False
+    assert solve_milp(GAP_LIMITED, keys, max_leak=5)["optimal"] is True
+
+
+def test_solve_milp_open_gap_with_success_is_not_optimal(monkeypatch):
+    import types
+
+    import numpy as np
+
+    import crafting_process.solver as solver
+
+    def stopped_at_gap(*args, **kwargs):
+        return types.SimpleNamespace(
+            success=True, status=0, x=np.array([3.0, 2.0]), mip_gap=0.05
+        )
+
+    monkeypatch.setattr(solver, "milp", stopped_at_gap)
+    result = solve_milp(RATIO_2TO3, ["P1", "P2"], mip_rel_gap=0.1)
+    assert result["answer"] == {"P1": 3, "P2": 2}
+    assert result["optimal"] is False
+
+
+def test_best_milp_solutions_matches_sequence():
+    from crafting_process.solver import best_milp_solutions
+
+    solutions = list(best_milp_solutions(NEGATIVE_DOMINANT, ["P1", "P2"]))
+    sequence = list(best_milp_sequence(NEGATIVE_DOMINANT, ["P1", "P2"]))
+    assert [(s["leak"], s["answer"]) for s in solutions] == sequence
+    assert all(s["optimal"] for s in solutions)
+
+
+# ---------------------------------------------------------------------------
+# Exact leak arithmetic
+# ---------------------------------------------------------------------------
+
+
+def test_integerize_integer_matrix_is_unscaled():
+    from crafting_process.solver import integerize
+
+    assert integerize(CHAIN) == [([2, -3, 0], 1), ([0, 1, -1], 1)]
+
+
+def test_integerize_recovers_small_rationals():
+    from crafting_process.solver import integerize
+
+    # 2 / 3.2 = 5/8 per second, 1/3 per second
+    [(row, scale)] = integerize([[2 / 3.2, -1 / 3]])
+    assert scale == 24
+    assert row == [15, -8]
+
+
+def test_exact_leaks_are_exact():
+    from fractions import Fraction
+
+    from crafting_process.solver import exact_leaks, integerize
+
+    # 0.1 + 0.2 != 0.3 in floats; exactly zero as rationals
+    int_matrix = integerize([[0.1 + 0.2, -0.3]])
+    assert exact_leaks(int_matrix, [1, 1]) == [Fraction(0)]
+
+
+def _count_solves(monkeypatch):
+    import crafting_process.solver as solver
+
+    calls = []
+    real = solver.solve_milp
+
+    def spy(*args, **kwargs):
+        calls.append(kwargs.get("max_leak"))
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(solver, "solve_milp", spy)
+    return calls
+
+
+def test_best_milp_sequence_zero_leak_needs_one_solve(monkeypatch):
+    calls = _count_solves(monkeypatch)
+    results = list(best_milp_sequence(BALANCED_1TO1, ["A", "B"]))
+    assert len(results) == 1
+    assert len(calls) == 1
+
+
+def test_best_milp_sequence_float_noise_is_not_a_leak(monkeypatch):
+    calls = _count_solves(monkeypatch)
+    results = list(best_milp_sequence([[0.1 + 0.2, -0.3]], ["A", "B"]))
+    assert results == [(0.0, {"A": 1, "B": 1})]
+    assert len(calls) == 1
+
+
+def test_best_milp_sequence_rate_matrix_reaches_exact_zero():
+    # 5/8 per second produced, 1/3 per second consumed: 8 producers feed 15 consumers
+    results = list(best_milp_sequence([[2 / 3.2, -1 / 3]], ["P", "C"]))
+    final_leak, final_answer = results[-1]
+    assert final_leak == 0.0
+    assert final_answer == {"P": 8, "C": 15}
@@ -0,0 +1,195 @@
+import pytest
+
+from crafting_process.augment import Augments
+from crafting_process.library import ProcessLibrary
+from crafting_process.process import Ingredients, BatchProcess, ContinuousProcess
+from crafting_process.table import RecipeTable
+
+
+def make(outputs, inputs, duration=2.0, process="assemble", **kwargs):
+    process_class = BatchProcess if duration is None else ContinuousProcess
+    return process_class(
+        outputs=Ingredients.parse(outputs),
+        inputs=Ingredients.parse(inputs),
+        duration=duration,
+        process=process,
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def processes():
+    return [
+        ("gear", make("1 gear", "2 iron + 10 kWe", duration=0.5)),
+        ("circuit", make("1 circuit", "3 copper_cable + 1 iron", duration=1.0)),
+        ("plate", make("1 plate + 1 slag", "1 ore", duration=3.2, annotations={"tier": 1})),
+    ]
+
+
+def _assert_same(a, b):
+    assert a.duration == pytest.approx(b.duration)
+    assert a.process == b.process
+    assert a.annotations == b.annotations
+    for attr in ("inputs", "outputs"):
+        va, vb = getattr(a, attr), getattr(b, attr)
+        kinds = set(va.nonzero_components) | set(vb.nonzero_components)
+        for kind in kinds:
+            assert va[kind] == pytest.approx(vb[kind]), (attr, kind)
+
+
+def test_round_trip_preserves_processes(processes):
+    table = RecipeTable.from_processes(processes)
+    assert len(table) == 3
+    for (got, (_, expected)) in zip(table.processes(), processes):
+        _assert_same(got, expected)
+
+
+def test_augmented_matches_per_process_application(processes):
+    aug = Augments.composed([
+        Augments.mul_speed(2.0),
+        Augments.increase_energy_pct("kWe", 20),
+        Augments.add_input_rate(Ingredients.parse("1 kWe + 0.5 water")),
+        Augments.mul_outputs(1.1),
+        Augments.add_output(Ingredients.parse("1 scrap")),
+    ])
+    table = RecipeTable.from_processes(processes).augmented(aug)
+    for (got, (_, proc)) in zip(table.processes(), processes):
+        _assert_same(got, aug(proc))
+
+
+def test_augmented_keeps_per_process_component_order(processes):
+    # circuit lists copper_cable before iron, though the table saw iron first.
+    aug = Augments.composed([
+        Augments.mul_inputs(2),
+        Augments.add_input(Ingredients.parse("1 water + 1 iron")),
+        Augments.add_output(Ingredients.parse("1 scrap")),
+    ])
+    table = RecipeTable.from_processes(processes).augmented(aug)
+    for (got, (_, proc)) in zip(table.processes(), processes):
+        expected = aug(proc)
+        for attr in ("inputs", "outputs"):
+            assert list(getattr(got, attr).nonzero_components) == list(
+                getattr(expected, attr).nonzero_components
+            )
+    circuit = table.processes()[1]
+    assert list(circuit.inputs.nonzero_components) == ["copper_cable", "iron", "water"]
+
+
+def test_augmented_keeps_missing_duration():
+    table = RecipeTable.from_processes([("x", make("1 x", "1 y", duration=None))])
+    (result,) = table.augmented(Augments.mul_speed(2.0)).processes()
+    assert result.duration is None
+
+
+def test_rate_offset_without_duration_raises():
+    table = RecipeTable.from_processes([("x", make("1 x", "1 y", duration=None))])
+    with pytest.raises(ValueError):
+        table.augmented(Augments.add_input_rate(Ingredients.parse("1 kWe")))
+
+
+def test_untouched_side_reuses_template_vectors(processes):
+    table = RecipeTable.from_processes(processes).augmented(Augments.mul_speed(2.0))
+    results = table.processes()
+    assert all(r.outputs is p.outputs for (r, (_, p)) in zip(results, processes))
+    assert results[0].duration == pytest.approx(0.25)
+
+
+def test_non_affine_augment_rejected(processes):
+    table = RecipeTable.from_processes(processes)
+    with pytest.raises(ValueError):
+        table.augmented(lambda p: p)
+
+
+def test_processes_callable_override(processes):
+    table = RecipeTable.from_processes(processes)
+    results = table.processes(applied_augments=lambda p: p.applied_augments + ["mk"])
+    assert all(r.applied_augments == ["mk"] for r in results)
+    assert all(p.applied_augments == [] for (_, p) in processes)
+
+
+# ---------------------------------------------------------------------------
+# ProcessLibrary.add_augmented_variants
+# ---------------------------------------------------------------------------
+
+
+RECIPES = """
+1 gear | assemble duration=0.5
+2 iron + 10 kWe
+
+1 plate | smelt duration=3.2
+1 ore
+"""
+
+
+def _library(**augments):
+    return ProcessLibrary("continuous", text=RECIPES, augments=augments)
+
+
+def test_add_augmented_variants_matches_dsl_blocks():
+    augments = {"mk2": Augments.mul_speed(2.0), "eff": Augments.increase_energy_pct("kWe", -20)}
+    bulk = _library(**augments).add_augmented_variants([["mk2"], ["mk2", "eff"]])
+    dsl = ProcessLibrary(
+        "continuous", text="@mk2\n@mk2 @eff\n" + RECIPES, augments=augments
+    )
+    assert set(bulk.recipes) == set(dsl.recipes)
+    for name in dsl.recipes:
+        _assert_same(bulk.recipes[name], dsl.recipes[name])
+        assert bulk.recipes[name].applied_augments == dsl.recipes[name].applied_augments
+
+
+def test_add_augmented_variants_pred_and_custom_callable():
+    lib = _library(renamed=lambda p: p.copy(process="renamed"))
+    lib.add_augmented_variants([["renamed"]], pred=lambda p: p.process == "smelt")
+    assert lib.recipes["plate via smelt @renamed"].process == "renamed"
+    assert lib.recipes["plate via smelt @renamed"].applied_augments == ["renamed"]
+    assert "gear via assemble @renamed" not in lib.recipes
+
+
+def test_add_augmented_variants_skips_existing_variants():
+    lib = _library(mk2=Augments.mul_speed(2.0))
+    lib.add_augmented_variants([["mk2"]])
+    lib.add_augmented_variants([["mk2"]])
+    assert "gear via assemble @mk2 @mk2" not in lib.recipes
+    assert "gear via assemble @mk2 2" in lib.recipes
+
+
+def _exact(p):
+    # Values and their types: 2 and 2.0 print differently in descriptions.
+    # Component order too: graph search expands kinds in that order.
+    return (
+        [(k, c, type(c).__name__) for (k, c, _) in p.inputs.triples()],
+        [(k, c, type(c).__name__) for (k, c, _) in p.outputs.triples()],
+        (p.duration, type(p.duration)),
+    )
+
+
+@pytest.mark.parametrize(
+    "aug_names",
+    [
+        ["mk2"],
+        ["double"],
+        ["extra"],
+        ["double", "extra"],
+        ["eff"],
+        ["slow"],
+        ["fast_in"],
+    ],
+)
+def test_table_variants_keep_int_coefficients(aug_names):
+    text = "2 gear | assemble duration=2\n2 iron + 10 kWe\n\n1 plate | smelt\n1 ore\n"
+    augments = {
+        "mk2": Augments.mul_speed(2.0),
+        "double": Augments.mul_outputs(2),
+        "extra": Augments.add_input(Ingredients.parse("1 iron + 3 water")),
+        "eff": Augments.increase_energy_pct("kWe", -20),
+        "slow": Augments.mul_duration(2),
+        "fast_in": Augments.add_input_rate(Ingredients.parse("1 kWe")),
+    }
+    lib = ProcessLibrary("batch", text=text, augments=augments)
+    if aug_names == ["fast_in"]:
+        lib = lib.filter(lambda p: p.duration is not None)
+    bases = [(n, p) for (n, p) in lib.recipes.items()]
+    aug = Augments.composed([augments[n] for n in aug_names])
+    table = RecipeTable.from_processes(bases).augmented(aug)
+    for (got, (_, proc)) in zip(table.processes(), bases):
+        assert _exact(got) == _exact(aug(proc))
@@ -1,11 +1,34 @@
 #!/usr/bin/env python
-"""Command-line interface for crafting-process plan()."""
+"""Command-line interface for crafting-process plan().
+
+Besides one-shot use, plan.py can run as a long-lived server that keeps
+parsed libraries warm, with a thin client mode that forwards its arguments:
+
+    plan.py --serve /tmp/plan.sock &
+    plan.py --connect /tmp/plan.sock -r recipes.txt "10 computer"
+
+The client never imports crafting_process (or numpy/scipy), so a forwarded
+query costs little more than the socket round trip.
+
+Batch mode answers many yields against one library, streaming one JSON line
+per query:
+
+    plan.py -r recipes.txt --batch targets.txt --jobs 4 --order completion
+"""
 
 import argparse
+import concurrent.futures
+import contextlib
 import importlib.util
 import inspect
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
 import sys
-import crafting_process as cp
+import threading
 
 
 def _load_augments(path):
@@ -29,11 +52,44 @@ KNOWN_SORT_KEYS = {
 }
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Find production plans for a desired yield."
+class _ParserExit(Exception):
+
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+class _CapturingParser(argparse.ArgumentParser):
+    """ArgumentParser that writes to given streams and raises instead of exiting.
+
+    Used by the server, where usage errors and --help must go back to the
+    client rather than to the server's own stdout/stderr.
+    """
+
+    def __init__(self, *args, out, err, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._out = out
+        self._err = err
+
+    def _print_message(self, message, file=None):
+        if message:
+            (self._err if file is sys.stderr else self._out).write(message)
+
+    def exit(self, status=0, message=None):
+        if message:
+            self._err.write(message)
+        raise _ParserExit(status)
+
+
+def build_parser(parser_class=argparse.ArgumentParser, **parser_kwargs):
+    parser = parser_class(
+        description="Find production plans for a desired yield.",
+        **parser_kwargs,
+    )
+    parser.add_argument(
+        "yield_", metavar="yield", nargs="?",
+        help='Desired yield, e.g. "10 computer"'
     )
-    parser.add_argument("yield_", metavar="yield", help='Desired yield, e.g. "10 computer"')
     parser.add_argument(
         "-r", "--recipes", default="recipes.txt", metavar="FILE",
         help="Recipe document to load (default: recipes.txt)"
@@ -82,6 +138,18 @@ def main():
         default=[], metavar="KIND",
         help="Treat this resource kind as a terminal input (repeatable)"
     )
+    parser.add_argument(
+        "--time-limit", type=float, metavar="SECONDS",
+        help="Per-solve MILP time limit; plans may then be best-found, not optimal"
+    )
+    parser.add_argument(
+        "--mip-gap", type=float, metavar="GAP",
+        help="Relative MIP gap at which a solve may stop early"
+    )
+    parser.add_argument(
+        "--node-limit", type=int, metavar="N",
+        help="Maximum branch-and-bound nodes per MILP solve"
+    )
     parser.add_argument(
         "--show-augments", action="store_true",
         help="Show applied augments next to each process"
@@ -98,12 +166,79 @@ def main():
         "--dot", action="store_true",
         help="Output Graphviz DOT format for each result (suppresses summary; pipe to dot -Tsvg)"
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Print a per-stage timing breakdown to stderr"
+    )
+    parser.add_argument(
+        "--batch", metavar="FILE",
+        help="Answer one query per line of FILE ('-' for stdin) as JSON lines: "
+        'a yield, or an object {"yield", "stop_kinds", "skip_processes"}'
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1, metavar="N",
+        help="Worker processes for --batch (default: 1, in-process)"
+    )
+    parser.add_argument(
+        "--order", choices=["input", "completion"], default="input",
+        help="Emit --batch results in input order (default) or as they finish"
+    )
+    parser.add_argument(
+        "--serve", metavar="SOCKET",
+        help="Run as a server answering plan.py queries on this Unix socket"
+    )
+    parser.add_argument(
+        "--connect", metavar="SOCKET",
+        help="Forward this query to a plan.py --serve process on SOCKET"
+    )
+    return parser
+
+
+#
+# Library loading
+#
+
+# (mode, recipes path, augment path) -> (file versions, ProcessLibrary).  A
+# server process keeps one library per identity warm, together with every
+# cache hanging off it, and rebuilds it only when one of the files changes.
+_LIBRARIES = {}
+_LIBRARIES_LOCK = threading.Lock()
+
+
+def _file_version(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _library(args):
+    import crafting_process as cp
 
-    augments = _load_augments(args.augment_file) if args.augment_file else {}
-    lib = cp.ProcessLibrary(args.mode, path=args.recipes, augments=augments)
-    results = cp.plan(
-        lib,
+    augment_path = os.path.abspath(args.augment_file) if args.augment_file else None
+    identity = (args.mode, os.path.abspath(args.recipes), augment_path)
+    version = (
+        _file_version(args.recipes),
+        _file_version(augment_path) if augment_path else None,
+    )
+    with _LIBRARIES_LOCK:
+        cached = _LIBRARIES.get(identity)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        augments = _load_augments(args.augment_file) if args.augment_file else {}
+        lib = cp.ProcessLibrary(args.mode, path=args.recipes, augments=augments)
+        _LIBRARIES[identity] = (version, lib)
+        return lib
+
+
+#
+# Query execution
+#
+
+
+def _plan(args, profile=None):
+    import crafting_process as cp
+
+    return cp.plan(
+        _library(args),
         args.yield_,
         num_keep=args.num_keep,
         sort_key=KNOWN_SORT_KEYS[args.sort_key],
@@ -113,29 +248,310 @@ def main():
         only_augments=args.only_augments or None,
         max_overlap=args.max_overlap,
         stop_kinds=args.stop_kinds or None,
+        milp_options={
+            "time_limit": args.time_limit,
+            "mip_rel_gap": args.mip_gap,
+            "node_limit": args.node_limit,
+        },
+        profile=profile,
     )
 
+
+def run(args, out, err):
+    """Answer one parsed query, writing to out/err.  Returns the exit status."""
+    import crafting_process as cp
+
+    if args.batch:
+        return run_batch(args, out, err)
+
+    profile = cp.PlanProfile() if args.profile else None
+    results = _plan(args, profile=profile)
+
     if not results:
-        print("No plans found.", file=sys.stderr)
-        sys.exit(1)
-
-    if args.dot:
-        for i, r in enumerate(results, start=1):
-            print(f"// Plan {i}: {r.desired}, leak={r.leak}")
-            print(cp.printable_dot(r))
-            if i < len(results):
-                print()
-    else:
-        print(cp.printable_analysis(
-            iter(results),
-            show_augments=args.show_augments,
-            show_type=args.show_type,
-        ))
-        if args.graph:
+        print("No plans found.", file=err)
+        return 1
+
+    if not all(r.optimal for r in results):
+        print(
+            "Note: some solves hit a time/node limit; "
+            "their counts are best found, not proven optimal.",
+            file=err,
+        )
+
+    with profile.activate() if profile else contextlib.nullcontext():
+        if args.dot:
             for i, r in enumerate(results, start=1):
-                print(f"--- Graph for plan {i} ---")
-                print(cp.printable_graph(r))
-                print()
+                print(f"// Plan {i}: {r.desired}, leak={r.leak}", file=out)
+                print(cp.printable_dot(r), file=out)
+                if i < len(results):
+                    print(file=out)
+        else:
+            print(cp.printable_analysis(
+                iter(results),
+                show_augments=args.show_augments,
+                show_type=args.show_type,
+            ), file=out)
+            if args.graph:
+                for i, r in enumerate(results, start=1):
+                    print(f"--- Graph for plan {i} ---", file=out)
+                    print(cp.printable_graph(r), file=out)
+                    print(file=out)
+
+    if profile:
+        print(profile.report(), file=err)
+
+    return 0
+
+
+#
+# Batch mode
+#
+
+# Per-query overrides accepted in a JSON batch line, beyond "yield".
+_BATCH_OVERRIDES = ("stop_kinds", "skip_processes")
+
+
+def _batch_queries(lines):
+    """Parse batch input into (query, error) pairs; blank lines and # comments are skipped.
+
+    A line that is not a valid query gives (the line, an error message), so
+    it is reported in its own record instead of aborting the batch.
+    """
+    for lineno, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if not line.startswith("{"):
+            yield ({"yield": line}, None)
+            continue
+        try:
+            query = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield (line, f"Batch line {lineno}: invalid JSON: {e}")
+            continue
+        if not isinstance(query, dict) or "yield" not in query:
+            yield (line, f"Batch line {lineno}: query object needs a \"yield\"")
+            continue
+        yield (query, None)
+
+
+def _batch_override(name, value):
+    # A single string is one item, like one use of the repeatable flag.
+    if isinstance(value, str):
+        return [value]
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"\"{name}\" must be a string or a list of strings")
+    return list(value)
+
+
+def _batch_args(args, query):
+    overrides = {
+        name: _batch_override(name, query[name])
+        for name in _BATCH_OVERRIDES
+        if name in query
+    }
+    return argparse.Namespace(**{**vars(args), "yield_": query["yield"], **overrides})
+
+
+def _answer_batch_query(args, index, query, error=None):
+    record = {"index": index, "query": query}
+    if error is not None:
+        record["error"] = error
+        return record
+    try:
+        results = _plan(_batch_args(args, query))
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    else:
+        record["results"] = [r.to_dict() for r in results]
+    return record
+
+
+def _init_batch_worker(args):
+    # Parse the library once per worker; every query it answers then shares
+    # the library and its caches.
+    _library(args)
+
+
+def run_batch(args, out, err):
+    """Answer every query in args.batch, writing one JSON line per query to out.
+
+    Returns 0 if every query produced at least one plan, otherwise 1.
+    """
+    if args.batch == "-":
+        queries = list(_batch_queries(sys.stdin))
+    else:
+        with open(args.batch) as f:
+            queries = list(_batch_queries(f))
+
+    # Load in the parent first: a bad recipe file fails once, up front, and
+    # forked workers start with the library already parsed.
+    _library(args)
+    status = 0
+
+    def emit(record):
+        nonlocal status
+        if not record.get("results"):
+            status = 1
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+
+    if args.jobs <= 1:
+        for (i, (query, error)) in enumerate(queries):
+            emit(_answer_batch_query(args, i, query, error))
+        return status
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=args.jobs,
+        initializer=_init_batch_worker,
+        initargs=(args,),
+    ) as pool:
+        futures = [
+            pool.submit(_answer_batch_query, args, i, query, error)
+            for (i, (query, error)) in enumerate(queries)
+        ]
+        if args.order == "completion":
+            futures = concurrent.futures.as_completed(futures)
+        for future in futures:
+            emit(future.result())
+    return status
+
+
+def _resolve_paths(args, cwd):
+    # Relative paths in a forwarded query are relative to the client's cwd.
+    args.recipes = os.path.join(cwd, args.recipes)
+    if args.augment_file:
+        args.augment_file = os.path.join(cwd, args.augment_file)
+
+
+# The server answers on one thread per connection, but queries run one at a
+# time: they are CPU-bound, so overlapping them would only interleave them.
+_ANSWER_LOCK = threading.Lock()
+
+
+def answer_request(request):
+    """Server side of one forwarded query: {"argv", "cwd"} -> {"stdout", "stderr", "status"}."""
+    out = io.StringIO()
+    err = io.StringIO()
+    try:
+        parser = build_parser(_CapturingParser, out=out, err=err, prog="plan.py")
+        args = parser.parse_args(request["argv"])
+        if args.serve or args.connect or args.batch:
+            parser.error("--serve/--connect/--batch cannot be forwarded to a server")
+        if args.yield_ is None:
+            parser.error("the following arguments are required: yield")
+        _resolve_paths(args, request.get("cwd", "."))
+        with _ANSWER_LOCK:
+            status = run(args, out, err)
+    except _ParserExit as e:
+        status = e.status
+    except Exception as e:
+        print(f"{type(e).__name__}: {e}", file=err)
+        status = 1
+    return {"stdout": out.getvalue(), "stderr": err.getvalue(), "status": status}
+
+
+#
+# Server / client
+#
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            response = {"stdout": "", "stderr": f"Bad request: {e}\n", "status": 2}
+        else:
+            response = answer_request(request)
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path):
+    # Warm the heavy imports before accepting the first query.
+    import crafting_process  # noqa: F401
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = _Server(socket_path, _Handler)
+
+    def _stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    print(f"plan.py serving on {socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def _strip_connect(argv):
+    # Let argparse find --connect, so abbreviations (--conn PATH, --con=PATH)
+    # go too. main() has already parsed argv with the full parser, so any
+    # prefix that reaches here is unambiguous; everything else comes back
+    # from parse_known_args unchanged and in order.
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--connect", action="append")
+    return parser.parse_known_args(argv)[1]
+
+
+def forward(socket_path, argv):
+    """Send argv to a running server; returns the exit status, or None if unreachable."""
+    request = {"argv": _strip_connect(argv), "cwd": os.getcwd()}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+    except OSError as e:
+        print(f"plan.py: cannot reach server at {socket_path}: {e}", file=sys.stderr)
+        return None
+    response = json.loads(line)
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    return response["status"]
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    if args.batch:
+        if args.yield_ is not None:
+            parser.error("give either a yield or --batch, not both")
+        if args.connect:
+            parser.error("--batch cannot be forwarded to a server")
+        if args.profile:
+            parser.error("--profile is not supported with --batch")
+        sys.exit(run(args, sys.stdout, sys.stderr))
+
+    if args.yield_ is None:
+        parser.error("the following arguments are required: yield")
+
+    if args.connect:
+        status = forward(args.connect, sys.argv[1:])
+        if status is not None:
+            sys.exit(status)
+        print("plan.py: running locally instead", file=sys.stderr)
+
+    sys.exit(run(args, sys.stdout, sys.stderr))
 
 
 if __name__ == "__main__":